@@ -2,11 +2,22 @@
 
 
 from __future__ import print_function
-import os
+import os, sys, argparse
+import netcache, netparse, gates
+
+# How much gets printed. Anything above the current level is skipped before it is even formatted
+QUIET = 0    # nothing
+NORMAL = 1   # which files are read and written
+TRACE = 2    # also the bookkeeping items of the netlist, and the circuit dictionary
+verbosity = NORMAL
 
 # Function List:
 # 1. netRead: read the benchmark file and build circuit netlist
-# 2. main: The main function
+# 2. faults: write the full single stuck-at fault list
+# 3. collapseFaults: group the full fault list into equivalence classes (and optionally drop dominating faults)
+# 4. faultsCollapsed: write the collapsed fault list and the mapping file back to the full list
+# 5. writeFaultList: reads the netlist and writes its fault list
+# 6. main: The main function
 
 # -------------------------------------------------------------------------------------------------------------------- #
 # FUNCTION: Neatly prints the Circuit Dictionary:
@@ -29,154 +40,170 @@ def printCkt (circuit):
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
-# FUNCTION: Reading in the Circuit gate-level netlist file:
+# FUNCTION: Reading in the Circuit gate-level netlist file, with the single-pass parser from netparse.py
 def netRead(netName):
-    # Opening the netlist file:
-    netFile = open(netName, "r")
-
-    # temporary variables
-    inputs = []     # array of the input wires
-    outputs = []    # array of the output wires
-    gates = []      # array of the gate list
-    inputBits = 0   # the number of inputs needed in this given circuit
-
-
-    # main variable to hold the circuit netlist, this is a dictionary in Python, where:
-    # key = wire name; value = a list of attributes of the wire
-    circuit = {}
-
-    # Reading in the netlist file line by line
-    for line in netFile:
-
-        # NOT Reading any empty lines
-        if (line == "\n"):
-            continue
-
-        # Removing spaces and newlines
-        line = line.replace(" ","")
-        line = line.replace("\n","")
-
-        # NOT Reading any comments
-        if (line[0] == "#"):
-            continue
-
-        # @ Here it should just be in one of these formats:
-        # INPUT(x)
-        # OUTPUT(y)
-        # z=LOGIC(a,b,c,...)
-
-        # Read a INPUT wire and add to circuit:
-        if (line[0:5] == "INPUT"):
-            # Removing everything but the line variable name
-            line = line.replace("INPUT", "")
-            line = line.replace("(", "")
-            line = line.replace(")", "")
-
-            # Format the variable name to wire_*VAR_NAME*
-            line = "wire_" + line
-
-            # Error detection: line being made already exists
-            if line in circuit:
-                msg = "NETLIST ERROR: INPUT LINE \"" + line + "\" ALREADY EXISTS PREVIOUSLY IN NETLIST"
-                print(msg + "\n")
-                return msg
-
-            # Appending to the inputs array and update the inputBits
-            inputs.append(line)
-
-            # add this wire as an entry to the circuit dictionary
-            circuit[line] = ["INPUT", line, False, 'U']
-
-            inputBits += 1
-            print(line)
-            print(circuit[line])
-            continue
-
-        # Read an OUTPUT wire and add to the output array list
-        # Note that the same wire should also appear somewhere else as a GATE output
-        if line[0:6] == "OUTPUT":
-            # Removing everything but the numbers
-            line = line.replace("OUTPUT", "")
-            line = line.replace("(", "")
-            line = line.replace(")", "")
-
-            # Appending to the output array
-            outputs.append("wire_" + line)
-            continue
-
-        # Read a gate output wire, and add to the circuit dictionary
-        lineSpliced = line.split("=") # splicing the line at the equals sign to get the gate output wire
-        gateOut = "wire_" + lineSpliced[0]
-
-        # Error detection: line being made already exists
-        if gateOut in circuit:
-            msg = "NETLIST ERROR: GATE OUTPUT LINE \"" + gateOut + "\" ALREADY EXISTS PREVIOUSLY IN NETLIST"
-            print(msg+"\n")
-            return msg
-
-        # Appending the dest name to the gate list
-        gates.append(gateOut)
-
-        lineSpliced = lineSpliced[1].split("(") # splicing the line again at the "("  to get the gate logic
-        logic = lineSpliced[0].upper()
-
-
-        lineSpliced[1] = lineSpliced[1].replace(")", "")
-        terms = lineSpliced[1].split(",")  # Splicing the the line again at each comma to the get the gate terminals
-        # Turning each term into an integer before putting it into the circuit dictionary
-        terms = ["wire_" + x for x in terms]
-
-        # add the gate output wire to the circuit dictionary with the dest as the key
-        circuit[gateOut] = [logic, terms, False, 'U']
-        print(gateOut)
-        print(circuit[gateOut])
-
-    # now after each wire is built into the circuit dictionary,
-    # add a few more non-wire items: input width, input array, output array, gate list
-    # for convenience
-
-    circuit["INPUT_WIDTH"] = ["input width:", inputBits]
-    circuit["INPUTS"] = ["Input list", inputs]
-    circuit["OUTPUTS"] = ["Output list", outputs]
-    circuit["GATES"] = ["Gate list", gates]
+    circuit = netparse.parseBench(netName)
+    if isinstance(circuit, str):
+        print(circuit + "\n")
+        return circuit
+
+    if verbosity >= TRACE:
+        print("\n bookkeeping items in circuit: \n")
+        print(circuit["INPUT_WIDTH"])
+        print(circuit["INPUTS"])
+        print(circuit["OUTPUTS"])
+        print(circuit["GATES"])
+    return circuit
 
-    print("\n bookkeeping items in circuit: \n")
-    print(circuit["INPUT_WIDTH"])
-    print(circuit["INPUTS"])
-    print(circuit["OUTPUTS"])
-    print(circuit["GATES"])
+#----------------------------------------------------------------------------------------------------------------------#
+# FUNCTION: Builds the full SSA fault list, in the order it is written out: inputs, then for every gate its output and
+# each of its input pins. Names are taken as everything after "wire_", so names with an underscore in them stay whole
+def fullFaultList(circuit):
+    faultList = []
+    for i in circuit["INPUTS"][1]:
+        faultList.append(i[5:] + "-SA-0")
+        faultList.append(i[5:] + "-SA-1")
 
+    for i in circuit["GATES"][1]:
+        faultList.append(i[5:] + "-SA-0")
+        faultList.append(i[5:] + "-SA-1")
 
-    return circuit
+        for j in circuit[i][1]:
+            faultList.append(i[5:] + "-IN-" + j[5:] + "-SA-0")
+            faultList.append(i[5:] + "-IN-" + j[5:] + "-SA-1")
+    return faultList
 
-#----------------------------------------------------------------------------------------------------------------------#
 def faults(circuit, outFile):
     outFile.write("# circuit.bench\n# full SSA fault list\n\n")
-    faults_number=0
+    faultList = fullFaultList(circuit)
+    for fault in faultList:
+        outFile.write(fault + "\n")
 
-    for i in circuit["INPUTS"][1]:
-        i=i.split("_")
-        outFile.write(i[1] + "-SA-0" + "\n")
-        outFile.write(i[1] + "-SA-1" + "\n")
-        faults_number = faults_number + 2
-    #print(i)
-    for i in circuit["GATES"][1]:
-        q=i.split("_")
-        outFile.write(q[1] + "-SA-0" + "\n")
-        outFile.write(q[1] + "-SA-1" + "\n")
-        faults_number = faults_number + 2
+    outFile.write("\n# total faults: " + str(len(faultList)) + "\n")
 
-        for j in circuit[i][1]:
-            j=j.split("_")
-            outFile.write(q[1] + "-IN-" + j[1] + "-SA-0" + "\n")
-            outFile.write(q[1] + "-IN-" + j[1] + "-SA-1" + "\n")
-            faults_number = faults_number + 2
+#----------------------------------------------------------------------------------------------------------------------#
+# FUNCTION: Structural fault collapsing of the full fault list.
+# Equivalence: faults that no test can tell apart are put in the same class
+#   AND: input SA-0 = output SA-0         NAND: input SA-0 = output SA-1
+#   OR: input SA-1 = output SA-1          NOR: input SA-1 = output SA-0
+#   NOT: input SA-0 = output SA-1, input SA-1 = output SA-0     BUFF: input SA-0 = output SA-0, input SA-1 = output SA-1
+#   XOR/XNOR and cells like MUX have none
+#   fanout-free branch: if a line only feeds one gate pin (and is not an output), the pin fault = the line fault
+# Dominance (only if dominance is True): every test for the dominated fault also detects the dominating one, so the
+# dominating class is dropped and counted with the dominated class instead
+#   AND: output SA-1 dominates input SA-1       NAND: output SA-0 dominates input SA-1
+#   OR: output SA-0 dominates input SA-0        NOR: output SA-1 dominates input SA-0
+# Returns a list of (collapsed fault, list of the full list faults it stands for), in full list order.
+# The collapsed fault is the first fault of its class in the full list
+def collapseFaults(circuit, dominance):
+    # Dropping the duplicates a gate using the same line twice would give. position doubles as the set of faults seen
+    # so far, so this stays linear in the size of the fault list
+    faultList = []
+    position = {}
+    parent = {}
+    for fault in fullFaultList(circuit):
+        if fault not in position:
+            position[fault] = len(faultList)
+            parent[fault] = fault
+            faultList.append(fault)
+
+    # union-find over the fault names, the root of a class is always the one earliest in the full list
+
+    def find(fault):
+        while parent[fault] != fault:
+            parent[fault] = parent[parent[fault]]
+            fault = parent[fault]
+        return fault
+
+    def union(a, b):
+        a = find(a)
+        b = find(b)
+        if a == b:
+            return
+        if position[a] < position[b]:
+            parent[b] = a
+        else:
+            parent[a] = b
+
+    # How many gate pins each line feeds
+    outputs = set(circuit["OUTPUTS"][1])
+    fanoutCount = {}
+    for gate in circuit["GATES"][1]:
+        for term in circuit[gate][1]:
+            fanoutCount[term] = fanoutCount.get(term, 0) + 1
+
+    # Per gate, from gates.py: input pin stuck-at value -> output stuck-at value that is equivalent to it, and
+    # (output stuck-at value, input pin stuck-at value it dominates)
+    for gate in circuit["GATES"][1]:
+        q = gate[5:]
+        equivalent = gates.gateFaults(circuit[gate][0], len(circuit[gate][1]))[0]
+        for term in circuit[gate][1]:
+            j = term[5:]
+            for pinValue in equivalent:
+                union(q + "-IN-" + j + "-SA-" + pinValue, q + "-SA-" + equivalent[pinValue])
+            if fanoutCount[term] == 1 and term not in outputs:
+                union(q + "-IN-" + j + "-SA-0", j + "-SA-0")
+                union(q + "-IN-" + j + "-SA-1", j + "-SA-1")
+
+    # dropped[class] = class it gets counted with instead
+    dropped = {}
+    if dominance:
+        for gate in circuit["GATES"][1]:
+            q = gate[5:]
+            dominates = gates.gateFaults(circuit[gate][0], len(circuit[gate][1]))[1]
+            if dominates == None:
+                continue
+            outValue, pinValue = dominates
+            outClass = find(q + "-SA-" + outValue)
+            # Only a pin in a different class counts; with a single input the two faults are equivalent anyway
+            for term in circuit[gate][1]:
+                pinClass = find(q + "-IN-" + term[5:] + "-SA-" + pinValue)
+                if pinClass != outClass and outClass not in dropped:
+                    dropped[outClass] = pinClass
+                    break
+
+    classes = {}
+    order = []
+    for fault in faultList:
+        rep = find(fault)
+        # Follow the chain of dominance to a class that is kept
+        while rep in dropped:
+            rep = dropped[rep]
+        if rep not in classes:
+            classes[rep] = []
+            order.append(rep)
+        classes[rep].append(fault)
+
+    order.sort(key=lambda rep: position[rep])
+    return [(rep, classes[rep]) for rep in order]
 
-    outFile.write("\n# total faults: " + str(faults_number) + "\n")
+#----------------------------------------------------------------------------------------------------------------------#
+# FUNCTION: Writes the collapsed fault list to outFile (same format as faults, so sim.py reads it the same way), and the
+# mapping back to the full list to mapFile, one line per collapsed fault:
+#   collapsed fault: full list fault, full list fault, ...
+def faultsCollapsed(circuit, outFile, mapFile, dominance):
+    collapsed = collapseFaults(circuit, dominance)
+    total = 0
+    for rep, members in collapsed:
+        total += len(members)
+
+    if dominance:
+        kind = "equivalence and dominance"
+    else:
+        kind = "equivalence"
+    outFile.write("# circuit.bench\n# collapsed SSA fault list (" + kind + ")\n\n")
+    for rep, members in collapsed:
+        outFile.write(rep + "\n")
+    outFile.write("\n# total faults: " + str(len(collapsed)) + " (full list: " + str(total) + ")\n")
+
+    mapFile.write("# circuit.bench\n# collapsed fault: faults of the full SSA fault list it stands for\n\n")
+    for rep, members in collapsed:
+        mapFile.write(rep + ": " + ", ".join(members) + "\n")
 
 # -------------------------------------------------------------------------------------------------------------------- #
-# FUNCTION: Main Function
-def main():
+# FUNCTION: The interactive way of picking the files and options, used when First_part.py is run without any arguments.
+# Returns the same options dictionary main builds from the command line
+def promptOptions():
     # **************************************************************************************************************** #
     # NOTE: UI code; Does not contain anything about the actual simulation
     # Used for file access
@@ -198,15 +225,6 @@ def main():
             else:
                 break
 
-    print("\n Reading " + cktFile + " ... \n")
-    circuit = netRead(cktFile)
-    print("\n Finished processing benchmark file and built netlist dictionary: \n")
-    # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
-    printCkt(circuit)
-
-    # keep an initial (unassigned any value) copy of the circuit for an easy reset
-    # newCircuit = circuit
-
     # Select output file, default is output.txt
     while True:
         outputName = "full_faults.txt"
@@ -217,12 +235,91 @@ def main():
         else:
             outputName = os.path.join(script_dir, userInput)
             break
-    outputFile = open(outputName, "w")
-    faults(circuit, outputFile)
-    outputFile.close()
+    # Select fault collapsing, default is the full list
+    while True:
+        collapsing = "none"
+        print("\n Fault collapsing: use " + collapsing + "?" + " Enter to accept or type equivalence or dominance: ")
+        userInput = input()
+        if userInput == "":
+            break
+        elif userInput in ["equivalence", "dominance"]:
+            collapsing = userInput
+            break
+        else:
+            print("Unknown fault collapsing. \n")
     # Note: UI code;
     # **************************************************************************************************************** #
 
+    # The interactive mode has always shown everything
+    return {"netlist": cktFile, "output": outputName, "collapse": collapsing, "verbosity": TRACE,
+            "cache": True, "cacheDir": None}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads the netlist named in options and writes its fault list (and mapping file when collapsing)
+def writeFaultList(options):
+    global verbosity
+    verbosity = options["verbosity"]
+
+    cktFile = options["netlist"]
+    if verbosity >= NORMAL:
+        print("\n Reading " + cktFile + " ... \n")
+    if options["cache"]:
+        circuit, fromCache = netcache.cachedRead(cktFile, netRead, "netlist", options["cacheDir"])
+        if fromCache and verbosity >= NORMAL:
+            print(" Compiled netlist loaded from the cache \n")
+    else:
+        circuit = netRead(cktFile)
+    if isinstance(circuit, str):
+        return circuit
+    if verbosity >= TRACE:
+        print("\n Finished processing benchmark file and built netlist dictionary: \n")
+        # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
+        printCkt(circuit)
+
+    outputName = options["output"]
+    outputFile = open(outputName, "w")
+    if options["collapse"] == "none":
+        faults(circuit, outputFile)
+    else:
+        # The mapping file goes next to the fault list, with map_ prepended to it
+        mapName = os.path.join(os.path.dirname(outputName), "map_" + os.path.basename(outputName))
+        mapFile = open(mapName, "w")
+        faultsCollapsed(circuit, outputFile, mapFile, options["collapse"] == "dominance")
+        mapFile.close()
+        if verbosity >= NORMAL:
+            print("\n Mapping to the full fault list written to " + mapName)
+    outputFile.close()
+    if verbosity >= NORMAL:
+        print("\n Fault list written to " + outputName)
+    return None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function
+# With no arguments, asks for everything interactively like it always has. Otherwise runs in batch mode, e.g.
+#   python First_part.py circuit.bench -o faults.txt --collapse equivalence
+def main():
+    parser = argparse.ArgumentParser(description="Single stuck-at fault list generator. "
+                                                 "Run without arguments to be asked for everything interactively.")
+    parser.add_argument("netlist", nargs="?", help="circuit benchmark file")
+    parser.add_argument("-o", "--output", default="full_faults.txt", help="fault list file to write (default: full_faults.txt)")
+    parser.add_argument("--collapse", default="none", choices=["none", "equivalence", "dominance"],
+                        help="fault collapsing, also writes a map_ file next to the fault list (default: none)")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="always parse the netlist instead of using the compiled-netlist cache")
+    parser.add_argument("--cache-dir", dest="cacheDir", default=None,
+                        help="where to keep the compiled-netlist cache (default: " + netcache.CACHE_DIR + " next to the netlist)")
+    parser.add_argument("-v", "--verbosity", type=int, default=NORMAL, choices=[QUIET, NORMAL, TRACE],
+                        help="0: nothing, 1: which files are read and written (default), 2: also the netlist as it is read")
+    args = parser.parse_args()
+
+    if args.netlist == None:
+        options = promptOptions()
+    else:
+        options = vars(args)
+
+    if writeFaultList(options) != None:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,297 @@
+from __future__ import print_function
+import os, sys, json, time, random, argparse, platform
+import sim, First_part, gates
+
+# Benchmark suite for sim.py.
+# The circuits in Test_Cases are far too small to show how the engines scale, so this makes random combinational
+# circuits of any size in the same .bench format netRead reads (gate count, depth, fan-in and mix of gate types can all
+# be picked), with a random input vector file and the full fault list from First_part.py next to each one.
+# Then every engine is timed on them: parsing (netRead and levelize), the good circuit alone (the vectors graded
+# against no faults) and fault grading (the vectors graded against the full fault list), all through the same
+# functions sim.py uses, with the files written to the null device. The results go into a JSON file, and a
+# results file from an earlier run can be given to see what got slower.
+
+# Function List:
+# 1. parseMix: reads the gate type mix option
+# 2. generateCircuit: writes a random .bench file, an input vector file and the full fault list
+# 3. timeEngine: times parsing, good circuit simulation and fault grading of one circuit with one engine
+# 4. compareResults: lists the throughputs that got worse than an earlier results file
+# 5. main: The main function
+
+# How much gets printed
+QUIET = 0    # nothing but regressions
+NORMAL = 1   # one line per circuit and engine
+verbosity = NORMAL
+
+# Gate types and how often each is picked, unless --mix says otherwise
+DEFAULT_MIX = "AND=1,NAND=1,OR=1,NOR=1,XOR=1,XNOR=1,NOT=1"
+
+# Engines timed unless -e says otherwise (basic requeues gates and takes far longer than the rest)
+DEFAULT_ENGINES = [engine for engine in sim.ENGINES if engine != "basic"]
+
+# A throughput lower than the baseline by more than this fraction is reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads "AND=2,NAND=1,NOT=0.5" into a list of (gate type, weight).
+# Returns the list, or the error message if a gate type is not one sim.py can simulate or a weight is wrong
+def parseMix(mix):
+    pairs = []
+    for item in mix.split(","):
+        if "=" in item:
+            logic, weight = item.split("=", 1)
+        else:
+            logic, weight = item, "1"
+        logic = logic.strip().upper()
+        if logic not in gates.GATE_TYPES:
+            return "MIX ERROR: UNKNOWN GATE TYPE \"" + logic + "\""
+        try:
+            weight = float(weight)
+        except ValueError:
+            return "MIX ERROR: WEIGHT \"" + weight + "\" OF " + logic + " IS NOT A NUMBER"
+        if weight < 0:
+            return "MIX ERROR: WEIGHT OF " + logic + " IS NEGATIVE"
+        if weight > 0:
+            pairs.append((logic, weight))
+    if len(pairs) == 0:
+        return "MIX ERROR: NO GATE TYPE TO PICK"
+    return pairs
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes a random combinational circuit to netName, with random 0/1 input vectors to inputName and the full
+# fault list (as First_part.py writes it) to faultsName.
+# The gates are spread over depth levels as evenly as possible. Every gate takes its first terminal from the level just
+# before its own (so the circuit really is that deep) and the rest from anywhere before it, fanin terminals at most
+# (BUFF, NOT and the cells like MUX always get the number of terminals they take). Every gate nothing else uses
+# becomes an output.
+# Returns a dictionary describing the circuit
+def generateCircuit(netName, inputName, faultsName, gateCount, inputs, depth, fanin, mix, vectors, seed):
+    rng = random.Random(seed)
+    logics = [logic for logic, weight in mix]
+    weights = [weight for logic, weight in mix]
+    depth = max(1, min(depth, gateCount))
+
+    # levelLines[L] holds the names of the lines at level L, the inputs being level 0
+    levelLines = [["in" + str(i) for i in range(inputs)]]
+    earlier = list(levelLines[0])
+    used = {}
+    gateLines = []
+    counts = {}
+    g = 0
+    for level in range(1, depth + 1):
+        levelSize = gateCount // depth + (1 if level <= gateCount % depth else 0)
+        levelLines.append([])
+        for i in range(levelSize):
+            logic = rng.choices(logics, weights)[0]
+            terms = [rng.choice(levelLines[level - 1])]
+            want = gates.GATE_TYPES[logic].terminals
+            if want == None:
+                want = rng.randint(2, max(2, fanin))
+            while len(terms) < want and len(terms) < len(earlier):
+                term = rng.choice(earlier)
+                if term not in terms:
+                    terms.append(term)
+            # Too few lines for a cell to get different ones on every terminal
+            while len(terms) < want:
+                terms.append(rng.choice(earlier))
+            name = "n" + str(g)
+            g += 1
+            for term in terms:
+                used[term] = True
+            gateLines.append(name + " = " + logic + "(" + ", ".join(terms) + ")")
+            levelLines[level].append(name)
+            counts[logic] = counts.get(logic, 0) + 1
+        earlier.extend(levelLines[level])
+
+    outputs = [name for lines in levelLines[1:] for name in lines if name not in used]
+
+    netFile = open(netName, "w")
+    netFile.write("# " + os.path.basename(netName) + ": random circuit from bench.py, seed " + str(seed) + "\n")
+    netFile.write("# " + str(inputs) + " inputs, " + str(len(outputs)) + " outputs, " + str(gateCount) + " gates, depth " + str(depth) + "\n\n")
+    for x in levelLines[0]:
+        netFile.write("INPUT(" + x + ")\n")
+    netFile.write("\n")
+    for y in outputs:
+        netFile.write("OUTPUT(" + y + ")\n")
+    netFile.write("\n")
+    for line in gateLines:
+        netFile.write(line + "\n")
+    netFile.close()
+
+    inputFile = open(inputName, "w")
+    for k in range(vectors):
+        inputFile.write("".join([rng.choice("01") for i in range(inputs)]) + "\n")
+    inputFile.close()
+
+    First_part.verbosity = First_part.QUIET
+    faultsFile = open(faultsName, "w")
+    First_part.faults(First_part.netRead(netName), faultsFile)
+    faultsFile.close()
+
+    return {"netlist": netName, "inputs": inputs, "outputs": len(outputs), "gates": gateCount, "depth": depth,
+            "fanin": fanin, "mix": counts, "vectors": vectors, "seed": seed}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Times one circuit with one engine, taking the best of repeat runs of each part:
+#   parse: netRead and levelize (no cache)
+#   good: every vector graded against no faults, which only simulates the good circuit
+#   grade: every vector graded against the whole fault list, no fault dropping
+# Throughput counts every gate once per vector (gateEvalsPerSecond), and every fault once per vector
+# (faultVectorsPerSecond). Returns the result dictionary, with "error" set instead of the times if the engine can't run
+def timeEngine(netName, inputName, faultsName, engine, repeat, jobs):
+    result = {"netlist": netName, "engine": engine, "jobs": jobs}
+    if engine == "numpy" and sim.numpy == None:
+        result["error"] = "ENGINE ERROR: THE numpy ENGINE NEEDS NUMPY TO BE INSTALLED"
+        return result
+
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+    nullFile = open(os.devnull, "w")
+
+    best = {}
+    for run in range(repeat):
+        start = time.time()
+        circuit = sim.readLevelized(netName)
+        times = {"parse": time.time() - start}
+        if isinstance(circuit, str):
+            result["error"] = circuit
+            return result
+
+        for part, partFaults in [("good", []), ("grade", faults)]:
+            runStats = {}
+            inputFile = open(inputName, "r", sim.OUTPUT_BUFFER)
+            start = time.time()
+            if engine in sim.GRADERS:
+                detectedFaults = sim.graded_run(circuit, partFaults, engine, inputFile, nullFile, nullFile, nullFile, False, None, None, runStats, jobs)
+            elif engine == "basic":
+                detectedFaults = sim.scalar_run(circuit, partFaults, sim.basic_sim, inputFile, nullFile, nullFile, nullFile, False, None, None, runStats)
+            else:
+                detectedFaults = sim.scalar_run(circuit, partFaults, sim.levelized_sim, inputFile, nullFile, nullFile, nullFile, False, None, None, runStats)
+            times[part] = time.time() - start
+            inputFile.close()
+            if isinstance(detectedFaults, str):
+                result["error"] = detectedFaults
+                return result
+        for part in times:
+            best[part] = min(best.get(part, times[part]), times[part])
+    nullFile.close()
+
+    gateCount = len(circuit["GATES"][1])
+    vectors = runStats["vectors"]
+    result.update({"gates": gateCount, "vectors": vectors, "faults": len(faults), "detected": len(detectedFaults),
+                   "parseSeconds": best["parse"], "goodSeconds": best["good"], "gradeSeconds": best["grade"],
+                   "gateEvalsPerSecond": gateCount * vectors / max(best["good"], 1e-9),
+                   "faultVectorsPerSecond": len(faults) * vectors / max(best["grade"], 1e-9)})
+    return result
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Compares results to the results of an earlier run (matched by circuit file name, engine and jobs).
+# Returns a list of messages, one per throughput that dropped by more than tolerance
+def compareResults(results, baseline, tolerance):
+    before = {}
+    for result in baseline["results"]:
+        before[(os.path.basename(result["netlist"]), result["engine"], result.get("jobs", 1))] = result
+
+    regressions = []
+    for result in results:
+        key = (os.path.basename(result["netlist"]), result["engine"], result["jobs"])
+        if "error" in result or key not in before or "error" in before[key]:
+            continue
+        for measure in ["gateEvalsPerSecond", "faultVectorsPerSecond"]:
+            if result[measure] < before[key][measure] * (1 - tolerance):
+                regressions.append("REGRESSION: " + key[0] + " " + key[1] + " " + measure + " %.0f -> %.0f (%.0f%% slower)"
+                                   % (before[key][measure], result[measure], 100 * (1 - result[measure] / before[key][measure])))
+    return regressions
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function
+# Makes one circuit per --gates value in --dir, times every engine on each, and writes the results, e.g.
+#   python bench.py --gates 1000 5000 --depth 40 --vectors 500 -e event compact parallel --json results.json
+# Circuits already made can be timed instead with --netlist, -i and -f
+def main():
+    global verbosity
+    parser = argparse.ArgumentParser(description="Times the sim.py engines on random circuits (or the given one).")
+    parser.add_argument("--gates", type=int, nargs="+", default=[1000],
+                        help="gate count of each circuit to make (default: 1000)")
+    parser.add_argument("--inputs", type=int, default=32, help="number of inputs (default: 32)")
+    parser.add_argument("--depth", type=int, default=20, help="number of gate levels (default: 20)")
+    parser.add_argument("--fanin", type=int, default=4, help="most terminals a gate gets (default: 4)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="gate types and weights (default: " + DEFAULT_MIX + ")")
+    parser.add_argument("--vectors", type=int, default=200, help="number of random input vectors (default: 200)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    parser.add_argument("--dir", default="benchmarks", help="where the circuits are written (default: benchmarks)")
+    parser.add_argument("--netlist", default=None, help="time this circuit instead of making random ones")
+    parser.add_argument("-i", "--inputs-file", dest="inputsFile", default=None, help="input vector file for --netlist")
+    parser.add_argument("-f", "--faults", default=None, help="fault list file for --netlist")
+    parser.add_argument("-e", "--engines", nargs="+", default=DEFAULT_ENGINES, choices=sim.ENGINES,
+                        help="engines to time (default: every engine but basic)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="worker processes for the grade engines (default: 1)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each part, the best one counts (default: 1)")
+    parser.add_argument("--json", default="bench_results.json", help="results file to write (default: bench_results.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="slowdown reported as a regression, as a fraction (default: " + str(DEFAULT_TOLERANCE) + ")")
+    parser.add_argument("-v", "--verbosity", type=int, default=NORMAL, choices=[QUIET, NORMAL],
+                        help="0: only regressions, 1: one line per circuit and engine (default)")
+    args = parser.parse_args()
+    verbosity = args.verbosity
+    sim.verbosity = sim.QUIET
+
+    if args.netlist != None and (args.inputsFile == None or args.faults == None):
+        parser.error("--netlist needs -i and -f")
+    if min(args.gates) < 1 or args.inputs < 1 or args.depth < 1 or args.fanin < 2 or args.vectors < 1:
+        parser.error("--gates, --inputs, --depth and --vectors must be at least 1, --fanin at least 2")
+    if args.repeat < 1 or args.jobs < 1:
+        parser.error("--repeat and -j/--jobs must be at least 1")
+    mix = parseMix(args.mix)
+    if isinstance(mix, str):
+        parser.error(mix)
+
+    circuits = []
+    if args.netlist != None:
+        circuits.append(({"netlist": args.netlist}, args.netlist, args.inputsFile, args.faults))
+    else:
+        if not os.path.isdir(args.dir):
+            os.makedirs(args.dir)
+        for gateCount in args.gates:
+            base = os.path.join(args.dir, "rand_" + str(gateCount) + "_d" + str(args.depth) + "_s" + str(args.seed))
+            info = generateCircuit(base + ".bench", base + "_input.txt", base + "_faults.txt", gateCount, args.inputs,
+                                   args.depth, args.fanin, mix, args.vectors, args.seed)
+            circuits.append((info, base + ".bench", base + "_input.txt", base + "_faults.txt"))
+
+    results = []
+    for info, netName, inputName, faultsName in circuits:
+        for engine in args.engines:
+            # --jobs only applies to the grade engines
+            result = timeEngine(netName, inputName, faultsName, engine, args.repeat, args.jobs if engine in sim.GRADERS else 1)
+            results.append(result)
+            if verbosity < NORMAL:
+                continue
+            if "error" in result:
+                print(os.path.basename(netName) + " " + engine + ": " + result["error"])
+            else:
+                print("%s %-9s parse %.3fs  good %.3fs (%.0f gate evals/s)  grade %.3fs (%.0f faults x vectors/s)"
+                      % (os.path.basename(netName), engine, result["parseSeconds"], result["goodSeconds"],
+                         result["gateEvalsPerSecond"], result["gradeSeconds"], result["faultVectorsPerSecond"]))
+
+    report = {"python": platform.python_version(), "platform": platform.platform(), "numpy": sim.numpy != None,
+              "circuits": [info for info, netName, inputName, faultsName in circuits], "results": results}
+    jsonFile = open(args.json, "w")
+    json.dump(report, jsonFile, indent=2, sort_keys=True)
+    jsonFile.close()
+    if verbosity >= NORMAL:
+        print("Results written to " + args.json)
+
+    if args.baseline != None:
+        baselineFile = open(args.baseline, "r")
+        regressions = compareResults(results, json.load(baselineFile), args.tolerance)
+        baselineFile.close()
+        for msg in regressions:
+            print(msg)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
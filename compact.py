@@ -0,0 +1,165 @@
+from __future__ import print_function
+import sys, heapq
+from array import array
+import gates
+
+# Compact integer-indexed form of a levelized circuit dictionary.
+# Every line gets an integer ID (inputs and gates in netlist order), gate logic is a small integer (the index of its
+# GateType from gates.py in Circuit.gateTypes, 0 for an input), the terminals and the
+# fanout of every line are flat arrays indexed CSR-style (the terminals of line i are fanin[faninStart[i]:faninStart[i+1]])
+# and the values of all the lines are one bytearray. There is one small object for the whole circuit instead of a list
+# per line, and resetting every line back to U is a single copy into the values buffer.
+
+# Function List:
+# 1. Circuit: the compact circuit, built from the dictionary by Circuit.fromDict
+# 2. Circuit.simulate: runs an (already checked) input line through the good circuit
+# 3. Circuit.simulateFault: runs one fault starting from the good values, only touching what the fault changes
+#    (in a scratch buffer that is put back to the good values afterwards)
+
+# Values are stored as the gates.py value codes: 0 for '0', 1 for 'U' and 2 for '1'
+ZERO = gates.ZERO
+UNKNOWN = gates.UNKNOWN
+ONE = gates.ONE
+VALUE_CHARS = gates.VALUE_CHARS
+VALUE_CODES = gates.VALUE_CODES
+
+
+class Circuit(object):
+    __slots__ = ("names", "ids", "logic", "faninStart", "fanin", "fanoutStart", "fanout", "inputs", "outputs",
+                 "order", "levels", "values", "blank", "gateTypes", "faulty")
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Builds the compact circuit from a circuit dictionary that went through levelize.
+    # Returns the circuit, or the gate logic if one does not exist (the same thing gateCalc reports)
+    @staticmethod
+    def fromDict(circuit):
+        self = Circuit()
+        self.names = [sys.intern(key) for key in circuit if key[0:5] == "wire_"]
+        self.ids = {}
+        for name in self.names:
+            self.ids[name] = len(self.ids)
+
+        self.logic = bytearray(len(self.names))
+        self.gateTypes = [None]
+        codes = {}
+        self.faninStart = array("i", [0])
+        self.fanin = array("i")
+        fanoutCount = [0] * len(self.names)
+        for i in range(len(self.names)):
+            logic = circuit[self.names[i]][0]
+            if logic != "INPUT":
+                if logic not in codes:
+                    if logic not in gates.GATE_TYPES:
+                        return logic
+                    codes[logic] = len(self.gateTypes)
+                    self.gateTypes.append(gates.GATE_TYPES[logic])
+                self.logic[i] = codes[logic]
+                for term in circuit[self.names[i]][1]:
+                    self.fanin.append(self.ids[term])
+                    fanoutCount[self.ids[term]] += 1
+            self.faninStart.append(len(self.fanin))
+
+        # Fanout in the same CSR layout, filled in gate order like levelize does it
+        self.fanoutStart = array("i", [0])
+        for count in fanoutCount:
+            self.fanoutStart.append(self.fanoutStart[-1] + count)
+        self.fanout = array("i", [0]) * len(self.fanin)
+        filled = array("i", self.fanoutStart[:-1])
+        for gate in circuit["GATES"][1]:
+            g = self.ids[gate]
+            for term in self.fanin[self.faninStart[g]:self.faninStart[g + 1]]:
+                self.fanout[filled[term]] = g
+                filled[term] += 1
+
+        self.inputs = array("i", [self.ids[x] for x in circuit["INPUTS"][1]])
+        self.outputs = array("i", [self.ids[y] for y in circuit["OUTPUTS"][1]])
+        self.order = array("i", [self.ids[g] for g in circuit["ORDER"][1]])
+        self.levels = array("i", [circuit["LEVELS"][1][name] for name in self.names])
+        self.blank = bytes(bytearray([UNKNOWN]) * len(self.names))
+        self.values = bytearray(self.blank)
+        self.faulty = bytearray(self.blank)
+        return self
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Sets every line back to U
+    def reset(self):
+        self.values[:] = self.blank
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: The output string of values, first output line as the right-most character
+    def outputString(self, values):
+        return "".join([VALUE_CHARS[values[y]] for y in reversed(self.outputs)])
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Runs an (already checked) input line through the good circuit, in the order from levelize.
+    # Same as inputRead: only the last bits are used, and the right-most bit goes to the first input.
+    # The good values are also copied into the faulty buffer, which simulateFault starts every fault from.
+    # Returns the values buffer
+    def simulate(self, line):
+        self.reset()
+        values = self.values
+        width = len(self.inputs)
+        line = line[(len(line) - width):(len(line))].upper()
+        for i in range(width):
+            values[self.inputs[i]] = VALUE_CODES[line[width - 1 - i]]
+
+        logic = self.logic
+        gateTypes = self.gateTypes
+        evalCodes = gates.evalCodes
+        faninStart = self.faninStart
+        fanin = self.fanin
+        for g in self.order:
+            values[g] = evalCodes(gateTypes[logic[g]], [values[t] for t in fanin[faninStart[g]:faninStart[g + 1]]])
+        self.faulty[:] = values
+        return values
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Runs one fault on top of the good values from simulate. wire and terminal are line IDs (terminal is
+    # None for a stuck-at line) and value the stuck-at value code. Gates are taken in level order, and only the ones
+    # with a terminal that changed are calculated again. This happens in the faulty buffer (a copy of the good values
+    # since simulate), and the lines the fault changed are set back to their good values before returning, so no fault
+    # ever copies the whole buffer.
+    # Returns the faulty output string
+    def simulateFault(self, goodValues, wire, terminal, value):
+        values = self.faulty
+        logic = self.logic
+        gateTypes = self.gateTypes
+        evalCodes = gates.evalCodes
+        faninStart = self.faninStart
+        fanin = self.fanin
+        fanoutStart = self.fanoutStart
+        fanout = self.fanout
+        levels = self.levels
+
+        # A stuck-at terminal is only seen by its own gate, so that gate is where the difference starts
+        if terminal != None:
+            terms = [value if t == terminal else values[t] for t in fanin[faninStart[wire]:faninStart[wire + 1]]]
+            value = evalCodes(gateTypes[logic[wire]], terms)
+        if values[wire] == value:
+            return self.outputString(values)
+        values[wire] = value
+        changed = [wire]
+
+        # Nothing downstream can feed back into the fault site, since levelize already ruled out loops
+        heap = []
+        scheduled = {}
+        for g in fanout[fanoutStart[wire]:fanoutStart[wire + 1]]:
+            if g not in scheduled:
+                scheduled[g] = True
+                heapq.heappush(heap, (levels[g], g))
+        while len(heap) > 0:
+            g = heapq.heappop(heap)[1]
+            newValue = evalCodes(gateTypes[logic[g]], [values[t] for t in fanin[faninStart[g]:faninStart[g + 1]]])
+            if values[g] == newValue:
+                continue
+            values[g] = newValue
+            changed.append(g)
+            for nextGate in fanout[fanoutStart[g]:fanoutStart[g + 1]]:
+                if nextGate not in scheduled:
+                    scheduled[nextGate] = True
+                    heapq.heappush(heap, (levels[nextGate], nextGate))
+
+        output = self.outputString(values)
+        for g in changed:
+            values[g] = goodValues[g]
+        return output
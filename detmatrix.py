@@ -0,0 +1,210 @@
+from __future__ import print_function
+import os, sys, json, zlib, mmap, struct, argparse
+import netcache
+
+# Binary detection matrix of a fault grading run, written by sim.py with --matrix.
+# The faulty_ and display_ text files hold one line per input vector per fault, which gets far too big to keep around
+# for real fault lists. This file holds the same detections as one bit per (input vector, fault): row k of the matrix
+# is the k-th graded input vector, and bit j of a row (byte j // 8, bit j % 8) is set if fault j was detected by it.
+# Input lines with an input error are not graded, so they get no row. With fault dropping a fault is not simulated
+# again once it's detected, so its only bit is the first vector that detected it.
+# File layout (integers little-endian):
+#   magic        8 bytes   b"DETMTRX1"
+#   flags        4 bytes   bit 0 set if the matrix is zlib-compressed
+#   row bytes    4 bytes   bytes in each row, one bit per fault rounded up to whole bytes
+#   vectors      8 bytes   number of rows
+#   header at    8 bytes   where the JSON header starts, right after the matrix
+#   matrix                 vectors x row bytes, memory-mapped by the reader when it isn't compressed
+#   JSON header            netlist, netHash (plain SHA-1 of the netlist file), engine, dropFaults, the fault names
+#                          and the graded input vectors
+# The JSON part goes after the matrix since the vectors are only known once the run is over; the fixed part at the
+# start is filled in when the file is closed.
+
+# Function List:
+# 1. MatrixWriter: writes the file one graded input vector at a time
+# 2. readMatrix: opens a detection matrix file for the functions below
+# 3. vectorRow: the detections of one input vector, as an integer with bit j for fault j
+# 4. vectorCounts: the number of faults each input vector detected
+# 5. firstDetections: the first input vector that detected each fault
+# 6. detectedFaults: every fault detected by any input vector
+# 7. main: The main function
+
+MAGIC = b"DETMTRX1"
+PREFIX = struct.Struct("<8sIIQQ")
+COMPRESSED = 1
+
+
+class MatrixWriter(object):
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Starts the file. header is what goes in the JSON header besides the fault names and the vectors
+    # (netlist, netHash, engine and dropFaults, when sim.py writes it)
+    def __init__(self, fileName, faultNames, header, compress):
+        self.outFile = open(fileName, "wb")
+        self.faultNames = faultNames
+        self.header = header
+        self.rowBytes = (len(faultNames) + 7) // 8
+        self.vectors = []
+        self.compressor = None
+        if compress:
+            self.compressor = zlib.compressobj()
+        self.outFile.write(PREFIX.pack(MAGIC, 0, self.rowBytes, 0, 0))
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Adds the row of one graded input vector, given the indices of the faults it detected
+    def addVector(self, line, detected):
+        row = bytearray(self.rowBytes)
+        for j in detected:
+            row[j >> 3] |= 1 << (j & 7)
+        self.vectors.append(line)
+        if self.compressor != None:
+            self.outFile.write(self.compressor.compress(bytes(row)))
+        else:
+            self.outFile.write(row)
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Writes the JSON header, then fills in the fixed part at the start of the file
+    def close(self):
+        flags = 0
+        if self.compressor != None:
+            self.outFile.write(self.compressor.flush())
+            flags |= COMPRESSED
+        headerAt = self.outFile.tell()
+        header = dict(self.header)
+        header["faults"] = self.faultNames
+        header["vectors"] = self.vectors
+        self.outFile.write(json.dumps(header).encode("utf-8"))
+        self.outFile.seek(0)
+        self.outFile.write(PREFIX.pack(MAGIC, flags, self.rowBytes, len(self.vectors), headerAt))
+        self.outFile.close()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Opens a detection matrix file. Returns the JSON header with "rowBytes", "rows" (the matrix, memory-mapped
+# or decompressed) and "start" (where the matrix starts in rows) added, or the error message
+def readMatrix(fileName):
+    matrixFile = open(fileName, "rb")
+    prefix = matrixFile.read(PREFIX.size)
+    if len(prefix) < PREFIX.size or prefix[0:8] != MAGIC:
+        matrixFile.close()
+        return "MATRIX ERROR: \"" + fileName + "\" IS NOT A DETECTION MATRIX FILE"
+    magic, flags, rowBytes, vectors, headerAt = PREFIX.unpack(prefix)
+    shortMsg = "MATRIX ERROR: \"" + fileName + "\" IS CUT SHORT"
+    # A file cut anywhere past the fixed part loses the end of the JSON header (or all of it)
+    matrixFile.seek(headerAt)
+    try:
+        header = json.loads(matrixFile.read().decode("utf-8"))
+    except ValueError:
+        matrixFile.close()
+        return shortMsg
+    header["rowBytes"] = rowBytes
+
+    # Bytes of matrix before the header; the memory map holds the header too, so its length can't be used
+    if flags & COMPRESSED:
+        matrixFile.seek(PREFIX.size)
+        try:
+            header["rows"] = zlib.decompress(matrixFile.read(headerAt - PREFIX.size))
+        except zlib.error:
+            matrixFile.close()
+            return shortMsg
+        header["start"] = 0
+        matrixBytes = len(header["rows"])
+    elif headerAt == PREFIX.size:
+        # Nothing to map
+        header["rows"] = b""
+        header["start"] = 0
+        matrixBytes = 0
+    else:
+        header["rows"] = mmap.mmap(matrixFile.fileno(), 0, access=mmap.ACCESS_READ)
+        header["start"] = PREFIX.size
+        matrixBytes = headerAt - PREFIX.size
+    matrixFile.close()
+
+    if len(header["vectors"]) != vectors or matrixBytes < vectors * rowBytes:
+        return shortMsg
+    return header
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The detections of input vector k, as an integer where bit j is set if fault j was detected
+def vectorRow(matrix, k):
+    start = matrix["start"] + k * matrix["rowBytes"]
+    return int.from_bytes(matrix["rows"][start:start + matrix["rowBytes"]], "little")
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The number of faults each input vector detected
+def vectorCounts(matrix):
+    return [bin(vectorRow(matrix, k)).count("1") for k in range(len(matrix["vectors"]))]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The index of the first input vector that detected each fault, None for the ones never detected.
+# Only the faults not seen yet are looked at in each row, and it stops once every fault has been seen
+def firstDetections(matrix):
+    first = [None] * len(matrix["faults"])
+    remaining = (1 << len(first)) - 1
+    for k in range(len(matrix["vectors"])):
+        new = vectorRow(matrix, k) & remaining
+        if new == 0:
+            continue
+        remaining &= ~new
+        while new != 0:
+            low = new & -new
+            first[low.bit_length() - 1] = k
+            new ^= low
+        if remaining == 0:
+            break
+    return first
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Every fault detected by any input vector, as an integer where bit j is set if fault j was detected
+def detectedFaults(matrix):
+    detected = 0
+    for k in range(len(matrix["vectors"])):
+        detected |= vectorRow(matrix, k)
+    return detected
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function, e.g.
+#   python detmatrix.py results.dmx --first --counts
+def main():
+    parser = argparse.ArgumentParser(description="Reads a detection matrix file written by sim.py --matrix.")
+    parser.add_argument("matrix", help="detection matrix file")
+    parser.add_argument("--netlist", default=None, help="check the matrix was made from this netlist")
+    parser.add_argument("--first", action="store_true", help="list the first input vector that detected each fault")
+    parser.add_argument("--counts", action="store_true", help="list the number of faults each input vector detected")
+    parser.add_argument("--undetected", action="store_true", help="list the faults no input vector detected")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.matrix):
+        print("MATRIX ERROR: \"" + args.matrix + "\" DOES NOT EXIST")
+        sys.exit(1)
+    matrix = readMatrix(args.matrix)
+    if isinstance(matrix, str):
+        print(matrix)
+        sys.exit(1)
+
+    faults = matrix["faults"]
+    detected = detectedFaults(matrix)
+    detectedCount = bin(detected).count("1")
+    print("Detection matrix of " + matrix["netlist"] + " (" + matrix["engine"] + " engine" + (", fault dropping" if matrix["dropFaults"] else "") + "): "
+          + str(len(matrix["vectors"])) + " input vectors, " + str(len(faults)) + " faults")
+    if args.netlist != None and netcache.contentHash(args.netlist) != matrix["netHash"]:
+        print("The matrix was NOT made from " + args.netlist + " as it is now")
+    print("Number of detected faults: " + str(detectedCount))
+    if len(faults) > 0:
+        print("Fault coverage: %.2f" % (float(detectedCount) / len(faults)))
+
+    if args.counts:
+        counts = vectorCounts(matrix)
+        for k in range(len(counts)):
+            print(matrix["vectors"][k] + " -> " + str(counts[k]) + " faults detected")
+    if args.first:
+        first = firstDetections(matrix)
+        for j in range(len(faults)):
+            if first[j] != None:
+                print(faults[j] + " first detected by input vector " + str(first[j] + 1) + ": " + matrix["vectors"][first[j]])
+    if args.undetected:
+        for j in range(len(faults)):
+            if not (detected >> j) & 1:
+                print(faults[j] + " not detected")
+
+
+if __name__ == "__main__":
+    main()
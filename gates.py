@@ -0,0 +1,251 @@
+from __future__ import print_function
+import re
+
+# Gate library shared by every simulation engine in sim.py (and by compact.py, the fault collapsing in First_part.py
+# and bench.py). Every gate type is described once, by one of three kinds of descriptor, and each engine has a single
+# evaluation function driven by the descriptor instead of one branch per gate type:
+#   control: AND-like gates. A terminal at the controlling value decides the output, otherwise any U terminal makes it
+#            U, otherwise the output is the non-controlling value; inverting gates flip the result. AND, NAND, OR, NOR,
+#            and with a single terminal BUFF and NOT. Any fan-in is reduced by one membership test per value
+#   parity:  XOR and XNOR. Any U terminal makes the output U, otherwise it's the parity of the 1's (flipped for XNOR)
+#   table:   cells with a fixed number of terminals, given as a boolean expression (MUX, AOI/OAI, or user cells from
+#            a cell library file). The expression is expanded once into a three-valued truth table over '0', '1' and
+#            'U' (a U terminal only gives a known output if both of its values give the same one), so evaluating a
+#            cell is one lookup, and into the prime implicants of the output being 1 and being 0, which the
+#            bit-parallel engines evaluate as an OR of ANDs of the terminal bit-planes
+# Values are the characters '0', '1' and 'U', or the codes 0 (for '0'), 1 (for 'U') and 2 (for '1') compact.py uses.
+
+# Function List:
+# 1. GateType: the descriptor of one gate type
+# 2. defineCell: adds a table gate type from its boolean expression
+# 3. primeCubes: the prime implicants of a table cell, for the bit-parallel engines
+# 4. readCells / defineCells: adds the cells of a cell library file
+# 5. evalChars: output value of a gate from the values of its terminals
+# 6. evalCodes: same, on value codes
+# 7. gateFaults: which stuck-at faults of a gate are structurally equivalent, and which one dominates which
+
+CONTROL = 0
+PARITY = 1
+TABLE = 2
+
+# Value codes, in this order so that AND is the smallest terminal code, OR the largest and NOT is 2 minus the code
+ZERO = 0
+UNKNOWN = 1
+ONE = 2
+VALUE_CHARS = "0U1"
+VALUE_CODES = {"0": ZERO, "U": UNKNOWN, "1": ONE}
+
+# Most terminals a table cell can have; its truth table has 3 to the power of this many entries
+CELL_MAX_TERMINALS = 8
+
+# Cells that come with the simulator, in the same format as a cell library file: NAME(terminals) = expression, with
+# ~ for NOT, & for AND, | for OR and ^ for XOR
+BUILTIN_CELLS = """
+MUX(a, b, s) = (a & ~s) | (b & s)
+AOI21(a, b, c) = ~((a & b) | c)
+AOI22(a, b, c, d) = ~((a & b) | (c & d))
+OAI21(a, b, c) = ~((a | b) & c)
+OAI22(a, b, c, d) = ~((a | b) & (c | d))
+"""
+
+# One line of a cell library file
+CELL_LINE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*\(\s*([^()]*?)\s*\)\s*=\s*([A-Za-z0-9_\s()~&|^]+?)\s*$")
+
+
+class GateType(object):
+    __slots__ = ("name", "kind", "terminals", "invert", "control", "controlled", "uncontrolled", "parity",
+                 "expression", "table", "codes", "ones", "zeros")
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: A control or parity gate type. terminals is the number of terminals it must have (None for any).
+    # control is the controlling value ('0' or '1') of a control gate
+    def __init__(self, name, kind, terminals, invert, control=None):
+        self.name = name
+        self.kind = kind
+        self.terminals = terminals
+        self.invert = invert
+        self.control = control
+        self.expression = None
+        self.table = None
+        self.codes = None
+        self.ones = None
+        self.zeros = None
+        flip = {"0": "1", "1": "0"}
+        if kind == CONTROL:
+            self.controlled = flip[control] if invert else control
+            self.uncontrolled = control if invert else flip[control]
+        if kind == PARITY:
+            self.parity = "10" if invert else "01"
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: The value to put on the other terminals so the output follows one terminal, None for a table cell
+    def nonControlling(self):
+        if self.kind == CONTROL:
+            return "1" if self.control == "0" else "0"
+        if self.kind == PARITY:
+            return "0"
+        return None
+
+
+# gate type name (as it appears in the netlist, upper case) -> GateType
+GATE_TYPES = {
+    "AND": GateType("AND", CONTROL, None, False, "0"),
+    "NAND": GateType("NAND", CONTROL, None, True, "0"),
+    "OR": GateType("OR", CONTROL, None, False, "1"),
+    "NOR": GateType("NOR", CONTROL, None, True, "1"),
+    "BUFF": GateType("BUFF", CONTROL, 1, False, "0"),
+    "NOT": GateType("NOT", CONTROL, 1, True, "0"),
+    "XOR": GateType("XOR", PARITY, None, False),
+    "XNOR": GateType("XNOR", PARITY, None, True),
+}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Adds the table gate type name with the given terminal names, output given by the boolean expression.
+# Returns the GateType, or the error message
+def defineCell(name, terminals, expression):
+    name = name.upper()
+    if name in GATE_TYPES and GATE_TYPES[name].kind != TABLE:
+        return "CELL ERROR: \"" + name + "\" IS A BUILT-IN GATE TYPE"
+    if len(terminals) == 0 or len(terminals) > CELL_MAX_TERMINALS:
+        return "CELL ERROR: \"" + name + "\" NEEDS 1 TO " + str(CELL_MAX_TERMINALS) + " TERMINALS"
+    if len(set(terminals)) < len(terminals):
+        return "CELL ERROR: \"" + name + "\" HAS THE SAME TERMINAL NAME TWICE"
+    try:
+        code = compile(expression, "<cell " + name + ">", "eval")
+    except SyntaxError:
+        return "CELL ERROR: CAN NOT READ THE EXPRESSION OF \"" + name + "\""
+    for used in code.co_names:
+        if used not in terminals:
+            return "CELL ERROR: \"" + used + "\" IN \"" + name + "\" IS NOT ONE OF ITS TERMINALS"
+
+    # The three-valued table, from the keys with no U up: a U terminal gives a known output only if the same key with
+    # that terminal at 0 and at 1 give the same known output
+    n = len(terminals)
+    table = {}
+    keys = [""]
+    for i in range(n):
+        keys = [key + value for key in keys for value in "01U"]
+    keys.sort(key=lambda key: key.count("U"))
+    for key in keys:
+        u = key.find("U")
+        if u == -1:
+            values = dict(zip(terminals, [int(value) for value in key]))
+            table[key] = str(eval(code, {"__builtins__": {}}, values) & 1)
+            continue
+        low = table[key[:u] + "0" + key[u + 1:]]
+        high = table[key[:u] + "1" + key[u + 1:]]
+        table[key] = low if low == high else "U"
+    if table["U" * n] != "U":
+        return "CELL ERROR: \"" + name + "\" ALWAYS GIVES " + table["U" * n]
+
+    gate = GateType(name, TABLE, n, False)
+    gate.expression = expression
+    gate.table = table
+    gate.codes = {}
+    for key in table:
+        gate.codes[bytes(bytearray([VALUE_CODES[value] for value in key]))] = VALUE_CODES[table[key]]
+    gate.ones = primeCubes(table, "1")
+    gate.zeros = primeCubes(table, "0")
+    GATE_TYPES[name] = gate
+    return gate
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The prime implicants of the table output being value, as lists of (terminal index, 0 or 1).
+# A key of the table with U's is a cube; it is an implicant if its output is value, and prime if turning any of its
+# known terminals into a U loses that
+def primeCubes(table, value):
+    cubes = []
+    for key in sorted(table):
+        if table[key] != value:
+            continue
+        prime = True
+        for i in range(len(key)):
+            if key[i] != "U" and table[key[:i] + "U" + key[i + 1:]] == value:
+                prime = False
+                break
+        if prime:
+            cubes.append([(i, int(key[i])) for i in range(len(key)) if key[i] != "U"])
+    return cubes
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Adds every cell of a cell library file, one per line as NAME(terminals) = expression, # for comments.
+# Returns the list of cell names, or the error message
+def readCells(cellsName):
+    cellsFile = open(cellsName, "r")
+    lines = cellsFile.read().split("\n")
+    cellsFile.close()
+    return defineCells(lines, cellsName)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Adds the cells of the lines of a cell library, source being where they came from for the error messages
+def defineCells(lines, source):
+    names = []
+    for lineNumber in range(1, len(lines) + 1):
+        line = lines[lineNumber - 1].split("#")[0].strip()
+        if line == "":
+            continue
+        match = CELL_LINE.match(line)
+        if match == None:
+            return "CELL ERROR: CAN NOT READ LINE " + str(lineNumber) + " OF " + source + ": \"" + line + "\""
+        terminals = [term.strip() for term in match.group(2).split(",")]
+        gate = defineCell(match.group(1), terminals, match.group(3))
+        if isinstance(gate, str):
+            return gate + " (LINE " + str(lineNumber) + " OF " + source + ")"
+        names.append(gate.name)
+    return names
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Output value ('0', '1' or 'U') of a gate of the given type (a GateType from GATE_TYPES), given the list of
+# its terminal values
+def evalChars(gate, values):
+    if gate.kind == CONTROL:
+        if gate.control in values:
+            return gate.controlled
+        if "U" in values:
+            return "U"
+        return gate.uncontrolled
+    if gate.kind == PARITY:
+        if "U" in values:
+            return "U"
+        return gate.parity[values.count("1") & 1]
+    return gate.table["".join(values)]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Same as evalChars, on a list of value codes. Returns the output value code
+def evalCodes(gate, codes):
+    if gate.kind == CONTROL:
+        if gate.control == "0":
+            code = min(codes)
+        else:
+            code = max(codes)
+        if gate.invert:
+            return ONE - code
+        return code
+    if gate.kind == PARITY:
+        if UNKNOWN in codes:
+            return UNKNOWN
+        if (codes.count(ONE) & 1) != gate.invert:
+            return ONE
+        return ZERO
+    return gate.codes[bytes(bytearray(codes))]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The structural fault relations of a gate type with the given number of terminals, for fault collapsing.
+# Returns (equivalent, dominates): equivalent maps a terminal stuck-at value to the output stuck-at value no test can
+# tell it apart from, and dominates is (output stuck-at value, terminal stuck-at value) where every test for the
+# terminal fault also detects the output fault, or None. Only control gates have any
+def gateFaults(logic, terminals):
+    gate = GATE_TYPES.get(logic)
+    if gate == None or gate.kind != CONTROL:
+        return {}, None
+    flip = {"0": "1", "1": "0"}
+    # With a single terminal the gate is a buffer or an inverter, and both values go straight through
+    if terminals == 1:
+        if gate.invert:
+            return {"0": "1", "1": "0"}, None
+        return {"0": "0", "1": "1"}, None
+    return {gate.control: gate.controlled}, (gate.uncontrolled, flip[gate.control])
+
+
+# The built-in cells are defined the same way a cell library file is
+defineCells(BUILTIN_CELLS.split("\n"), "the built-in cells")
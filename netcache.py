@@ -0,0 +1,174 @@
+from __future__ import print_function
+import os, hashlib, pickle
+import gates
+
+# Compiled-netlist cache shared by sim.py and First_part.py.
+# After a netlist is parsed once, a compact form of it (integer line IDs, gate logic, terminal tables and, when the
+# netlist was levelized, the topological order and levels) is pickled into a __netcache__ directory next to the .bench
+# file. The file name holds a hash of the netlist contents, so an edited netlist never matches an old entry, and the
+# old entries of that netlist are deleted when the new one is written.
+
+# Function List:
+# 1. netHash: hash of the netlist file contents and the cache version, names the cache entries
+# 2. contentHash: plain SHA-1 of the netlist file contents, for the files other tools check a netlist against
+# 3. compileCircuit: turns a circuit dictionary into the compact form that is stored
+# 4. expandCircuit: rebuilds the circuit dictionary from the compact form
+# 5. knownGates: checks the gate types of a circuit from the cache are all known right now
+# 6. cachedRead: returns the circuit from the cache, or parses it and stores it
+
+# Bumped whenever the compact form changes, so entries written by an older version are never loaded
+CACHE_VERSION = 3
+
+# Name of the directory made next to the netlist when no other cache directory is given
+CACHE_DIR = "__netcache__"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Hash of the netlist file contents (and the cache version)
+def netHash(netName):
+    netFile = open(netName, "rb")
+    digest = hashlib.sha1(("netcache " + str(CACHE_VERSION) + "\n").encode("ascii"))
+    digest.update(netFile.read())
+    netFile.close()
+    return digest.hexdigest()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Plain SHA-1 of the netlist file contents. Unlike netHash it doesn't change with CACHE_VERSION, so it is the
+# one written into fault dictionaries and detection matrices (the same as sha1sum gives for the netlist)
+def contentHash(netName):
+    netFile = open(netName, "rb")
+    digest = hashlib.sha1(netFile.read())
+    netFile.close()
+    return digest.hexdigest()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Turns a circuit dictionary from netRead (and levelize, if it was run) into plain lists of integers.
+# Every line gets an ID: the inputs and gates in netlist order, then any line that is used but never driven
+def compileCircuit(circuit):
+    names = [key for key in circuit if key[0:5] == "wire_"]
+    ids = {}
+    for name in names:
+        ids[name] = len(ids)
+    logic = [circuit[name][0] for name in names]
+
+    # Terminals and outputs that are never driven still need an ID, levelize reports them later
+    undriven = []
+    for name in circuit["GATES"][1]:
+        for term in circuit[name][1]:
+            if term not in ids:
+                ids[term] = len(ids)
+                undriven.append(term)
+    for y in circuit["OUTPUTS"][1]:
+        if y not in ids:
+            ids[y] = len(ids)
+            undriven.append(y)
+
+    compiled = {
+        "names": names + undriven,
+        "logic": logic,
+        "terms": [[ids[term] for term in circuit[name][1]] if logic[i] != "INPUT" else [] for i, name in enumerate(names)],
+        "inputs": [ids[x] for x in circuit["INPUTS"][1]],
+        "outputs": [ids[y] for y in circuit["OUTPUTS"][1]],
+        "gates": [ids[g] for g in circuit["GATES"][1]],
+    }
+    if "ORDER" in circuit:
+        compiled["order"] = [ids[g] for g in circuit["ORDER"][1]]
+        compiled["levels"] = [(ids[x], level) for x, level in circuit["LEVELS"][1].items()]
+    return compiled
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Rebuilds the same circuit dictionary compileCircuit was given, with every line reset to U
+def expandCircuit(compiled):
+    names = compiled["names"]
+    circuit = {}
+    for i in range(len(compiled["logic"])):
+        if compiled["logic"][i] == "INPUT":
+            circuit[names[i]] = ["INPUT", names[i], False, 'U']
+        else:
+            circuit[names[i]] = [compiled["logic"][i], [names[t] for t in compiled["terms"][i]], False, 'U']
+
+    inputs = [names[i] for i in compiled["inputs"]]
+    gates = [names[i] for i in compiled["gates"]]
+    circuit["INPUT_WIDTH"] = ["input width:", len(inputs)]
+    circuit["INPUTS"] = ["Input list", inputs]
+    circuit["OUTPUTS"] = ["Output list", [names[i] for i in compiled["outputs"]]]
+    circuit["GATES"] = ["Gate list", gates]
+
+    if "order" in compiled:
+        # Built the same way levelize builds it, so the lists come out in the same order
+        fanout = {}
+        for x in inputs:
+            fanout[x] = []
+        for gate in gates:
+            fanout[gate] = []
+        for gate in gates:
+            for term in circuit[gate][1]:
+                fanout[term].append(gate)
+        levels = {}
+        for i, level in compiled["levels"]:
+            levels[names[i]] = level
+        circuit["ORDER"] = ["Topological order", [names[i] for i in compiled["order"]]]
+        circuit["LEVELS"] = ["Level of each line", levels]
+        circuit["FANOUT"] = ["Fanout list", fanout]
+    return circuit
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The cells of a --cells library are not part of the netlist file, so its hash doesn't change when they do.
+# A circuit from the cache is only used if every gate type in it is known now, with the number of terminals it takes;
+# otherwise the netlist is parsed again, which reports the gate the same way it would without the cache
+def knownGates(circuit):
+    for gate in circuit["GATES"][1]:
+        gateType = gates.GATE_TYPES.get(circuit[gate][0])
+        if gateType == None:
+            return False
+        if gateType.terminals != None and len(circuit[gate][1]) != gateType.terminals:
+            return False
+    return True
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Gives back the circuit of netName, from the cache if the netlist has not changed since it was stored.
+# Otherwise read(netName) parses it, and the result is stored unless it is an error message.
+# tag keeps apart the forms of the same netlist (e.g. "netlist" straight from netRead, "levelized" after levelize).
+# cacheDir defaults to __netcache__ next to the netlist. Anything going wrong with the cache files just means parsing
+# again, since the cache is only there to save time. Returns the circuit and True if it came from the cache
+def cachedRead(netName, read, tag, cacheDir=None):
+    if cacheDir == None:
+        cacheDir = os.path.join(os.path.dirname(netName), CACHE_DIR)
+    base = os.path.basename(netName)
+    digest = netHash(netName)
+    cacheName = os.path.join(cacheDir, base + "." + digest + "." + tag + ".pickle")
+
+    try:
+        cacheFile = open(cacheName, "rb")
+        try:
+            compiled = pickle.load(cacheFile)
+        finally:
+            cacheFile.close()
+        circuit = expandCircuit(compiled)
+        if knownGates(circuit):
+            return circuit, True
+    except Exception:
+        pass
+
+    circuit = read(netName)
+    if isinstance(circuit, str):
+        return circuit, False
+
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        # Written under a temporary name first, so a run reading the cache at the same time never sees half a file
+        tempName = cacheName + "." + str(os.getpid()) + ".tmp"
+        cacheFile = open(tempName, "wb")
+        pickle.dump(compileCircuit(circuit), cacheFile, pickle.HIGHEST_PROTOCOL)
+        cacheFile.close()
+        os.replace(tempName, cacheName)
+
+        # The entries of the old contents of this netlist can never be used again
+        for name in os.listdir(cacheDir):
+            if name.startswith(base + ".") and name.endswith("." + tag + ".pickle") and name != os.path.basename(cacheName):
+                if len(name) == len(base) + 1 + len(digest) + 1 + len(tag) + len(".pickle"):
+                    os.remove(os.path.join(cacheDir, name))
+    except (OSError, IOError):
+        pass
+
+    return circuit, False
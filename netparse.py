@@ -0,0 +1,115 @@
+from __future__ import print_function
+import re, sys, gc
+
+# Single-pass .bench parser shared by sim.py and First_part.py (their netRead functions are wrappers around it).
+# The file is read and decoded in one call, split into lines by one compiled regular expression run over the whole
+# text, every line name is interned, and nothing is printed while reading. The garbage collector is paused while the
+# circuit is built, since it would otherwise walk the half-built dictionary again and again for nothing. It builds
+# the same circuit dictionary the old line-by-line netRead did:
+#   circuit["wire_X"] = ["INPUT", "wire_X", False, 'U']  or  [logic, [terminal lines], False, 'U']
+#   plus INPUT_WIDTH, INPUTS, OUTPUTS and GATES
+# Accepted on top of the old INPUT(x) / OUTPUT(y) / z = LOGIC(a, b, ...) lines:
+#   - any mix of upper and lower case in INPUT, OUTPUT and the gate types, spaces and tabs anywhere between the
+#     parts, comments at the end of a line, and Windows line endings
+#   - BUFF (or BUF) from ISCAS-85, a gate type of its own in gates.py like the cells (MUX, AOI21, ...); which gate
+#     types exist is only checked by levelize, so cells from a cell library can be read too
+#   - DFF from ISCAS-89, as a full-scan flip-flop: its output Q becomes one more input of the circuit (after the
+#     INPUT lines) and its D terminal one more output (after the OUTPUT lines), which cuts every sequential loop
+# Errors come back as a "NETLIST ERROR: ..." message with the line number in it.
+
+# Function List:
+# 1. parseBench: reads a .bench file into the circuit dictionary
+# 2. parseText: the parser itself, on the contents of the file
+
+# One line of the netlist: an INPUT/OUTPUT declaration, a gate, or anything else (the last group, an error unless it
+# is empty), then an optional comment. Every line of the text gives exactly one match, so match i is line i + 1
+LINE = re.compile(r"""
+    ^[ \t]*
+    (?:
+        ((?i:INPUT|OUTPUT)) [ \t]* \( [ \t]* ([^\s(),=\#]+) [ \t]* \)
+      | ([^\s(),=\#]+) [ \t]* = [ \t]* ([A-Za-z_][A-Za-z0-9_]*) [ \t]* \( ([^()\n\#]*) \)
+      | ([^\n]*?)
+    )
+    [ \t\r]* (?:\#[^\n]*)? $
+""", re.X | re.M)
+
+# Gate types read as another gate type with the same behaviour
+LOGIC_ALIASES = {"BUF": "BUFF"}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads the .bench file netName. Returns the circuit dictionary, or the error message
+def parseBench(netName):
+    netFile = open(netName, "rb")
+    text = netFile.read().decode("utf-8", "replace")
+    netFile.close()
+
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return parseText(text)
+    finally:
+        if collecting:
+            gc.enable()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The parser itself, on the text of the file
+def parseText(text):
+    intern = sys.intern
+    inputs = []
+    outputs = []
+    gates = []
+    scanInputs = []     # DFF outputs, added to the inputs at the end
+    scanOutputs = []    # DFF terminals, added to the outputs at the end
+    circuit = {}
+
+    lineNumber = 0
+    for keyword, name, out, logic, terms, other in LINE.findall(text):
+        lineNumber += 1
+
+        # Gate line: the terminals get "wire_" in front of them all at once, so an empty one shows up as "wire_"
+        if out:
+            gateOut = intern("wire_" + out)
+            if gateOut in circuit:
+                return "NETLIST ERROR: GATE OUTPUT LINE \"" + gateOut + "\" ALREADY EXISTS PREVIOUSLY IN NETLIST (LINE " + str(lineNumber) + ")"
+            terms = ("wire_" + terms.replace(" ", "").replace("\t", "").replace(",", ",wire_")).split(",")
+            if "wire_" in terms:
+                return "NETLIST ERROR: GATE \"" + gateOut + "\" HAS AN EMPTY TERMINAL (LINE " + str(lineNumber) + ")"
+            terms = list(map(intern, terms))
+
+            logic = logic.upper()
+            if logic == "DFF":
+                if len(terms) != 1:
+                    return "NETLIST ERROR: DFF \"" + gateOut + "\" NEEDS EXACTLY ONE TERMINAL (LINE " + str(lineNumber) + ")"
+                circuit[gateOut] = ["INPUT", gateOut, False, 'U']
+                scanInputs.append(gateOut)
+                scanOutputs.append(terms[0])
+                continue
+
+            gates.append(gateOut)
+            circuit[gateOut] = [LOGIC_ALIASES.get(logic, logic), terms, False, 'U']
+            continue
+
+        if keyword:
+            line = intern("wire_" + name)
+            if keyword.upper() == "INPUT":
+                if line in circuit:
+                    return "NETLIST ERROR: INPUT LINE \"" + line + "\" ALREADY EXISTS PREVIOUSLY IN NETLIST (LINE " + str(lineNumber) + ")"
+                inputs.append(line)
+                circuit[line] = ["INPUT", line, False, 'U']
+            else:
+                outputs.append(line)
+            continue
+
+        # Blank lines and comments leave nothing over
+        if other:
+            return "NETLIST ERROR: CAN NOT READ LINE " + str(lineNumber) + ": \"" + other + "\""
+
+    # The scan flip-flops go after the real inputs and outputs. The first input is still the right-most bit of an input
+    # line, so the flip-flop values are the left-most bits
+    inputs.extend(scanInputs)
+    outputs.extend(scanOutputs)
+    circuit["INPUT_WIDTH"] = ["input width:", len(inputs)]
+    circuit["INPUTS"] = ["Input list", inputs]
+    circuit["OUTPUTS"] = ["Output list", outputs]
+    circuit["GATES"] = ["Gate list", gates]
+    return circuit
@@ -0,0 +1,326 @@
+from __future__ import print_function
+import os, sys, io, json, time, socket, argparse, tempfile
+from collections import OrderedDict
+
+# Simulation server for flows that run sim.py over and over on the same few netlists.
+# "python server.py serve" starts a daemon listening on a Unix socket. It keeps the parsed and levelized circuits in
+# an LRU cache keyed by netlist path and contents hash, so a netlist is only parsed again when it changes, and answers
+# requests (simulate these vectors, grade these faults) with the same sim.py functions the command line uses. asyncio
+# handles the connections, and the simulation itself runs in a pool of worker processes, each with its own cache.
+# The other commands are the client: they send one request and write the answer the way sim.py writes its files.
+# The client only needs socket and json, so sim.py is not even imported on that side and each call starts quickly.
+#
+# Requests and answers are one line of JSON each, any number of them per connection:
+#   {"op": "grade", "netlist": "/abs/c17.bench", "vectors": ["10101", ...], "faults": ["1-SA-0", ...],
+#    "engine": "event", "drop": false, "target": null, "window": null, "faulty": true}
+#     -> {"output": "<output file text>", "faultyOutput": "<faulty output file text>", "detected": [...],
+#         "faults": 22, "vectors": 5, "cached": true, "seconds": 0.002}
+#   "simulate" is the same without faults, "stats" gives the request counts, "stop" shuts the server down.
+#   Anything that goes wrong comes back as {"error": "..."}
+# Unix sockets don't exist on Windows, so neither does the server there.
+
+# Function List:
+# 1. workerInit / workerCircuit / workerRequest: the worker processes, with their LRU cache of circuits
+# 2. serve: the asyncio server
+# 3. request: sends one request to the server and returns the answer
+# 4. main: The main function, with the serve, simulate, grade, stats and stop commands
+
+# Where the server listens unless --socket says otherwise
+SOCKET_PATH = os.path.join(tempfile.gettempdir(), "sim_server.sock")
+
+# Number of circuits each worker keeps
+CACHE_SIZE = 8
+
+# Engine used unless the request says otherwise
+DEFAULT_ENGINE = "event"
+
+# The circuits of this worker process: (netlist path, contents hash) -> levelized circuit, least recently used first
+CIRCUITS = OrderedDict()
+cacheSize = CACHE_SIZE
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs once in every worker process. cellsName is the cell library file to read, or None
+def workerInit(size, cellsName):
+    global cacheSize
+    import sim, gates
+    sim.verbosity = sim.QUIET
+    cacheSize = size
+    if cellsName != None:
+        gates.readCells(cellsName)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The levelized circuit of netName, from this worker's cache if the netlist has not changed.
+# Returns the circuit and True if it came from the cache, or the error message
+def workerCircuit(netName):
+    import sim, netcache
+    if not os.path.isfile(netName):
+        return "SERVER ERROR: NETLIST " + netName + " DOES NOT EXIST", False
+    key = (netName, netcache.netHash(netName))
+    if key in CIRCUITS:
+        CIRCUITS.move_to_end(key)
+        return CIRCUITS[key], True
+
+    circuit = sim.readLevelized(netName)
+    if isinstance(circuit, str):
+        return circuit, False
+    # An edited netlist replaces the old entry of the same path instead of pushing something else out
+    for oldKey in [oldKey for oldKey in CIRCUITS if oldKey[0] == netName]:
+        del CIRCUITS[oldKey]
+    CIRCUITS[key] = circuit
+    while len(CIRCUITS) > cacheSize:
+        CIRCUITS.popitem(last=False)
+    return circuit, False
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Answers a simulate or grade request in a worker process. The vectors go through graded_run (or scalar_run
+# for levelized/basic) exactly like sim.py runs them, only with the files kept in memory.
+# Returns the answer dictionary
+def workerRequest(request):
+    import sim, First_part
+    start = time.time()
+    circuit, cached = workerCircuit(request["netlist"])
+    if isinstance(circuit, str):
+        return {"error": circuit}
+
+    engine = request.get("engine", DEFAULT_ENGINE)
+    if engine not in sim.ENGINES:
+        return {"error": "SERVER ERROR: UNKNOWN ENGINE \"" + str(engine) + "\""}
+    if engine == "numpy" and sim.numpy == None:
+        return {"error": "ENGINE ERROR: THE numpy ENGINE NEEDS NUMPY TO BE INSTALLED"}
+
+    faults = []
+    if request["op"] == "grade":
+        # No fault list means the full one, the same list First_part.py writes
+        faultLines = request.get("faults")
+        if faultLines == None:
+            faultLines = First_part.fullFaultList(circuit)
+        faults = sim.read_faults([line + "\n" for line in faultLines])
+        msg = sim.checkFaults(circuit, faults)
+        if msg != None:
+            return {"error": msg}
+
+    inputFile = io.StringIO("".join([vector + "\n" for vector in request["vectors"]]))
+    outputFile = io.StringIO()
+    faultyOutputFile = io.StringIO()
+    displayFile = io.StringIO()
+    runStats = {}
+    drop = request.get("drop", False)
+    target = request.get("target")
+    if drop and target == None:
+        target = 1.0
+    if engine in sim.GRADERS:
+        detectedFaults = sim.graded_run(circuit, faults, engine, inputFile, outputFile, faultyOutputFile, displayFile, drop, target, request.get("window"), runStats)
+    else:
+        simulate = sim.basic_sim if engine == "basic" else sim.levelized_sim
+        detectedFaults = sim.scalar_run(circuit, faults, simulate, inputFile, outputFile, faultyOutputFile, displayFile, drop, target, request.get("window"), runStats)
+    if isinstance(detectedFaults, str):
+        return {"error": detectedFaults}
+
+    answer = {"output": outputFile.getvalue(), "detected": list(detectedFaults), "faults": len(faults),
+              "vectors": runStats["vectors"], "stoppedEarly": runStats["stoppedEarly"], "cached": cached,
+              "seconds": time.time() - start}
+    if request.get("faulty", False):
+        answer["faultyOutput"] = faultyOutputFile.getvalue()
+    return answer
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs the server on socketPath until a stop request comes, with jobs worker processes.
+# cellsName is a cell library file every worker reads, or None.
+# Returns the error message if the socket is already being served or the cell library is bad
+def serve(socketPath, jobs, size, cellsName=None):
+    import asyncio, concurrent.futures
+    import sim, gates
+
+    # Checked here once, so a bad cell library stops the server instead of every worker
+    if cellsName != None:
+        cells = gates.readCells(cellsName)
+        if isinstance(cells, str):
+            print(cells)
+            return cells
+
+    if os.path.exists(socketPath):
+        # Left behind by a server that didn't shut down cleanly, unless something still answers on it
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socketPath)
+            probe.close()
+            msg = "SERVER ERROR: A SERVER IS ALREADY LISTENING ON " + socketPath
+            print(msg)
+            return msg
+        except (OSError, IOError):
+            os.remove(socketPath)
+
+    stats = {"requests": 0, "errors": 0, "simulate": 0, "grade": 0, "cached": 0, "started": time.time()}
+    pool = concurrent.futures.ProcessPoolExecutor(jobs, initializer=workerInit, initargs=(size, cellsName))
+
+    async def answer(request):
+        if not isinstance(request, dict) or "op" not in request:
+            return {"error": "SERVER ERROR: A REQUEST NEEDS AN op"}
+        if request["op"] == "stats":
+            return {"requests": stats["requests"], "errors": stats["errors"], "simulate": stats["simulate"],
+                    "grade": stats["grade"], "cached": stats["cached"], "jobs": jobs, "cacheSize": size,
+                    "uptime": time.time() - stats["started"]}
+        if request["op"] == "stop":
+            stopping.set_result(True)
+            return {"stopping": True}
+        if request["op"] not in ["simulate", "grade"]:
+            return {"error": "SERVER ERROR: UNKNOWN op \"" + str(request["op"]) + "\""}
+        if "netlist" not in request or "vectors" not in request:
+            return {"error": "SERVER ERROR: A " + request["op"] + " REQUEST NEEDS A netlist AND vectors"}
+        stats[request["op"]] += 1
+        result = await asyncio.get_event_loop().run_in_executor(pool, workerRequest, request)
+        if result.get("cached"):
+            stats["cached"] += 1
+        return result
+
+    async def connection(reader, writer):
+        while not stopping.done():
+            line = await reader.readline()
+            if not line:
+                break
+            stats["requests"] += 1
+            try:
+                result = await answer(json.loads(line.decode("utf-8")))
+            except ValueError:
+                result = {"error": "SERVER ERROR: THE REQUEST IS NOT JSON"}
+            except Exception as error:
+                # A worker that died or a bug in a request must not take the whole server down
+                result = {"error": "SERVER ERROR: " + repr(error)}
+            if "error" in result:
+                stats["errors"] += 1
+            writer.write((json.dumps(result) + "\n").encode("utf-8"))
+            await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_unix_server(connection, path=socketPath)
+        if sim.verbosity >= sim.NORMAL:
+            print("Serving on " + socketPath + " with " + str(jobs) + " workers")
+        await stopping
+        server.close()
+        await server.wait_closed()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    stopping = loop.create_future()
+    try:
+        loop.run_until_complete(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.shutdown()
+        loop.close()
+        if os.path.exists(socketPath):
+            os.remove(socketPath)
+    return None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Sends one request to the server on socketPath. Returns the answer dictionary
+def request(socketPath, message):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socketPath)
+    except (OSError, IOError):
+        return {"error": "SERVER ERROR: NO SERVER LISTENING ON " + socketPath}
+    client.sendall((json.dumps(message) + "\n").encode("utf-8"))
+    reply = client.makefile("rb").readline()
+    client.close()
+    if not reply:
+        return {"error": "SERVER ERROR: THE SERVER CLOSED THE CONNECTION"}
+    return json.loads(reply.decode("utf-8"))
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads the lines of a vector or fault list file the way sim.py does, skipping blank lines and comments
+def readLines(fileName):
+    listFile = open(fileName, "r")
+    lines = [line.replace("\n", "") for line in listFile if line != "\n" and line[0] != "#"]
+    listFile.close()
+    return lines
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function, e.g.
+#   python server.py serve -j 4 &
+#   python server.py grade circuit.bench -i input.txt -f faults.txt -o output.txt -e event --drop
+#   python server.py stop
+def main():
+    parser = argparse.ArgumentParser(description="Simulation server keeping circuits in memory, and its client.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Unix socket of the server (default: " + SOCKET_PATH + ")")
+    commands = parser.add_subparsers(dest="command")
+    serveParser = commands.add_parser("serve", help="run the server")
+    serveParser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                             help="worker processes (default: one per CPU)")
+    serveParser.add_argument("--cache-size", dest="cacheSize", type=int, default=CACHE_SIZE,
+                             help="circuits each worker keeps (default: " + str(CACHE_SIZE) + ")")
+    serveParser.add_argument("--cells", default=None,
+                             help="cell library file of extra gate types the netlists may use")
+    serveParser.add_argument("-v", "--verbosity", type=int, default=1, choices=[0, 1],
+                             help="0: nothing, 1: the socket it listens on (default)")
+    for command in ["simulate", "grade"]:
+        commandParser = commands.add_parser(command, help=command + " input vectors on the server")
+        commandParser.add_argument("netlist", help="circuit benchmark file")
+        commandParser.add_argument("-i", "--inputs", default="input.txt", help="input vector file (default: input.txt)")
+        commandParser.add_argument("-o", "--output", default="output.txt",
+                                   help="output file, the faulty_ file is written next to it (default: output.txt)")
+        commandParser.add_argument("-e", "--engine", default=DEFAULT_ENGINE, help="simulation engine (default: " + DEFAULT_ENGINE + ")")
+        if command == "grade":
+            commandParser.add_argument("-f", "--faults", default=None, help="fault list file (default: the full fault list)")
+            commandParser.add_argument("--drop", action="store_true", help="stop simulating faults once they are detected")
+            commandParser.add_argument("--target", type=float, default=None, help="stop once the fault coverage reaches this fraction")
+            commandParser.add_argument("--window", type=int, default=None,
+                                       help="stop after this many input vectors in a row detect no new fault")
+    commands.add_parser("stats", help="print the request counts of the server")
+    commands.add_parser("stop", help="shut the server down")
+    args = parser.parse_args()
+
+    if args.command == None:
+        parser.error("a command is needed: serve, simulate, grade, stats or stop")
+    if args.command == "serve":
+        import sim
+        if args.jobs < 1 or args.cacheSize < 1:
+            parser.error("-j/--jobs and --cache-size must be at least 1")
+        sim.verbosity = args.verbosity
+        if args.cells != None and not os.path.isfile(args.cells):
+            parser.error("--cells file " + args.cells + " does not exist")
+        if serve(args.socket, args.jobs, args.cacheSize, args.cells) != None:
+            sys.exit(1)
+        return
+
+    if args.command in ["stats", "stop"]:
+        answer = request(args.socket, {"op": args.command})
+        if "error" in answer:
+            print(answer["error"])
+            sys.exit(1)
+        print(json.dumps(answer, indent=2, sort_keys=True))
+        return
+
+    for fileName in [args.netlist, args.inputs] + ([args.faults] if args.command == "grade" and args.faults != None else []):
+        if not os.path.isfile(fileName):
+            print("File " + fileName + " does not exist.")
+            sys.exit(1)
+    message = {"op": args.command, "netlist": os.path.abspath(args.netlist), "vectors": readLines(args.inputs),
+               "engine": args.engine}
+    if args.command == "grade":
+        message.update({"faults": readLines(args.faults) if args.faults != None else None, "drop": args.drop,
+                        "target": args.target, "window": args.window, "faulty": True})
+    answer = request(args.socket, message)
+    if "error" in answer:
+        print(answer["error"])
+        sys.exit(1)
+
+    outputFile = open(args.output, "w")
+    outputFile.write(answer["output"])
+    outputFile.close()
+    if args.command == "grade":
+        outputDir, outputBase = os.path.split(args.output)
+        faultyFile = open(os.path.join(outputDir, "faulty_" + outputBase), "w")
+        faultyFile.write(answer["faultyOutput"])
+        faultyFile.close()
+        print("Number of detected faults: " + str(len(answer["detected"])))
+        print("Number of faults in the fault list file: " + str(answer["faults"]))
+        if answer["faults"] > 0:
+            print("Fault coverage: %.2f" % (float(len(answer["detected"])) / answer["faults"]))
+    print(str(answer["vectors"]) + " input vectors in %.3f s on the server%s" % (answer["seconds"], " (circuit already loaded)" if answer["cached"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,18 @@
 from __future__ import print_function
-import os, copy
+import os, sys, heapq, random, time, json, argparse, multiprocessing
+import netcache, netparse, gates, compact, detmatrix
+
+# NumPy is only needed for the numpy engine
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# resource only gives the peak memory for --profile, and doesn't exist on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
 
 # Using these naming conventions: https://visualgit.readthedocs.io/en/latest/pages/naming_convention.html
 # I won't retroactively apply them to the provided code though. 
@@ -10,7 +23,31 @@ import os, copy
 # 3. inputRead: function that will update the circuit dictionary made in netRead to hold the line values
 # 4. read_faults: A function that reads information about the faults and generates a list that will be used to override the good circuit operations. 
 # 5. basic_sim: the actual simulation
-# 6. main: The main function
+# 6. levelize: computes the topological order and level of every gate once, catching loops and undriven lines
+# 7. levelized_sim: the simulation, walking the order made by levelize exactly once per input vector
+# 8. scalar_run: runs the good and faulty circuits one input vector at a time
+# 9. parallel_pattern_grade: bit-parallel grading, PATTERN_BLOCK input vectors at a time
+# 10. parallel_fault_grade: parallel-fault grading, FAULT_WORD - 1 faults per sweep of the netlist
+# 11. deductive_grade: deductive grading, one pass per input vector propagating sets of faults
+# 12. event_grade: event-driven grading, each fault only re-evaluates the gates it actually changes
+# 13. numpy_grade: NumPy vectorized grading, NUMPY_BLOCK input vectors at a time, whole groups of gates per operation
+# 14. compiled_grade: bit-parallel grading with the netlist compiled into straight-line Python functions
+# 15. compact_grade: grading on the compact integer-indexed Circuit from compact.py
+# 16. graded_run: runs the input file through one of the grade functions, with fault dropping and early stopping
+#     (optionally sharing the faults out between worker processes)
+# 17. atpg_run: PODEM test generation for the faults the input vectors missed
+# 18. compaction_run: static compaction of the input file, keeping the same fault coverage
+# 19. dictionary_build / dictionary_lookup: fault dictionary of the input file, and diagnosis from observed responses
+#     (writeDictionary / readDictionary store it as JSON)
+# 20. profileStart / profileReport: opt-in profiling of a run, written as a JSON report
+# 21. main: The main function
+
+# How much gets printed and written to the display file. Anything above the current level is skipped before it is
+# even formatted, so the per-gate trace costs nothing unless it's asked for
+QUIET = 0    # only the final summary
+NORMAL = 1   # one line per input vector, errors, and detected faults
+TRACE = 2    # also every gate as it is calculated, and the whole circuit dictionary
+verbosity = NORMAL
 
 # -------------------------------------------------------------------------------------------------------------------- #
 # FUNCTION: Neatly prints the Circuit Dictionary:
@@ -33,302 +70,58 @@ def printCkt (circuit):
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
-# FUNCTION: Reading in the Circuit gate-level netlist file:
+# FUNCTION: Reading in the Circuit gate-level netlist file, with the single-pass parser from netparse.py
 def netRead(netName):
-    # Opening the netlist file:
-    netFile = open(netName, "r")
-
-    # temporary variables
-    inputs = []     # array of the input wires
-    outputs = []    # array of the output wires
-    gates = []      # array of the gate list
-    inputBits = 0   # the number of inputs needed in this given circuit
-
-
-    # main variable to hold the circuit netlist, this is a dictionary in Python, where:
-    # key = wire name; value = a list of attributes of the wire
-    circuit = {}
-
-    # Reading in the netlist file line by line
-    for line in netFile:
-
-        # NOT Reading any empty lines
-        if (line == "\n"):
-            continue
-
-        # Removing spaces and newlines
-        line = line.replace(" ","")
-        line = line.replace("\n","")
-
-        # NOT Reading any comments
-        if (line[0] == "#"):
-            continue
-
-        # @ Here it should just be in one of these formats:
-        # INPUT(x)
-        # OUTPUT(y)
-        # z=LOGIC(a,b,c,...)
-
-        # Read a INPUT wire and add to circuit:
-        if (line[0:5] == "INPUT"):
-            # Removing everything but the line variable name
-            line = line.replace("INPUT", "")
-            line = line.replace("(", "")
-            line = line.replace(")", "")
-
-            # Format the variable name to wire_*VAR_NAME*
-            line = "wire_" + line
-
-            # Error detection: line being made already exists
-            if line in circuit:
-                msg = "NETLIST ERROR: INPUT LINE \"" + line + "\" ALREADY EXISTS PREVIOUSLY IN NETLIST"
-                print(msg + "\n")
-                return msg
-
-            # Appending to the inputs array and update the inputBits
-            inputs.append(line)
-
-            # add this wire as an entry to the circuit dictionary
-            circuit[line] = ["INPUT", line, False, 'U']
-
-            inputBits += 1
-            print(line)
-            print(circuit[line])
-            continue
-
-        # Read an OUTPUT wire and add to the output array list
-        # Note that the same wire should also appear somewhere else as a GATE output
-        if line[0:6] == "OUTPUT":
-            # Removing everything but the numbers
-            line = line.replace("OUTPUT", "")
-            line = line.replace("(", "")
-            line = line.replace(")", "")
-
-            # Appending to the output array
-            outputs.append("wire_" + line)
-            continue
-
-        # Read a gate output wire, and add to the circuit dictionary
-        lineSpliced = line.split("=") # splicing the line at the equals sign to get the gate output wire
-        gateOut = "wire_" + lineSpliced[0]
-
-        # Error detection: line being made already exists
-        if gateOut in circuit:
-            msg = "NETLIST ERROR: GATE OUTPUT LINE \"" + gateOut + "\" ALREADY EXISTS PREVIOUSLY IN NETLIST"
-            print(msg+"\n")
-            return msg
-
-        # Appending the dest name to the gate list
-        gates.append(gateOut)
-
-        lineSpliced = lineSpliced[1].split("(") # splicing the line again at the "("  to get the gate logic
-        logic = lineSpliced[0].upper()
-
-
-        lineSpliced[1] = lineSpliced[1].replace(")", "")
-        terms = lineSpliced[1].split(",")  # Splicing the the line again at each comma to the get the gate terminals
-        # Turning each term into an integer before putting it into the circuit dictionary
-        terms = ["wire_" + x for x in terms]
-
-        # add the gate output wire to the circuit dictionary with the dest as the key
-        circuit[gateOut] = [logic, terms, False, 'U']
-        print(gateOut)
-        print(circuit[gateOut])
-
-    # now after each wire is built into the circuit dictionary,
-    # add a few more non-wire items: input width, input array, output array, gate list
-    # for convenience
-    
-    circuit["INPUT_WIDTH"] = ["input width:", inputBits]
-    circuit["INPUTS"] = ["Input list", inputs]
-    circuit["OUTPUTS"] = ["Output list", outputs]
-    circuit["GATES"] = ["Gate list", gates]
-
-    print("\n bookkeeping items in circuit: \n")
-    print(circuit["INPUT_WIDTH"])
-    print(circuit["INPUTS"])
-    print(circuit["OUTPUTS"])
-    print(circuit["GATES"])
-
+    circuit = netparse.parseBench(netName)
+    if isinstance(circuit, str):
+        print(circuit + "\n")
+        return circuit
 
+    if verbosity >= TRACE:
+        print("\n bookkeeping items in circuit: \n")
+        print(circuit["INPUT_WIDTH"])
+        print(circuit["INPUTS"])
+        print(circuit["OUTPUTS"])
+        print(circuit["GATES"])
     return circuit
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
-# FUNCTION: calculates the output value for each logic gate
+# FUNCTION: calculates the output value for each logic gate, with the gate library in gates.py
 # if faults == None, then we're running the non-faulty circuit
 def gateCalc(circuit, node, fault):
-    
-    # terminal will contain all the input wires of this logic gate (node)
-    terminals = list(circuit[node][1])
-
-    storedValue = None
-
-    #print( "node: " + node )
-    #if ( fault ):
-    #    print( fault )
-
-    if ( fault != None and node == fault[ "wire" ] and fault[ "terminal" ] != None ):
-        storedValue = circuit[ fault[ "terminal" ] ][3]
-        #print( "storedValue: " + storedValue )
-        circuit[ fault[ "terminal" ] ][3] = fault[ "value" ]
-    # Next condition being true means the fault is at an output wire
-    elif ( fault != None and node == fault[ "wire" ] and fault[ "terminal" ] == None ):
+    # A stuck-at gate output doesn't need its terminals at all
+    if ( fault != None and node == fault[ "wire" ] and fault[ "terminal" ] == None ):
         circuit[node][3] = fault[ "value" ]
-        #print( "In gateCalc's elif condition: " + circuit[node][3] )
         return circuit
-        
 
-    # If the node is an Inverter gate output, solve and return the output
-    if circuit[node][0] == "NOT":
-        if circuit[terminals[0]][3] == '0':
-            circuit[node][3] = '1'
-        elif circuit[terminals[0]][3] == '1':
-            circuit[node][3] = '0'
-        elif circuit[terminals[0]][3] == "U":
+    gate = gates.GATE_TYPES.get(circuit[node][0])
+    # Error detection: the gate logic does not exist
+    if gate == None:
+        return circuit[node][0]
+
+    # The terminal values, with a stuck-at terminal of this gate forced. The forced value only goes into this list, so
+    # the line itself keeps its value for every other gate it feeds
+    if ( fault != None and node == fault[ "wire" ] ):
+        values = [fault[ "value" ] if term == fault[ "terminal" ] else circuit[term][3] for term in circuit[node][1]]
+    else:
+        # A plain loop, it beats a list comprehension on the few terminals most gates have
+        values = []
+        for term in circuit[node][1]:
+            values.append(circuit[term][3])
+
+    # Control gates are the same as in gates.evalChars, without the call, since this runs for every gate of every
+    # vector of every fault in levelized and basic
+    if gate.kind == gates.CONTROL:
+        if gate.control in values:
+            circuit[node][3] = gate.controlled
+        elif "U" in values:
             circuit[node][3] = "U"
-        else:  # Should not be able to come here
-            return -1
-        if ( storedValue ):
-            circuit[terminals[0]][3] = storedValue
-        return circuit 
-
-    # If the node is an AND gate output, solve and return the output
-    elif circuit[node][0] == "AND":
-        # Initialize the output to 1
-        circuit[node][3] = '1'
-        # Initialize also a flag that detects a U to false
-        unknownTerm = False  # This will become True if at least one unknown terminal is found
-
-        # if there is a 0 at any input terminal, AND output is 0. If there is an unknown terminal, mark the flag
-        # Otherwise, keep it at 1
-        for term in terminals:  
-            if circuit[term][3] == '0':
-                circuit[node][3] = '0'
-                break
-            if circuit[term][3] == "U":
-                unknownTerm = True
-
-        if unknownTerm:
-            if circuit[node][3] == '1':
-                circuit[node][3] = "U"
-        if ( storedValue ):
-            circuit[fault[ "terminal" ]][3] = storedValue
-        return circuit
-
-    # If the node is a NAND gate output, solve and return the output
-    elif circuit[node][0] == "NAND":
-        # Initialize the output to 0
-        circuit[node][3] = '0'
-        # Initialize also a variable that detects a U to false
-        unknownTerm = False  # This will become True if at least one unknown terminal is found
-
-        # if there is a 0 terminal, NAND changes the output to 1. If there is an unknown terminal, it
-        # changes to "U" Otherwise, keep it at 0
-        for term in terminals:
-            if circuit[term][3] == '0':
-                circuit[node][3] = '1'
-                break
-            if circuit[term][3] == "U":
-                unknownTerm = True
-                break
-
-        if unknownTerm:
-            if circuit[node][3] == '0':
-                circuit[node][3] = "U"
-        if ( storedValue ):
-            circuit[fault[ "terminal" ]][3] = storedValue
-        return circuit
-
-    # If the node is an OR gate output, solve and return the output
-    elif circuit[node][0] == "OR":
-        # Initialize the output to 0
-        circuit[node][3] = '0'
-        # Initialize also a variable that detects a U to false
-        unknownTerm = False  # This will become True if at least one unknown terminal is found
-
-        # if there is a 1 terminal, OR changes the output to 1. Otherwise, keep it at 0
-        for term in terminals:
-            if circuit[term][3] == '1':
-                circuit[node][3] = '1'
-                break
-            if circuit[term][3] == "U":
-                unknownTerm = True
-
-        if unknownTerm:
-            if circuit[node][3] == '0':
-                circuit[node][3] = "U"
-        if ( storedValue ):
-            circuit[fault[ "terminal" ]][3] = storedValue
-        return circuit
-
-    # If the node is an NOR gate output, solve and return the output
-    if circuit[node][0] == "NOR":
-        # Initialize the output to 1
-        circuit[node][3] = '1'
-        # Initialize also a variable that detects a U to false
-        unknownTerm = False  # This will become True if at least one unknown terminal is found
-
-        # if there is a 1 terminal, NOR changes the output to 0. Otherwise, keep it at 1
-        for term in terminals:
-            if circuit[term][3] == '1':
-                circuit[node][3] = '0'
-                break
-            if circuit[term][3] == "U":
-                unknownTerm = True
-        if unknownTerm:
-            if circuit[node][3] == '1':
-                circuit[node][3] = "U"
-        if ( storedValue ):
-            circuit[fault[ "terminal" ]][3] = storedValue
-        return circuit
-
-    # If the node is an XOR gate output, solve and return the output
-    if circuit[node][0] == "XOR":
-        # Initialize a variable to zero, to count how many 1's in the terms
-        count = 0
-
-        # if there are an odd number of terminals, XOR outputs 1. Otherwise, it should output 0
-        for term in terminals:
-            if circuit[term][3] == '1':
-                count += 1  # For each 1 bit, add one count
-            if circuit[term][3] == "U":
-                circuit[node][3] = "U"
-                return circuit
-
-        # check how many 1's we counted
-        if count % 2 == 1:  # if more than one 1, we know it's going to be 0.
-            circuit[node][3] = '1'
-        else:  # Otherwise, the output is equal to how many 1's there are
-            circuit[node][3] = '0'
-        if ( storedValue ):
-            circuit[fault[ "terminal" ]][3] = storedValue
-        return circuit
-
-    # If the node is an XNOR gate output, solve and return the output
-    elif circuit[node][0] == "XNOR":
-        # Initialize a variable to zero, to count how many 1's in the terms
-        count = 0
-
-        # if there is a single 1 terminal, XNOR outputs 0. Otherwise, it outputs 1
-        for term in terminals:
-            if circuit[term][3] == '1':
-                count += 1  # For each 1 bit, add one count
-            if circuit[term][3] == "U":
-                circuit[node][3] = "U"
-                return circuit
-
-        #checks parity
-        if count % 2 == 1:  
-            circuit[node][3] = '0'
-        else: 
-            circuit[node][3] = '1'
-        if ( storedValue ):
-            circuit[fault[ "terminal" ]][3] = storedValue
-        return circuit
-
-    # Error detection... should not be able to get at this point
-    return circuit[node][0]
+        else:
+            circuit[node][3] = gate.uncontrolled
+    else:
+        circuit[node][3] = gates.evalChars(gate, values)
+    return circuit
 
 # Author: Peter
 # Function purpose:
@@ -390,7 +183,72 @@ def read_faults( faultInfo ):
     return faults 
 
 # -------------------------------------------------------------------------------------------------------------------- #
-# FUNCTION: Updating the circuit dictionary with the input line, and also resetting the gates and output lines
+# FUNCTION: Reads the mapping file First_part.py writes next to a collapsed fault list, where every line is
+#   collapsed fault: full list fault, full list fault, ...
+# Returns a dictionary of collapsed fault name (as getFaultName gives it) -> number of full list faults it stands for
+def read_fault_map( mapInfo ):
+    faultMap = {}
+    for info in mapInfo:
+        info = info.replace( " ", "" ).replace( "\t", "" ).replace( "\n", "" )
+        if ( info == "" or info[0] == "#" ):
+            continue
+
+        rep, members = info.split( ":" )
+        fault = read_faults( [rep] )[0]
+        faultMap[ getFaultName( fault ) ] = len( members.split( "," ) )
+    return faultMap
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Builds the name of a fault the same way it is printed in the faulty output file, e.g. wire_K-IN-wire_g-SA-0
+def getFaultName( fault ):
+    faultName = fault[ "wire" ]
+    if ( fault[ "terminal" ] ):
+        faultName = faultName + "-IN-" + fault[ "terminal" ]
+    faultName = faultName + "-SA-" + fault[ "value" ]
+    return faultName
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Checks a fault list against the circuit before any engine sees it: every fault has to be on a line of the
+# circuit, a terminal fault on one of the terminals of that gate, and stuck at 0 or 1.
+# Returns the error message for the first fault that isn't, or None
+def checkFaults( circuit, faults ):
+    for fault in faults:
+        faultName = getFaultName( fault )
+        if ( fault[ "wire" ] not in circuit ):
+            return "FAULT ERROR: LINE \"" + fault[ "wire" ] + "\" OF FAULT \"" + faultName + "\" IS NOT IN THE CIRCUIT"
+        if ( fault[ "terminal" ] != None and ( circuit[ fault[ "wire" ] ][0] == "INPUT" or fault[ "terminal" ] not in circuit[ fault[ "wire" ] ][1] ) ):
+            return "FAULT ERROR: LINE \"" + fault[ "terminal" ] + "\" OF FAULT \"" + faultName + "\" IS NOT A TERMINAL OF GATE \"" + fault[ "wire" ] + "\""
+        if ( fault[ "value" ] != "0" and fault[ "value" ] != "1" ):
+            return "FAULT ERROR: FAULT \"" + faultName + "\" IS NOT STUCK AT 0 OR 1"
+    return None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Resets the circuit for a new simulation in constant time, instead of setting every line back one by one.
+# The accessed item of a line holds the epoch it was last accessed in, and a line only counts as accessed when that is
+# the current circuit["EPOCH"], so moving on to the next epoch makes every line not accessed at once. The old values
+# stay where they are, but nothing reads the value of a line before it is accessed again (basic_sim waits for it,
+# levelized_sim calculates every gate in order, and the outputs are checked for it)
+def resetCircuit(circuit):
+    if "EPOCH" not in circuit:
+        # netRead leaves every line at False (0), so the first epoch is 1
+        circuit["EPOCH"] = ["Simulation epoch", 0]
+    circuit["EPOCH"][1] += 1
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The circuit for the faulty machine. Every line gets its own accessed and value items, but the gate logic,
+# the terminal lists and the bookkeeping items are the same objects as in circuit (nothing changes them while
+# simulating), so only the per-line state is copied instead of a deepcopy of the whole dictionary
+def faultyCopy(circuit):
+    faultyCircuit = {}
+    for key in circuit:
+        if key[0:5] == "wire_":
+            faultyCircuit[key] = [circuit[key][0], circuit[key][1], False, 'U']
+        elif key != "EPOCH":
+            faultyCircuit[key] = circuit[key]
+    return faultyCircuit
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Updating the circuit dictionary with the input line (resetCircuit has to be called first)
 def inputRead(circuit, line):
     # Checking if input bits are enough for the circuit
     if len(line) < circuit["INPUT_WIDTH"][1]:
@@ -402,12 +260,13 @@ def inputRead(circuit, line):
     # Adding the inputs to the dictionary
     # Since the for loop will start at the most significant bit, we start at input width N
     i = circuit["INPUT_WIDTH"][1] - 1
-    inputs = list(circuit["INPUTS"][1])
+    inputs = circuit["INPUTS"][1]
+    epoch = circuit["EPOCH"][1]
     # dictionary item: [(bool) If accessed, (int) the value of each line, (int) layer number, (str) origin of U value]
     for bitVal in line:
         bitVal = bitVal.upper() # in the case user input lower-case u
         circuit[inputs[i]][3] = bitVal # put the bit value as the line value
-        circuit[inputs[i]][2] = True  # and make it so that this line is accessed
+        circuit[inputs[i]][2] = epoch  # and make it so that this line is accessed
 
         # In case the input has an invalid character (i.e. not "0", "1" or "U"), return an error flag
         if bitVal != "0" and bitVal != "1" and bitVal != "U":
@@ -425,16 +284,15 @@ def basic_sim( circuit, fault, displayFile ):
     
     queue = list(circuit["GATES"][1])
     i = 1
+    epoch = circuit["EPOCH"][1]
 
     # Still remains to be seen if I actually need this next variable
     #ogInput = "" 
     if ( fault != None ):
-        faultName = fault[ "wire" ]
-        if ( fault[ "terminal" ] ):
-            faultName = faultName + "-IN-" + fault[ "terminal" ]
-        faultName = faultName + "-SA-" + fault[ "value" ]  
-        print( "\nRunning the faulty circuit with " + faultName )
-        displayFile.write( "\nRunning the faulty circuit with " + faultName + "\n\n" )
+        if verbosity >= TRACE:
+            faultName = getFaultName( fault )
+            print( "\nRunning the faulty circuit with " + faultName )
+            displayFile.write( "\nRunning the faulty circuit with " + faultName + "\n\n" )
         # Forces any of the primary input wires to be a certain value if it's applicable
         if ( circuit[ fault[ "wire" ] ][0] == "INPUT" ):
             #ogInput = circuit[ fault[ "wire" ] ][3]
@@ -455,12 +313,12 @@ def basic_sim( circuit, fault, displayFile ):
 
         # Check if the terminals have been accessed
         for term in circuit[curr][1]:
-            if not circuit[term][2]:
+            if circuit[term][2] != epoch:
                 term_has_value = False
                 break
 
         if term_has_value:
-            circuit[curr][2] = True
+            circuit[curr][2] = epoch
             circuit = gateCalc( circuit, curr, fault )
 
             # ERROR Detection if LOGIC does not exist
@@ -471,17 +329,20 @@ def basic_sim( circuit, fault, displayFile ):
 #            print( "curr: " + curr )
 #            print( "curr: " + circuit[curr][3] )
 #            print( "curr: " + circuit[curr][0] )
-            print("Progress: updating " + curr + " = " + circuit[curr][3] + " as the output of " + circuit[curr][0] + " for:")
-            displayFile.write("Progress: updating " + curr + " = " + circuit[curr][3] + " as the output of " + circuit[curr][0] + " for:\n")
-            for term in circuit[curr][1]:
-                print(term + " = " + circuit[term][3])
-                displayFile.write(term + " = " + circuit[term][3] + "\n")
+            if verbosity >= TRACE:
+                print("Progress: updating " + curr + " = " + circuit[curr][3] + " as the output of " + circuit[curr][0] + " for:")
+                displayFile.write("Progress: updating " + curr + " = " + circuit[curr][3] + " as the output of " + circuit[curr][0] + " for:\n")
+                for term in circuit[curr][1]:
+                    print(term + " = " + circuit[term][3])
+                    displayFile.write(term + " = " + circuit[term][3] + "\n")
             #print("\nPress Enter to Continue...")
             #input()
 
         else:
             # If the terminals have not been accessed yet, append the current node at the end of the queue
             queue.append(curr)
+            if profile != None:
+                profile["requeues"] += 1
 
     # Do I need this?
     #circuit[ fault[ "wire" ] ][3] = ogInput
@@ -489,100 +350,141 @@ def basic_sim( circuit, fault, displayFile ):
 
 
 # -------------------------------------------------------------------------------------------------------------------- #
-# FUNCTION: Main Function
-def main():
-    # **************************************************************************************************************** #
-    # NOTE: UI code; Does not contain anything about the actual simulation
-
-    # Used for file access
-    script_dir = os.path.dirname(__file__)  # <-- absolute dir the script is in
-
-    print("Circuit Simulator:")
+# FUNCTION: Compile step run once after netRead. Puts the gates in topological order and gives every line a level
+# number (inputs are level 0, a gate is one more than its deepest terminal), so the simulation never has to requeue a
+# gate that is not ready yet. This is also where a netlist that basic_sim would loop forever on gets caught:
+# a gate terminal that nothing drives, an output that nothing drives, or a combinational loop.
+# The results are added to the circuit dictionary as more bookkeeping items:
+#   circuit["ORDER"]  = ["Topological order", list of gate output lines sorted by level]
+#   circuit["LEVELS"] = ["Level of each line", dictionary of line -> level]
+#   circuit["FANOUT"] = ["Fanout list", dictionary of line -> list of the gates it feeds]
+def levelize(circuit):
+    # netRead hands back an error message instead of a dictionary if the netlist was bad
+    if isinstance(circuit, str):
+        return circuit
 
-    # Select circuit benchmark file, default is circuit.bench
-    while True:
-        cktFile = "circuit.bench"   
-        print("\n Read circuit benchmark file: use " + cktFile + "?" + " Enter to accept or type filename: ")
-        userInput = input()
-        if userInput == "":
-            break
-        else:
-            cktFile = os.path.join(script_dir, userInput)
-            if not os.path.isfile(cktFile):
-                print("File does not exist. \n")
-            else:
-                break
+    gateList = circuit["GATES"][1]
 
-    print("\n Reading " + cktFile + " ... \n")
-    circuit = netRead(cktFile)
-    print("\n Finished processing benchmark file and built netlist dictionary: \n")
-    # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
-    # printCkt(circuit)
-    print(circuit)
+    # Error detection: every gate type has to exist in gates.py (or a cell library), with the number of terminals
+    # it takes, and every terminal and every output has to be driven by an input or a gate
+    for gate in gateList:
+        gateType = gates.GATE_TYPES.get(circuit[gate][0])
+        if gateType == None:
+            msg = "NETLIST ERROR: LOGIC \"" + circuit[gate][0] + "\" DOES NOT EXIST (GATE \"" + gate + "\")"
+            print(msg + "\n")
+            return msg
+        if gateType.terminals != None and len(circuit[gate][1]) != gateType.terminals:
+            msg = "NETLIST ERROR: GATE \"" + gate + "\" (" + gateType.name + ") NEEDS " + str(gateType.terminals) + " TERMINAL/S"
+            print(msg + "\n")
+            return msg
+        for term in circuit[gate][1]:
+            if term not in circuit:
+                msg = "NETLIST ERROR: LINE \"" + term + "\" USED BY GATE \"" + gate + "\" IS NOT DRIVEN"
+                print(msg + "\n")
+                return msg
+    for y in circuit["OUTPUTS"][1]:
+        if y not in circuit:
+            msg = "NETLIST ERROR: OUTPUT LINE \"" + y + "\" NOT ACCESSED"
+            print(msg + "\n")
+            return msg
 
-    # keep an initial (unassigned any value) copy of the circuit for an easy reset
-    # The above statement is wrong, but I need these references to the object to maintain the structure of the original code
-    newCircuit = circuit
-    faultyCircuit = copy.deepcopy( circuit )
-    newFaultyCircuit = faultyCircuit
+    # fanout[x] holds every gate that uses x as a terminal (a gate using x twice shows up twice)
+    # pending[gate] counts the terminals of the gate that are still waiting on another gate to be calculated
+    fanout = {}
+    pending = {}
+    for x in circuit["INPUTS"][1]:
+        fanout[x] = []
+    for gate in gateList:
+        fanout[gate] = []
+    for gate in gateList:
+        pending[gate] = 0
+        for term in circuit[gate][1]:
+            fanout[term].append(gate)
+            if circuit[term][0] != "INPUT":
+                pending[gate] += 1
+
+    levels = {}
+    for x in circuit["INPUTS"][1]:
+        levels[x] = 0
+
+    # Gates with nothing pending are ready; every time a gate is done, the gates it feeds get one step closer
+    ready = [gate for gate in gateList if pending[gate] == 0]
+    i = 0
+    while i < len(ready):
+        curr = ready[i]
+        i += 1
+        levels[curr] = 1 + max([levels[term] for term in circuit[curr][1]])
+        for nextGate in fanout[curr]:
+            pending[nextGate] -= 1
+            if pending[nextGate] == 0:
+                ready.append(nextGate)
+
+    # Error detection: anything never made ready sits on (or after) a combinational loop
+    if len(ready) < len(gateList):
+        stuck = [gate for gate in gateList if pending[gate] > 0]
+        msg = "NETLIST ERROR: COMBINATIONAL LOOP THROUGH LINE/S \"" + "\", \"".join(stuck) + "\""
+        print(msg + "\n")
+        return msg
+
+    # sorted() keeps the netlist order between gates of the same level
+    order = sorted(ready, key=lambda gate: levels[gate])
+
+    circuit["ORDER"] = ["Topological order", order]
+    circuit["LEVELS"] = ["Level of each line", levels]
+    circuit["FANOUT"] = ["Fanout list", fanout]
+    return circuit
 
-    # Select input file, default is input.txt
-    while True:
-        inputName = "input.txt"
-        print("\n Read input vector file: use " + inputName + "?" + " Enter to accept or type filename: ")
-        userInput = input()
-        if userInput == "":
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: the simulation using the order from levelize. Every gate is calculated exactly once, since all of its
+# terminals are guaranteed to be done by the time we get to it
+def levelized_sim( circuit, fault, displayFile ):
+    if ( fault != None ):
+        if verbosity >= TRACE:
+            faultName = getFaultName( fault )
+            print( "\nRunning the faulty circuit with " + faultName )
+            displayFile.write( "\nRunning the faulty circuit with " + faultName + "\n\n" )
+        # Forces any of the primary input wires to be a certain value if it's applicable
+        if ( circuit[ fault[ "wire" ] ][0] == "INPUT" ):
+            circuit[ fault[ "wire" ] ][3] = fault[ "value" ]
 
-            break
-        else:
-            inputName = os.path.join(script_dir, userInput)
-            if not os.path.isfile(inputName):
-                print("File does not exist. \n")
-            else:
-                break
+    epoch = circuit["EPOCH"][1]
+    for curr in circuit["ORDER"][1]:
+        circuit[curr][2] = epoch
+        circuit = gateCalc( circuit, curr, fault )
 
-    # Select the faults file
-    while True:
-        faultsName = "faults.txt"
-        print("\n Read fault file: use " + faultsName + "?" + " Enter to accept or type filename: ")
-        userInput = input()
-        if userInput == "":
+        # ERROR Detection if LOGIC does not exist
+        if isinstance(circuit, str):
+            print(circuit)
+            return circuit
 
-            break
-        else:
-            faultsName = os.path.join(script_dir, userInput)
-            if not os.path.isfile( faultsName ):
-                print("File does not exist. \n")
-            else:
-                break
-    
-    print( "\nReading the faults file..." )
-    faultsFile = open( faultsName, "r" )
-    faults = read_faults( faultsFile )
+        if verbosity >= TRACE:
+            print("Progress: updating " + curr + " = " + circuit[curr][3] + " as the output of " + circuit[curr][0] + " for:")
+            displayFile.write("Progress: updating " + curr + " = " + circuit[curr][3] + " as the output of " + circuit[curr][0] + " for:\n")
+            for term in circuit[curr][1]:
+                print(term + " = " + circuit[term][3])
+                displayFile.write(term + " = " + circuit[term][3] + "\n")
 
+    return circuit
 
-    # Select output file, default is output.txt
-    while True:
-        outputName = "output.txt"
-        print("\n Write output file: use " + outputName + "?" + " Enter to accept or type filename: ")
-        userInput = input()
-        if userInput == "":
-            break
-        else:
-            outputName = os.path.join(script_dir, userInput)
-            break
 
-    # Note: UI code;
-    # **************************************************************************************************************** #
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs the good circuit and then every fault for each line of the input file, one vector at a time, using
+# basic_sim or levelized_sim (passed in as simulate). Returns the dictionary of detected faults
+# dropFaults, coverageTarget, saturationWindow and runStats work the same as in graded_run
+def scalar_run( circuit, faults, simulate, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats ):
+    # keep references to the circuits, since inputRead hands back an error flag instead of the circuit
+    # The faulty machine shares the netlist structure with the good one, only its line values are its own
+    newCircuit = circuit
+    faultyCircuit = faultyCopy( circuit )
+    newFaultyCircuit = faultyCircuit
 
-    print("\n *** Simulating the" + inputName + " file and will output in" + outputName + "*** \n")
-    print( "The faulty output will be put into the a file with the same name as the output file with faulty_ prepended to it." )
-    print( "Information regarding the circuit simulation will be put into a file with the same name as the output file with display_ prepended to it."  )
-    inputFile = open(inputName, "r")
-    outputFile = open(outputName, "w")
-    faultyOutputFile = open( "faulty_" + outputName, "w" )
-    displayFile = open( "display_" + outputName , "w" )
     detectedFaults = {}
+    runStats["vectors"] = 0
+    runStats["skipped"] = 0
+    runStats["stoppedEarly"] = False
+    runStats["saturated"] = False
+    runStats["lastDetection"] = 0   # the input line that last detected a new fault
+    matrix = runStats.get("matrix")
 
     # Runs the simulator for each line of the input file
     for line in inputFile:
@@ -603,120 +505,2764 @@ def main():
         # Removing spaces
         line = line.replace(" ", "")
         
-        print("\n before processing circuit dictionary...")
-        # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
-        # printCkt(circuit)
-        print(circuit)
-        print("\n ---> Now ready to simulate INPUT = " + line)
-        displayFile.write("\n ---> Now ready to simulate INPUT = " + line + "\n")
+        if verbosity >= TRACE:
+            print("\n before processing circuit dictionary...")
+            # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
+            # printCkt(circuit)
+            print(circuit)
+        if verbosity >= NORMAL:
+            print("\n ---> Now ready to simulate INPUT = " + line)
+            displayFile.write("\n ---> Now ready to simulate INPUT = " + line + "\n")
+        resetCircuit(circuit)
         circuit = inputRead(circuit, line) 
-        # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
-        # printCkt(circuit)
-        print(circuit)
+        if verbosity >= TRACE:
+            # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
+            # printCkt(circuit)
+            print(circuit)
 
 
         if circuit == -1:
-            print("INPUT ERROR: INSUFFICIENT BITS")
+            if verbosity >= NORMAL:
+                print("INPUT ERROR: INSUFFICIENT BITS")
             outputFile.write(" -> INPUT ERROR: INSUFFICIENT BITS" + "\n")
             faultyOutputFile.write( " -> INPUT ERROR: INSUFFICIENT BITS" + "\n" )
             # After each input line is finished, reset the netList
             circuit = newCircuit
             faultyCircuit = newFaultyCircuit
-            print("...move on to next input\n")
+            if verbosity >= NORMAL:
+                print("...move on to next input\n")
             continue
         elif circuit == -2:
-            print("INPUT ERROR: INVALID INPUT VALUE/S")
+            if verbosity >= NORMAL:
+                print("INPUT ERROR: INVALID INPUT VALUE/S")
             outputFile.write(" -> INPUT ERROR: INVALID INPUT VALUE/S" + "\n")
             faultyOutputFile.write( " -> INPUT ERROR: INVALID INPUT VALUE/S" + "\n" )
             # After each input line is finished, reset the netList
             circuit = newCircuit
             faultyCircuit = newFaultyCircuit
-            print("...move on to next input\n")
+            if verbosity >= NORMAL:
+                print("...move on to next input\n")
             continue
 
 
-        circuit = basic_sim( circuit, None, displayFile )
-        print("\n *** Finished simulation of good circuit - resulting circuit: \n")
-        displayFile.write("\n *** Finished simulation of good circuit - resulting circuit: \n")
-        # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
-        # printCkt(circuit)
-        print(circuit)
+        circuit = simulate( circuit, None, displayFile )
+        # ERROR Detection if LOGIC does not exist (the simulate function already printed it)
+        if isinstance(circuit, str):
+            return circuit
+        if verbosity >= TRACE:
+            print("\n *** Finished simulation of good circuit - resulting circuit: \n")
+            displayFile.write("\n *** Finished simulation of good circuit - resulting circuit: \n")
+            # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
+            # printCkt(circuit)
+            print(circuit)
 
 
         for y in circuit["OUTPUTS"][1]:
-            if not circuit[y][2]:
+            if circuit[y][2] != circuit["EPOCH"][1]:
                 output = "NETLIST ERROR: OUTPUT LINE \"" + y + "\" NOT ACCESSED"
                 faultyOutput = "NETLIST ERROR: OUTPUT LINE \"" + y + "\" NOT ACCESSED"
                 break
             output = str(circuit[y][3]) + output
 
-        print("\n *** Summary of simulation of good circuit: ")
-        print(line + " -> " + output + " written into output file. \n")
-        displayFile.write("\n *** Summary of simulation of good circuit: \n")
-        displayFile.write(line + " -> " + output + " written into output file. \n")
+        if verbosity >= NORMAL:
+            print("\n *** Summary of simulation of good circuit: ")
+            print(line + " -> " + output + " written into output file. \n")
+            displayFile.write("\n *** Summary of simulation of good circuit: \n")
+            displayFile.write(line + " -> " + output + " written into output file. \n")
         outputFile.write( " -> " + output + "\n" )
 
-        print( "\nNow doing simulation of circuits with faults...\n" )
-        displayFile.write( "\nNow doing simulation of circuits with faults...\n" )
-        for fault in faults:
+        if verbosity >= TRACE:
+            print( "\nNow doing simulation of circuits with faults...\n" )
+            displayFile.write( "\nNow doing simulation of circuits with faults...\n" )
+        runStats["vectors"] += 1
+        vectorDetected = []
+        for faultIndex in range(len(faults)):
+            fault = faults[faultIndex]
+            faultName = getFaultName( fault )
+            # Fault dropping: once a fault is detected it isn't simulated again
+            if ( dropFaults and faultName in detectedFaults ):
+                runStats["skipped"] += 1
+                continue
+
+            resetCircuit( faultyCircuit )
             faultyCircuit = inputRead( faultyCircuit, line )
             faultyOutput = ""
-            faultName = fault[ "wire" ]
-
-            if ( fault[ "terminal" ] ):
-                faultName = faultName + "-IN-" + fault[ "terminal" ]
-            faultName = faultName + "-SA-" + fault[ "value" ]
 
-            faultyCircuit = basic_sim( circuit, fault, displayFile )
-            for y in circuit["OUTPUTS"][1]:
-                if not circuit[y][2]:
+            # The faulty machine runs on its own copy, so forcing a stuck-at input doesn't leak into the good circuit
+            faultyCircuit = simulate( faultyCircuit, fault, displayFile )
+            if isinstance(faultyCircuit, str):
+                return faultyCircuit
+            for y in faultyCircuit["OUTPUTS"][1]:
+                if faultyCircuit[y][2] != faultyCircuit["EPOCH"][1]:
                     faultyOutput = "NETLIST ERROR: OUTPUT LINE \"" + y + "\" NOT ACCESSED"
                     break
-                faultyOutput = str(circuit[y][3]) + faultyOutput
+                faultyOutput = str(faultyCircuit[y][3]) + faultyOutput
             #end of nested^2 for loop
 
             faultyOutputFile.write( line + " -> " + faultyOutput + "\n" )
-            print(line + " -> " + faultyOutput + " written into faulty output file. \n")
-            displayFile.write(line + " -> " + faultyOutput + " written into faulty output file. \n")
+            if verbosity >= TRACE:
+                print(line + " -> " + faultyOutput + " written into faulty output file. \n")
+                displayFile.write(line + " -> " + faultyOutput + " written into faulty output file. \n")
             if ( faultyOutput != output ):
                 faultyOutputFile.write( faultName + " detected!\n\n" )
-                displayFile.write( faultName + " detected for the input: " + line + "\n" )
+                if verbosity >= NORMAL:
+                    displayFile.write( faultName + " detected for the input: " + line + "\n" )
+                if faultName not in detectedFaults:
+                    runStats["lastDetection"] = runStats["vectors"]
                 detectedFaults[ faultName ] = True
-            displayFile.write( "\n" )
-            for key in circuit:
-                if (key[0:5]=="wire_"):
-                    faultyCircuit[key][2] = False
-                    faultyCircuit[key][3] = 'U'
+                vectorDetected.append( faultIndex )
+            if verbosity >= TRACE:
+                displayFile.write( "\n" )
             #end of nested^2 for loop
         #end of nested for loop   
+        if matrix != None:
+            matrix.addVector( line, vectorDetected )
 
-        # After each input line is finished, reset the circuit
-        print("\n *** Now resetting circuit back to unknowns... \n")
-       
-        for key in circuit:
-            if (key[0:5]=="wire_"):
-                circuit[key][2] = False
-                circuit[key][3] = 'U'
+        # The circuit is reset by resetCircuit when the next input line starts, which doesn't touch the lines
+        if verbosity >= TRACE:
+            print("\n*******************\n")
 
-        print("\n circuit after resetting: \n")
-        # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
-        # printCkt(circuit)
-        print(circuit)
+        if stopReached(detectedFaults, faults, coverageTarget, saturationWindow, runStats):
+            break
 
-        print("\n*******************\n")
-    
-    faultCoverage = len( detectedFaults) / len( faults )
-    print( "Number of detected faults: " + str( len( detectedFaults ) ) )
-    print( "Number of faults in the fault list file: " + str( len( faults ) ) )
-    print( "Fault coverage: %.2f" % faultCoverage ) 
-    displayFile.write( "Number of detected faults: " + str( len( detectedFaults ) ) )
-    displayFile.write( "Number of faults in the fault list file: " + str( len( faults ) ) )
-    displayFile.write( "Fault coverage: %.2f" % faultCoverage ) 
-    outputFile.close
-    faultyOutputFile.close
-    #exit()
+    return detectedFaults
 
+# -------------------------------------------------------------------------------------------------------------------- #
+# BIT-PARALLEL PATTERN SIMULATION
+# Instead of one '0'/'1'/'U' character per line, each line holds a pair of Python integers (ones, zeros) covering a
+# whole block of input vectors: bit k of ones is set if the line is 1 for vector k, bit k of zeros is set if it is 0,
+# and neither bit is set if it is U. Every gate is then a handful of bitwise operations for the whole block.
 
-if __name__ == "__main__":
-    main()
+# Number of input vectors packed into each pair of integers
+PATTERN_BLOCK = 256
+
+# Used to turn a column of input characters into the ones and zeros bit-planes
+ONES_TABLE = str.maketrans("10U", "100")
+ZEROS_TABLE = str.maketrans("10U", "010")
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Does the same checks on an input line as inputRead, without touching the circuit dictionary
+# Returns 0 if the line is good, -1 if there are not enough bits, -2 if there is an invalid value
+def inputCheck(circuit, line):
+    if len(line) < circuit["INPUT_WIDTH"][1]:
+        return -1
+
+    line = line[(len(line) - circuit["INPUT_WIDTH"][1]):(len(line))]
+    for bitVal in line.upper():
+        if bitVal != "0" and bitVal != "1" and bitVal != "U":
+            return -2
+    return 0
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Packs a block of (already checked) input lines into a dictionary of input wire -> (ones, zeros)
+# Vector k of the block ends up in bit k. Returns the dictionary and the mask with one bit set per vector
+def inputReadBits(circuit, lines):
+    width = circuit["INPUT_WIDTH"][1]
+    inputs = circuit["INPUTS"][1]
+    mask = (1 << len(lines)) - 1
+
+    # Same as inputRead: only the last INPUT_WIDTH bits are used, and the right-most bit goes to the first input.
+    # The block is reversed so that vector 0 lands in the least significant bit once a column is read as a number
+    lines = [line[(len(line) - width):(len(line))].upper() for line in reversed(lines)]
+
+    values = {}
+    for i in range(width):
+        column = "".join([line[width - 1 - i] for line in lines])
+        values[inputs[i]] = (int(column.translate(ONES_TABLE), 2), int(column.translate(ZEROS_TABLE), 2))
+
+    return values, mask
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Bitwise version of gateCalc. Takes the gate logic and a list of (ones, zeros) pairs, one per terminal,
+# and gives back the (ones, zeros) pair of the gate output for every vector in the block at once
+def gateCalcBits(logic, terms, mask):
+    gate = gates.GATE_TYPES.get(logic)
+    # Error detection... the gate logic does not exist
+    if gate == None:
+        return logic
+
+    # AND is 1 only when every terminal is 1, and 0 as soon as any terminal is 0. OR is the same with the planes swapped
+    if gate.kind == gates.CONTROL:
+        if gate.control == "0":
+            ones = mask
+            zeros = 0
+            for termOnes, termZeros in terms:
+                ones &= termOnes
+                zeros |= termZeros
+        else:
+            ones = 0
+            zeros = mask
+            for termOnes, termZeros in terms:
+                ones |= termOnes
+                zeros &= termZeros
+
+    # XOR is the parity of the 1's, but any U terminal makes the output U
+    elif gate.kind == gates.PARITY:
+        known = mask
+        parity = 0
+        for termOnes, termZeros in terms:
+            known &= termOnes | termZeros
+            parity ^= termOnes
+        ones = parity & known
+        zeros = known & ~parity
+
+    # A cell is 1 where one of the prime implicants of its 1's holds, and 0 where one of those of its 0's holds
+    else:
+        ones = cubesBits(gate.ones, terms, mask)
+        zeros = cubesBits(gate.zeros, terms, mask)
+        return ones, zeros
+
+    if gate.invert:
+        return zeros, ones
+    return ones, zeros
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The vectors where at least one of the cubes (lists of (terminal index, 0 or 1) from gates.primeCubes) holds
+def cubesBits(cubes, terms, mask):
+    bits = 0
+    for cube in cubes:
+        cubeBits = mask
+        for i, value in cube:
+            cubeBits &= terms[i][1 - value]
+        bits |= cubeBits
+    return bits
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs a block of vectors through the circuit in the order from levelize.
+# inputValues comes from inputReadBits and is not changed. Faults are injected the same way gateCalc does it:
+# a stuck-at input or gate output is forced for every vector, and a stuck-at terminal is only seen by its gate.
+# Returns a dictionary of line -> (ones, zeros)
+def parallel_sim(circuit, inputValues, fault, mask):
+    values = dict(inputValues)
+
+    faultWire = None
+    faultTerminal = None
+    if ( fault != None ):
+        faultWire = fault[ "wire" ]
+        faultTerminal = fault[ "terminal" ]
+        if ( fault[ "value" ] == '1' ):
+            forced = (mask, 0)
+        else:
+            forced = (0, mask)
+        if ( circuit[ faultWire ][0] == "INPUT" ):
+            values[ faultWire ] = forced
+
+    for curr in circuit["ORDER"][1]:
+        if ( curr == faultWire ):
+            if ( faultTerminal == None ):
+                values[curr] = forced
+                continue
+            terms = [forced if term == faultTerminal else values[term] for term in circuit[curr][1]]
+        else:
+            terms = [values[term] for term in circuit[curr][1]]
+
+        values[curr] = gateCalcBits(circuit[curr][0], terms, mask)
+
+        # ERROR Detection if LOGIC does not exist
+        if isinstance(values[curr], str):
+            print(values[curr])
+            return values[curr]
+
+    return values
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Turns the output lines of a parallel_sim result into one output string per vector,
+# in the same order main writes them (first output line is the right-most character)
+def bitsToOutputs(circuit, values, count):
+    outputs = [""] * count
+    for y in circuit["OUTPUTS"][1]:
+        ones, zeros = values[y]
+        for k in range(count):
+            if (ones >> k) & 1:
+                outputs[k] = "1" + outputs[k]
+            elif (zeros >> k) & 1:
+                outputs[k] = "0" + outputs[k]
+            else:
+                outputs[k] = "U" + outputs[k]
+    return outputs
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes the results of one input line the same way scalar_run does, for the engines that work out the good
+# output and every faulty output before writing anything. check is what inputCheck gave back for the line
+def writeVectorResult( rawLine, line, check, output, faultyOutputs, faultNames, outputFile, faultyOutputFile, displayFile, detectedFaults ):
+    outputFile.write(rawLine)
+    # Same messages as scalar_run, so the screen and the display_ file don't depend on the engine
+    if verbosity >= NORMAL:
+        print("\n ---> Now ready to simulate INPUT = " + line)
+        displayFile.write("\n ---> Now ready to simulate INPUT = " + line + "\n")
+    if check == -1:
+        if verbosity >= NORMAL:
+            print("INPUT ERROR: INSUFFICIENT BITS")
+        outputFile.write(" -> INPUT ERROR: INSUFFICIENT BITS" + "\n")
+        faultyOutputFile.write( " -> INPUT ERROR: INSUFFICIENT BITS" + "\n" )
+        if verbosity >= NORMAL:
+            print("...move on to next input\n")
+        return
+    elif check == -2:
+        if verbosity >= NORMAL:
+            print("INPUT ERROR: INVALID INPUT VALUE/S")
+        outputFile.write(" -> INPUT ERROR: INVALID INPUT VALUE/S" + "\n")
+        faultyOutputFile.write( " -> INPUT ERROR: INVALID INPUT VALUE/S" + "\n" )
+        if verbosity >= NORMAL:
+            print("...move on to next input\n")
+        return
+
+    if verbosity >= NORMAL:
+        print("\n *** Summary of simulation of good circuit: ")
+        print(line + " -> " + output + " written into output file. \n")
+        displayFile.write("\n *** Summary of simulation of good circuit: \n")
+        displayFile.write(line + " -> " + output + " written into output file. \n")
+    outputFile.write( " -> " + output + "\n" )
+
+    for i in range(len(faultNames)):
+        faultyOutput = faultyOutputs[i]
+        faultyOutputFile.write( line + " -> " + faultyOutput + "\n" )
+        if ( faultyOutput != output ):
+            faultyOutputFile.write( faultNames[i] + " detected!\n\n" )
+            if verbosity >= NORMAL:
+                displayFile.write( faultNames[i] + " detected for the input: " + line + "\n" )
+            detectedFaults[ faultNames[i] ] = True
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Bit-parallel grading of a block of (already checked) input lines against the good circuit and every fault.
+# Returns a list with one (good output, list of faulty outputs) per line
+def parallel_pattern_grade( circuit, lines, faults ):
+    inputValues, mask = inputReadBits(circuit, lines)
+    goodValues = parallel_sim(circuit, inputValues, None, mask)
+    if isinstance(goodValues, str):
+        return goodValues
+    goodOutputs = bitsToOutputs(circuit, goodValues, len(lines))
+
+    faultyOutputs = []
+    for fault in faults:
+        faultyValues = parallel_sim(circuit, inputValues, fault, mask)
+        if isinstance(faultyValues, str):
+            return faultyValues
+        # Most faults don't reach the outputs on most vectors, so only build new strings when something changed
+        changed = False
+        for y in circuit["OUTPUTS"][1]:
+            if faultyValues[y] != goodValues[y]:
+                changed = True
+                break
+        if changed:
+            faultyOutputs.append(bitsToOutputs(circuit, faultyValues, len(lines)))
+        else:
+            faultyOutputs.append(goodOutputs)
+
+    return [(goodOutputs[k], [faultyOutputs[i][k] for i in range(len(faults))]) for k in range(len(lines))]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# PARALLEL-FAULT SIMULATION
+# Same (ones, zeros) pairs as the bit-parallel pattern engine, but here every bit is a different machine for the same
+# input vector: bit 0 is the good circuit, and bit i is the circuit with the i-th fault of the current group.
+# Stuck-at faults become masks: a line stuck at 1 in machine i gets bit i forced on in ones and off in zeros.
 
+# Number of machines (good circuit + faults) simulated in one sweep of the netlist
+FAULT_WORD = 64
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Builds the injection masks for a group of faults, where fault j of the group is machine j + 1.
+# wireForce[wire] = (force to 1, force to 0) for faults on inputs and gate outputs
+# pinForce[gate][terminal] = (force to 1, force to 0) for -IN- faults, which only the gate itself sees
+def faultMasks(faults):
+    wireForce = {}
+    pinForce = {}
+    for j in range(len(faults)):
+        fault = faults[j]
+        bit = 1 << (j + 1)
+        if ( fault[ "terminal" ] == None ):
+            force = wireForce.setdefault( fault[ "wire" ], [0, 0] )
+        else:
+            force = pinForce.setdefault( fault[ "wire" ], {} ).setdefault( fault[ "terminal" ], [0, 0] )
+        if ( fault[ "value" ] == '1' ):
+            force[0] |= bit
+        else:
+            force[1] |= bit
+    return wireForce, pinForce
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Overrides the machines in force on a (ones, zeros) pair
+def applyForce(pair, force):
+    keep = ~(force[0] | force[1])
+    return ((pair[0] & keep) | force[0], (pair[1] & keep) | force[1])
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs one (already checked) input line through the good circuit and a group of faulty circuits at once.
+# Returns a dictionary of line -> (ones, zeros), where bit 0 is the good circuit
+def parallel_fault_sim(circuit, line, wireForce, pinForce, mask):
+    width = circuit["INPUT_WIDTH"][1]
+    inputs = circuit["INPUTS"][1]
+    line = line[(len(line) - width):(len(line))].upper()
+
+    # Every machine sees the same input vector, except where a stuck-at input overrides it
+    values = {}
+    for i in range(width):
+        bitVal = line[width - 1 - i]
+        if bitVal == "1":
+            values[inputs[i]] = (mask, 0)
+        elif bitVal == "0":
+            values[inputs[i]] = (0, mask)
+        else:
+            values[inputs[i]] = (0, 0)
+        if inputs[i] in wireForce:
+            values[inputs[i]] = applyForce(values[inputs[i]], wireForce[inputs[i]])
+
+    for curr in circuit["ORDER"][1]:
+        if curr in pinForce:
+            gatePins = pinForce[curr]
+            terms = [applyForce(values[term], gatePins[term]) if term in gatePins else values[term] for term in circuit[curr][1]]
+        else:
+            terms = [values[term] for term in circuit[curr][1]]
+
+        value = gateCalcBits(circuit[curr][0], terms, mask)
+
+        # ERROR Detection if LOGIC does not exist
+        if isinstance(value, str):
+            print(value)
+            return value
+
+        if curr in wireForce:
+            value = applyForce(value, wireForce[curr])
+        values[curr] = value
+
+    return values
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Splits the fault list into groups of FAULT_WORD - 1 faults and builds the masks of each group.
+# Returns a list of (number of faults, wireForce, pinForce, mask) with at least one group, so the good circuit always runs
+def faultGroups(faults):
+    groups = []
+    for start in range(0, len(faults), FAULT_WORD - 1):
+        group = faults[start:start + FAULT_WORD - 1]
+        wireForce, pinForce = faultMasks(group)
+        groups.append((len(group), wireForce, pinForce, (1 << (len(group) + 1)) - 1))
+    if len(groups) == 0:
+        groups.append((0, {}, {}, 1))
+    return groups
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grades every group from faultGroups against one (already checked) input line.
+# Returns the good output string and the list of faulty output strings, in fault list order
+def parallel_fault_outputs(circuit, line, groups):
+    output = None
+    faultyOutputs = []
+    for count, wireForce, pinForce, mask in groups:
+        values = parallel_fault_sim(circuit, line, wireForce, pinForce, mask)
+        if isinstance(values, str):
+            return values
+        machineOutputs = bitsToOutputs(circuit, values, count + 1)
+        output = machineOutputs[0]
+        faultyOutputs.extend(machineOutputs[1:])
+    return output, faultyOutputs
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Parallel-fault grading, FAULT_WORD - 1 faults per sweep of the netlist for each (already checked) input line.
+# Returns a list with one (good output, list of faulty outputs) per line
+def parallel_fault_grade( circuit, lines, faults ):
+    groups = faultGroups(faults)
+    results = []
+    for line in lines:
+        result = parallel_fault_outputs(circuit, line, groups)
+        if isinstance(result, str):
+            return result
+        results.append(result)
+    return results
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# DEDUCTIVE FAULT SIMULATION
+# One good-circuit pass per input vector, carrying along for every line the set of faults (as indices into the fault
+# list) that would flip it. Inputs and gates start with their own stuck-at faults that disagree with the good value, and
+# each gate works out its output set from the sets of its terminals:
+#   control gates (AND/NAND/OR/NOR, and BUFF/NOT with their one terminal) with no terminal at the controlling value:
+#   union of all the terminal sets
+#   control gates with some terminals at the controlling value: faults flipping ALL of those and NONE of the others
+#   XOR/XNOR: faults flipping an odd number of terminals
+#   table cells (MUX, AOI/OAI, ...): every fault in any terminal set is tried on the cell's truth table, with the
+#   terminals it flips flipped, and kept if the output flips
+# (the controlling value comes from the gate library; inversion doesn't change the sets)
+# A fault is detected when it shows up in the set of any output line. This only works with 0's and 1's, so input
+# vectors with a U fall back to parallel_fault_outputs.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Sorts the fault list by where each fault gets injected.
+# lineFaults[wire][value] = indices of faults with the input or gate output stuck at value (0 or 1)
+# pinFaults[gate][terminal][value] = indices of -IN- faults on that terminal of that gate stuck at value
+def deductiveFaultSites(faults):
+    lineFaults = {}
+    pinFaults = {}
+    for i in range(len(faults)):
+        fault = faults[i]
+        if ( fault[ "terminal" ] == None ):
+            site = lineFaults.setdefault( fault[ "wire" ], ([], []) )
+        else:
+            site = pinFaults.setdefault( fault[ "wire" ], {} ).setdefault( fault[ "terminal" ], ([], []) )
+        if ( fault[ "value" ] == '1' ):
+            site[1].append(i)
+        else:
+            site[0].append(i)
+    return lineFaults, pinFaults
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs one input line made of only 0's and 1's, and deduces the fault set of every line.
+# Returns the dictionary of good values (0 or 1) and the dictionary of fault sets
+def deductive_sim(circuit, line, lineFaults, pinFaults):
+    width = circuit["INPUT_WIDTH"][1]
+    inputs = circuit["INPUTS"][1]
+    line = line[(len(line) - width):(len(line))]
+
+    values = {}
+    faultSets = {}
+    for i in range(width):
+        value = int(line[width - 1 - i])
+        values[inputs[i]] = value
+        if inputs[i] in lineFaults:
+            faultSets[inputs[i]] = set(lineFaults[inputs[i]][1 - value])
+        else:
+            faultSets[inputs[i]] = set()
+
+    for curr in circuit["ORDER"][1]:
+        logic = circuit[curr][0]
+        terms = circuit[curr][1]
+
+        # The good value, worked out with the bitwise kernel on a 1-vector block
+        termValues = [values[term] for term in terms]
+        value = gateCalcBits(logic, [(value, 1 - value) for value in termValues], 1)
+        if isinstance(value, str):
+            print(value)
+            return value
+        value = value[0]
+        values[curr] = value
+
+        # The sets coming in on each terminal, plus any -IN- fault on that terminal that disagrees with it
+        termSets = [faultSets[term] for term in terms]
+        if curr in pinFaults:
+            gatePins = pinFaults[curr]
+            for j in range(len(terms)):
+                if terms[j] in gatePins:
+                    termSets[j] = termSets[j].union(gatePins[terms[j]][1 - termValues[j]])
+
+        gate = gates.GATE_TYPES[logic]
+        if gate.kind == gates.PARITY:
+            outSet = set()
+            for termSet in termSets:
+                outSet = outSet.symmetric_difference(termSet)
+        elif gate.kind == gates.TABLE:
+            key = "".join([str(termValue) for termValue in termValues])
+            outSet = set()
+            for i in set().union(*termSets):
+                flipped = "".join([str(1 - termValues[j]) if i in termSets[j] else key[j] for j in range(len(terms))])
+                if gate.table[flipped] != gate.table[key]:
+                    outSet.add(i)
+        else:
+            controlling = int(gate.control)
+            controlSets = [termSets[j] for j in range(len(terms)) if termValues[j] == controlling]
+            if len(controlSets) == 0:
+                outSet = set().union(*termSets)
+            else:
+                otherSets = [termSets[j] for j in range(len(terms)) if termValues[j] != controlling]
+                outSet = set.intersection(*controlSets).difference(*otherSets)
+
+        # The gate's own stuck-at fault at the opposite of the good value
+        if curr in lineFaults:
+            outSet = outSet.union(lineFaults[curr][1 - value])
+        faultSets[curr] = outSet
+
+    return values, faultSets
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Deductive grading of (already checked) input lines. Lines with a U go to the parallel-fault engine.
+# Returns a list with one (good output, list of faulty outputs) per line
+def deductive_grade( circuit, lines, faults ):
+    lineFaults, pinFaults = deductiveFaultSites(faults)
+    outputs = circuit["OUTPUTS"][1]
+    width = circuit["INPUT_WIDTH"][1]
+
+    # Only made if an input line has a U in it
+    groups = None
+
+    results = []
+    for line in lines:
+        if "U" in line[(len(line) - width):(len(line))].upper():
+            if groups == None:
+                groups = faultGroups(faults)
+            result = parallel_fault_outputs(circuit, line, groups)
+            if isinstance(result, str):
+                return result
+            results.append(result)
+            continue
+
+        result = deductive_sim(circuit, line, lineFaults, pinFaults)
+        if isinstance(result, str):
+            return result
+        values, faultSets = result
+
+        output = ""
+        for y in outputs:
+            output = str(values[y]) + output
+
+        # A fault on the set of an output line flips that output bit, everything else gives the good output
+        faultyOutputs = [output] * len(faults)
+        for i in set().union(*[faultSets[y] for y in outputs]):
+            faultyOutput = ""
+            for y in outputs:
+                if i in faultSets[y]:
+                    faultyOutput = str(1 - values[y]) + faultyOutput
+                else:
+                    faultyOutput = str(values[y]) + faultyOutput
+            faultyOutputs[i] = faultyOutput
+
+        results.append((output, faultyOutputs))
+
+    return results
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# EVENT-DRIVEN FAULT SIMULATION
+# A stuck-at fault can only change the gates downstream of where it sits. So the good circuit is run once per input
+# vector, and each faulty circuit starts from those good values and only re-evaluates the gates whose terminals actually
+# changed, following circuit["FANOUT"] from levelize. Gates are taken in level order, so each one is evaluated at most
+# once, and the run is over as soon as no more differences are left to propagate.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Same logic as gateCalc, but on a plain list of terminal values ('0', '1' or 'U') instead of the circuit
+# dictionary. Returns the output value, or the logic if it does not exist
+def gateCalcValues(logic, values):
+    gate = gates.GATE_TYPES.get(logic)
+    if gate == None:
+        return logic
+    return gates.evalChars(gate, values)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs one (already checked) input line through the good circuit. Returns the dictionary of line -> value,
+# which the faulty circuits read from but never change
+def event_good_sim(circuit, line):
+    width = circuit["INPUT_WIDTH"][1]
+    inputs = circuit["INPUTS"][1]
+    line = line[(len(line) - width):(len(line))].upper()
+
+    values = {}
+    for i in range(width):
+        values[inputs[i]] = line[width - 1 - i]
+
+    for curr in circuit["ORDER"][1]:
+        value = gateCalcValues(circuit[curr][0], [values[term] for term in circuit[curr][1]])
+        if value not in ['0', '1', "U"]:
+            print(value)
+            return value
+        values[curr] = value
+
+    return values
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs one fault starting from the good values, only touching the fanout cone of the fault.
+# Returns the dictionary of the lines that ended up different from the good circuit (line -> faulty value)
+def event_fault_sim(circuit, goodValues, fault):
+    fanout = circuit["FANOUT"][1]
+    levels = circuit["LEVELS"][1]
+    faultWire = fault[ "wire" ]
+    faultTerminal = fault[ "terminal" ]
+
+    changed = {}
+    events = []     # heap of (level, gate) still to be evaluated
+    scheduled = {}  # gates already on the heap
+
+    if ( faultTerminal == None ):
+        # Stuck-at input or gate output: nothing happens unless it disagrees with the good value
+        if ( goodValues[ faultWire ] == fault[ "value" ] ):
+            return changed
+        changed[ faultWire ] = fault[ "value" ]
+        for nextGate in fanout[ faultWire ]:
+            if nextGate not in scheduled:
+                scheduled[nextGate] = True
+                heapq.heappush(events, (levels[nextGate], nextGate))
+    else:
+        # Stuck-at terminal: only its own gate sees it
+        if ( goodValues[ faultTerminal ] == fault[ "value" ] ):
+            return changed
+        scheduled[ faultWire ] = True
+        heapq.heappush(events, (levels[ faultWire ], faultWire))
+
+    while len(events) > 0:
+        level, curr = heapq.heappop(events)
+
+        # The stuck gate output keeps its value no matter what
+        if ( curr == faultWire and faultTerminal == None ):
+            continue
+
+        termValues = []
+        for term in circuit[curr][1]:
+            if ( curr == faultWire and term == faultTerminal ):
+                termValues.append( fault[ "value" ] )
+            else:
+                termValues.append( changed.get(term, goodValues[term]) )
+        value = gateCalcValues(circuit[curr][0], termValues)
+
+        # The difference died out at this gate
+        if value == goodValues[curr]:
+            continue
+
+        changed[curr] = value
+        for nextGate in fanout[curr]:
+            if nextGate not in scheduled:
+                scheduled[nextGate] = True
+                heapq.heappush(events, (levels[nextGate], nextGate))
+
+    return changed
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Event-driven grading of (already checked) input lines.
+# Returns a list with one (good output, list of faulty outputs) per line
+def event_grade( circuit, lines, faults ):
+    outputs = circuit["OUTPUTS"][1]
+
+    results = []
+    for line in lines:
+        goodValues = event_good_sim(circuit, line)
+        if isinstance(goodValues, str):
+            return goodValues
+
+        output = ""
+        for y in outputs:
+            output = goodValues[y] + output
+
+        faultyOutputs = []
+        for fault in faults:
+            changed = event_fault_sim(circuit, goodValues, fault)
+            if len(changed) == 0:
+                faultyOutputs.append(output)
+                continue
+            faultyOutput = ""
+            for y in outputs:
+                faultyOutput = changed.get(y, goodValues[y]) + faultyOutput
+            faultyOutputs.append(faultyOutput)
+
+        results.append((output, faultyOutputs))
+
+    return results
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# NUMPY VECTORIZED SIMULATION
+# For big batches of input vectors. Every line is a row of two NumPy bit planes (ones and zeros, the same encoding as the
+# bit-parallel engine: U is neither), packed 64 vectors to a uint64 word. The gates are grouped by level, logic and
+# number of terminals, so each group is a single array operation over all of its gates and all of the vectors.
+# The faults share one scratch copy of the good values: each fault only re-evaluates the groups of gates downstream of
+# it and then puts the good values back into those rows. The row numbers and the grouped plan of the whole circuit are
+# worked out once and kept in the circuit dictionary, and so are the plans of the fault cones, up to NUMPY_CONE_LIMIT.
+
+# Number of input vectors in each batch of arrays
+NUMPY_BLOCK = 4096
+
+# Bytes the four planes (good and scratch ones and zeros) may take; a big circuit gets fewer vectors at a time
+NUMPY_MEMORY = 64 << 20
+
+# Row numbers kept in the cached cone plans, all wires together. Past it the oldest cones are forgotten, and built
+# again if a fault on that wire comes up again (the faults of a wire are next to each other in a fault list)
+NUMPY_CONE_LIMIT = 1 << 21
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Gives every line a row number and groups the given gates by (level, logic, number of terminals).
+# Returns a list of (logic, output rows, terminal rows) in level order, the rows being NumPy index arrays
+def numpyGroups(circuit, rows, gates):
+    levels = circuit["LEVELS"][1]
+    groups = {}
+    for gate in gates:
+        key = (levels[gate], circuit[gate][0], len(circuit[gate][1]))
+        if key not in groups:
+            groups[key] = ([], [])
+        groups[key][0].append(rows[gate])
+        groups[key][1].append([rows[term] for term in circuit[gate][1]])
+
+    plan = []
+    for key in sorted(groups):
+        outRows, termRows = groups[key]
+        plan.append((key[1], numpy.array(outRows), numpy.array(termRows)))
+    return plan
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Gives every line a row number and groups the whole circuit the first time it is needed, keeping them in the
+# circuit dictionary as
+#   circuit["NUMPY"] = ["NumPy plans", [rows, plan of the whole circuit, {fault wire: (cone rows, cone plan, size)},
+#                                       total size of the cone plans]]
+# The cone plans are filled in by numpyCone as faults on each wire come up
+def numpyPlans(circuit):
+    if "NUMPY" not in circuit:
+        rows = {}
+        for line in circuit["INPUTS"][1] + circuit["ORDER"][1]:
+            if line not in rows:
+                rows[line] = len(rows)
+        circuit["NUMPY"] = ["NumPy plans", [rows, numpyGroups(circuit, rows, circuit["ORDER"][1]), {}, 0]]
+    return circuit["NUMPY"][1]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Returns (rows, plan) for everything downstream of a fault wire, the rows including the wire itself so
+# they are every row a fault on that wire can change
+def numpyCone(circuit, wire):
+    plans = numpyPlans(circuit)
+    rows, cones = plans[0], plans[2]
+    if wire not in cones:
+        fanout = circuit["FANOUT"][1]
+        cone = {}
+        stack = [wire]
+        while len(stack) > 0:
+            for gate in fanout[stack.pop()]:
+                if gate not in cone:
+                    cone[gate] = True
+                    stack.append(gate)
+        coneRows = numpy.array([rows[wire]] + [rows[gate] for gate in cone], dtype=numpy.intp)
+        conePlan = numpyGroups(circuit, rows, cone)
+
+        # Row numbers in the plan: one output row and its terminal rows per gate
+        size = len(coneRows)
+        for logic, outRows, termRows in conePlan:
+            size += outRows.size + termRows.size
+        # Oldest first, which is the order a dictionary keeps
+        while len(cones) > 0 and plans[3] + size > NUMPY_CONE_LIMIT:
+            oldest = next(iter(cones))
+            plans[3] -= cones[oldest][2]
+            del cones[oldest]
+        cones[wire] = (coneRows, conePlan, size)
+        plans[3] += size
+    return cones[wire][0], cones[wire][1]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: NumPy version of gateCalcBits. ones and zeros are (gates, terminals, words) bit planes of a group of gates
+# with the same logic. Returns the (ones, zeros) planes of the gate outputs, shaped (gates, words)
+def gateCalcArrays(logic, ones, zeros):
+    gate = gates.GATE_TYPES.get(logic)
+    # Error detection... the gate logic does not exist
+    if gate == None:
+        return logic
+
+    if gate.kind == gates.CONTROL:
+        if gate.control == "0":
+            outOnes = numpy.bitwise_and.reduce(ones, axis=1)
+            outZeros = numpy.bitwise_or.reduce(zeros, axis=1)
+        else:
+            outOnes = numpy.bitwise_or.reduce(ones, axis=1)
+            outZeros = numpy.bitwise_and.reduce(zeros, axis=1)
+
+    elif gate.kind == gates.PARITY:
+        known = numpy.bitwise_and.reduce(ones | zeros, axis=1)
+        parity = numpy.bitwise_xor.reduce(ones, axis=1)
+        outOnes = parity & known
+        outZeros = known & ~parity
+
+    # A cell: an OR of the prime implicants, each an AND of terminal planes
+    else:
+        planes = (zeros, ones)
+        outOnes = numpy.zeros(ones[:, 0].shape, dtype=ones.dtype)
+        for cube in gate.ones:
+            outOnes |= numpy.bitwise_and.reduce([planes[value][:, i] for i, value in cube])
+        outZeros = numpy.zeros(ones[:, 0].shape, dtype=ones.dtype)
+        for cube in gate.zeros:
+            outZeros |= numpy.bitwise_and.reduce([planes[value][:, i] for i, value in cube])
+        return outOnes, outZeros
+
+    if gate.invert:
+        return outZeros, outOnes
+    return outOnes, outZeros
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Evaluates a plan from numpyGroups in place on the ones and zeros planes.
+# Returns the error message if a gate logic does not exist
+def numpy_sim(plan, ones, zeros):
+    for logic, outRows, termRows in plan:
+        result = gateCalcArrays(logic, ones[termRows], zeros[termRows])
+        if isinstance(result, str):
+            print(result)
+            return result
+        ones[outRows] = result[0]
+        zeros[outRows] = result[1]
+    return None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Packs a (lines, vectors) boolean array into (lines, words) uint64 bit planes, vector k being bit k % 64 of
+# word k // 64 (the unused bits of the last word are 0)
+def packPlanes(bits):
+    words = (bits.shape[1] + 63) // 64
+    padded = numpy.zeros((bits.shape[0], words * 64), dtype=bool)
+    padded[:, :bits.shape[1]] = bits
+    return numpy.packbits(padded, axis=1, bitorder="little").view(numpy.uint64)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Turns the output rows into one output string per vector, first output line as the right-most character
+def arraysToOutputs(outputRows, ones, zeros, count):
+    width = len(outputRows)
+    if width == 0:
+        return [""] * count
+    # Reversed so the first output line ends up on the right once each vector's column is read as a string
+    rows = outputRows[::-1]
+    outOnes = numpy.unpackbits(ones[rows].view(numpy.uint8), axis=1, count=count, bitorder="little").astype(bool)
+    outZeros = numpy.unpackbits(zeros[rows].view(numpy.uint8), axis=1, count=count, bitorder="little").astype(bool)
+    chars = numpy.where(outOnes, ord("1"), numpy.where(outZeros, ord("0"), ord("U"))).astype(numpy.uint8)
+    text = chars.T.tobytes().decode("ascii")
+    return [text[k * width:(k + 1) * width] for k in range(count)]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Vectorized grading of a block of (already checked) input lines against the good circuit and every fault.
+# A block too big for NUMPY_MEMORY on this circuit is graded a piece at a time.
+# Returns a list with one (good output, list of faulty outputs) per line
+def numpy_grade( circuit, lines, faults ):
+    width = circuit["INPUT_WIDTH"][1]
+    inputs = circuit["INPUTS"][1]
+    rows, plan = numpyPlans(circuit)[0:2]
+
+    # Four planes of len(rows) rows, a byte per 8 vectors, rounded down to whole words
+    pieceSize = max(64, NUMPY_MEMORY // (4 * max(1, len(rows))) * 8 // 64 * 64)
+    if len(lines) > pieceSize:
+        results = []
+        for start in range(0, len(lines), pieceSize):
+            pieceResults = numpy_grade(circuit, lines[start:start + pieceSize], faults)
+            if isinstance(pieceResults, str):
+                return pieceResults
+            results.extend(pieceResults)
+        return results
+
+    count = len(lines)
+    outputRows = numpy.array([rows[y] for y in circuit["OUTPUTS"][1]], dtype=numpy.intp)
+
+    # Same as inputRead: only the last INPUT_WIDTH bits are used, and the right-most bit goes to the first input
+    text = "".join([line[(len(line) - width):(len(line))].upper() for line in lines])
+    chars = numpy.frombuffer(text.encode("ascii"), dtype=numpy.uint8).reshape(count, width)
+    inputRows = numpy.array([rows[inputs[i]] for i in range(width)], dtype=numpy.intp)
+    # Column width - 1 - i of chars belongs to input i
+    inputChars = chars[:, ::-1].T
+    words = (count + 63) // 64
+    ones = numpy.zeros((len(rows), words), dtype=numpy.uint64)
+    zeros = numpy.zeros((len(rows), words), dtype=numpy.uint64)
+    ones[inputRows] = packPlanes(inputChars == ord("1"))
+    zeros[inputRows] = packPlanes(inputChars == ord("0"))
+    # Every vector of the block, for the stuck-at values (so the unused bits stay 0 and U)
+    allVectors = packPlanes(numpy.ones((1, count), dtype=bool))[0]
+    noVectors = numpy.zeros(words, dtype=numpy.uint64)
+
+    msg = numpy_sim(plan, ones, zeros)
+    if msg != None:
+        return msg
+    goodOutputs = arraysToOutputs(outputRows, ones, zeros, count)
+
+    # One scratch copy for every fault; each fault only writes its cone rows and puts them back afterwards
+    faultyOnes = ones.copy()
+    faultyZeros = zeros.copy()
+    faultyOutputs = []
+    for fault in faults:
+        faultWire = fault[ "wire" ]
+        if fault[ "value" ] == '1':
+            forcedOnes, forcedZeros = allVectors, noVectors
+        else:
+            forcedOnes, forcedZeros = noVectors, allVectors
+        coneRows, conePlan = numpyCone(circuit, faultWire)
+
+        if ( fault[ "terminal" ] == None ):
+            faultyOnes[rows[faultWire]] = forcedOnes
+            faultyZeros[rows[faultWire]] = forcedZeros
+        else:
+            # A stuck-at terminal is only seen by its own gate, so that gate is calculated on its own first
+            termRows = numpy.array([[rows[term] for term in circuit[faultWire][1]]])
+            termOnes = faultyOnes[termRows]
+            termZeros = faultyZeros[termRows]
+            for j in range(len(circuit[faultWire][1])):
+                if circuit[faultWire][1][j] == fault[ "terminal" ]:
+                    termOnes[0, j] = forcedOnes
+                    termZeros[0, j] = forcedZeros
+            result = gateCalcArrays(circuit[faultWire][0], termOnes, termZeros)
+            if isinstance(result, str):
+                print(result)
+                return result
+            faultyOnes[rows[faultWire]] = result[0][0]
+            faultyZeros[rows[faultWire]] = result[1][0]
+
+        # Everything downstream of the fault site
+        msg = numpy_sim(conePlan, faultyOnes, faultyZeros)
+        if msg != None:
+            return msg
+
+        # Most faults don't reach the outputs on most vectors, so only build new strings when something changed
+        if numpy.array_equal(faultyOnes[outputRows], ones[outputRows]) and numpy.array_equal(faultyZeros[outputRows], zeros[outputRows]):
+            faultyOutputs.append(goodOutputs)
+        else:
+            faultyOutputs.append(arraysToOutputs(outputRows, faultyOnes, faultyZeros, count))
+
+        faultyOnes[coneRows] = ones[coneRows]
+        faultyZeros[coneRows] = zeros[coneRows]
+
+    return [(goodOutputs[k], [faultyOutputs[i][k] for i in range(len(faults))]) for k in range(count)]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# COMPILED SIMULATION
+# The netlist is turned into Python source once: every line becomes a pair of local variables (ones and zeros, the same
+# bit-parallel encoding as the parallel engine) and every gate one bitwise expression, in the order from levelize.
+# compile() and exec then give two plain functions, so simulating a block of vectors does no dictionary lookups and no
+# checking of gate logic strings at all.
+# The faulty version takes the fault as a site number plus the forced (ones, zeros) pair. Every input, gate output and
+# gate terminal has its own site number, and the generated code checks it right where that site gets its value.
+#
+# e.g. for g = NAND(a, b) with a and b as the first two inputs, the faulty function looks like:
+#   def faulty(inputs, mask, site, forcedOnes, forcedZeros):
+#       o0, z0 = inputs[0]
+#       if site == 0: o0 = forcedOnes; z0 = forcedZeros
+#       o1, z1 = inputs[1]
+#       if site == 1: o1 = forcedOnes; z1 = forcedZeros
+#       if site == 3: o2 = forcedZeros | z1; z2 = forcedOnes & o1      <- g's terminal a stuck-at
+#       elif site == 4: o2 = z0 | forcedZeros; z2 = o0 & forcedOnes      <- g's terminal b stuck-at
+#       else: o2 = z0 | z1; z2 = o0 & o1
+#       if site == 2: o2 = forcedOnes; z2 = forcedZeros
+#       return ((o2, z2), )
+# The functions are generated the first time a circuit is graded and kept in the circuit dictionary, so every later
+# block is a dictionary lookup away from them.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The expressions of one gate, given the (ones, zeros) variable names of its terminals.
+# Returns the ones and zeros expressions, or None if the gate logic does not exist
+def gateExpressions(logic, terms):
+    gate = gates.GATE_TYPES.get(logic)
+    if gate == None:
+        return None
+
+    if gate.kind == gates.CONTROL:
+        if gate.control == "0":
+            ones = " & ".join([term[0] for term in terms])
+            zeros = " | ".join([term[1] for term in terms])
+        else:
+            ones = " | ".join([term[0] for term in terms])
+            zeros = " & ".join([term[1] for term in terms])
+
+    # XOR is the parity of the 1's, only where every terminal is known
+    elif gate.kind == gates.PARITY:
+        known = " & ".join(["(" + term[0] + " | " + term[1] + ")" for term in terms])
+        parity = "(" + " ^ ".join([term[0] for term in terms]) + ")"
+        ones = parity + " & " + known
+        zeros = "~" + parity + " & " + known
+
+    # A cell: an OR of the prime implicants, each an AND of terminal planes
+    else:
+        ones = " | ".join(["(" + " & ".join([terms[i][1 - value] for i, value in cube]) + ")" for cube in gate.ones])
+        zeros = " | ".join(["(" + " & ".join([terms[i][1 - value] for i, value in cube]) + ")" for cube in gate.zeros])
+        return ones, zeros
+
+    if gate.invert:
+        return zeros, ones
+    return ones, zeros
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes the source of the good and faulty functions for the circuit.
+# Returns the source and the dictionary of (line, terminal or None) -> site number, or the error message if a gate
+# logic does not exist
+def compiledSource(circuit):
+    names = {}
+    sites = {}
+    good = ["def good(inputs, mask):"]
+    faulty = ["def faulty(inputs, mask, site, forcedOnes, forcedZeros):"]
+
+    for i in range(len(circuit["INPUTS"][1])):
+        x = circuit["INPUTS"][1][i]
+        n = str(len(names))
+        names[x] = ("o" + n, "z" + n)
+        sites[(x, None)] = len(sites)
+        good.append("    o" + n + ", z" + n + " = inputs[" + str(i) + "]")
+        faulty.append("    o" + n + ", z" + n + " = inputs[" + str(i) + "]")
+        faulty.append("    if site == " + str(sites[(x, None)]) + ": o" + n + " = forcedOnes; z" + n + " = forcedZeros")
+
+    for gate in circuit["ORDER"][1]:
+        logic = circuit[gate][0]
+        terms = [names[term] for term in circuit[gate][1]]
+        expressions = gateExpressions(logic, terms)
+        # ERROR Detection if LOGIC does not exist
+        if expressions == None:
+            print(logic)
+            return logic
+
+        n = str(len(names))
+        names[gate] = ("o" + n, "z" + n)
+        sites[(gate, None)] = len(sites)
+        assign = "o" + n + " = " + expressions[0] + "; z" + n + " = " + expressions[1]
+        good.append("    " + assign)
+
+        # One variant of the gate for every terminal that can be stuck-at, with that terminal's pair forced
+        keyword = "if"
+        for term in circuit[gate][1]:
+            if (gate, term) in sites:
+                continue
+            sites[(gate, term)] = len(sites)
+            forcedTerms = [("forcedOnes", "forcedZeros") if t == term else names[t] for t in circuit[gate][1]]
+            forced = gateExpressions(logic, forcedTerms)
+            faulty.append("    " + keyword + " site == " + str(sites[(gate, term)]) + ": o" + n + " = " + forced[0] + "; z" + n + " = " + forced[1])
+            keyword = "elif"
+        if keyword == "elif":
+            faulty.append("    else: " + assign)
+        else:
+            faulty.append("    " + assign)
+        faulty.append("    if site == " + str(sites[(gate, None)]) + ": o" + n + " = forcedOnes; z" + n + " = forcedZeros")
+
+    outputs = "(" + "".join(["(" + names[y][0] + ", " + names[y][1] + "), " for y in circuit["OUTPUTS"][1]]) + ")"
+    good.append("    return " + outputs)
+    faulty.append("    return " + outputs)
+    return "\n".join(good) + "\n\n" + "\n".join(faulty) + "\n", sites
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Generates and compiles the functions of the circuit the first time they are needed and keeps them in the
+# circuit dictionary as
+#   circuit["COMPILED"] = ["Compiled functions", (good function, faulty function, dictionary of site numbers)]
+# Returns the good function, the faulty function and the dictionary of site numbers, or the error message
+def compiledCircuit(circuit):
+    if "COMPILED" not in circuit:
+        source = compiledSource(circuit)
+        if isinstance(source, str):
+            return source
+        source, sites = source
+        namespace = {}
+        exec(compile(source, "<compiled netlist>", "exec"), namespace)
+        circuit["COMPILED"] = ["Compiled functions", (namespace["good"], namespace["faulty"], sites)]
+    return circuit["COMPILED"][1]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grading of a block of (already checked) input lines with the compiled functions of the circuit.
+# Returns a list with one (good output, list of faulty outputs) per line
+def compiled_grade( circuit, lines, faults ):
+    compiled = compiledCircuit(circuit)
+    if isinstance(compiled, str):
+        return compiled
+    good, faulty, sites = compiled
+
+    inputValues, mask = inputReadBits(circuit, lines)
+    inputs = [inputValues[x] for x in circuit["INPUTS"][1]]
+    outputs = circuit["OUTPUTS"][1]
+
+    goodPairs = good(inputs, mask)
+    goodOutputs = bitsToOutputs(circuit, dict(zip(outputs, goodPairs)), len(lines))
+
+    faultyOutputs = []
+    for fault in faults:
+        if ( fault[ "value" ] == '1' ):
+            forcedOnes, forcedZeros = mask, 0
+        else:
+            forcedOnes, forcedZeros = 0, mask
+        # A fault on a terminal the gate doesn't have is site -1, which never matches anything (same as parallel_sim)
+        site = sites.get((fault[ "wire" ], fault[ "terminal" ]), -1)
+
+        faultyPairs = faulty(inputs, mask, site, forcedOnes, forcedZeros)
+        if faultyPairs == goodPairs:
+            faultyOutputs.append(goodOutputs)
+        else:
+            faultyOutputs.append(bitsToOutputs(circuit, dict(zip(outputs, faultyPairs)), len(lines)))
+
+    return [(goodOutputs[k], [faultyOutputs[i][k] for i in range(len(faults))]) for k in range(len(lines))]
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# COMPACT SIMULATION
+# Runs on the Circuit from compact.py instead of the dictionary: integer line IDs, gate logic as small integers,
+# terminals and fanout in flat arrays and all the line values in one bytearray. Every fault is run in one scratch copy of
+# the good values, calculating only the gates downstream of the fault in level order, and the lines it changed are put
+# back afterwards.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Builds the compact Circuit the first time it is needed and keeps it in the circuit dictionary as
+#   circuit["COMPACT"] = ["Compact circuit", Circuit]
+# Returns the Circuit, or the error message if a gate logic does not exist
+def compactCircuit(circuit):
+    if "COMPACT" not in circuit:
+        compactForm = compact.Circuit.fromDict(circuit)
+        # ERROR Detection if LOGIC does not exist
+        if isinstance(compactForm, str):
+            print(compactForm)
+            return compactForm
+        circuit["COMPACT"] = ["Compact circuit", compactForm]
+    return circuit["COMPACT"][1]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grading of (already checked) input lines on the compact Circuit.
+# Returns a list with one (good output, list of faulty outputs) per line
+def compact_grade( circuit, lines, faults ):
+    compactForm = compactCircuit(circuit)
+    if isinstance(compactForm, str):
+        return compactForm
+
+    # The faults as line IDs, worked out once for the whole block
+    sites = []
+    for fault in faults:
+        terminal = None
+        if ( fault[ "terminal" ] != None ):
+            terminal = compactForm.ids[ fault[ "terminal" ] ]
+        sites.append((compactForm.ids[ fault[ "wire" ] ], terminal, compact.VALUE_CODES[ fault[ "value" ] ]))
+
+    results = []
+    for line in lines:
+        goodValues = compactForm.simulate(line)
+        output = compactForm.outputString(goodValues)
+
+        faultyOutputs = []
+        for wire, terminal, value in sites:
+            faultyOutputs.append(compactForm.simulateFault(goodValues, wire, terminal, value))
+        results.append((output, faultyOutputs))
+
+    return results
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# STREAMING INPUT AND OUTPUT
+# The input file is read as a stream of blocks, so only one block of vectors is ever held in memory however big the file
+# is, and the output, faulty output and display files are written through an OutputBuffer, which gathers the many small
+# writes of each vector and hands them to the file in a few big ones.
+
+# Bytes gathered by an OutputBuffer before they are written to the file
+OUTPUT_BUFFER = 1 << 20
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads the (already open) input file, or anything else that gives lines, in blocks of up to blockSize
+# vectors. Empty lines and comments are skipped, and every vector gets the inputCheck result (0, -1 or -2).
+# Yields (raw lines, lines without spaces, checks) for each block
+def vectorBlocks(circuit, inputFile, blockSize):
+    rawLines = []
+    for rawLine in inputFile:
+        # Do nothing else if empty lines or comments, same as scalar_run
+        if (rawLine == "\n"):
+            continue
+        if (rawLine[0] == "#"):
+            continue
+
+        rawLines.append(rawLine.replace("\n", ""))
+        if len(rawLines) < blockSize:
+            continue
+        lines = [rawLine.replace(" ", "") for rawLine in rawLines]
+        yield rawLines, lines, [inputCheck(circuit, line) for line in lines]
+        rawLines = []
+
+    if len(rawLines) > 0:
+        lines = [rawLine.replace(" ", "") for rawLine in rawLines]
+        yield rawLines, lines, [inputCheck(circuit, line) for line in lines]
+
+
+class OutputBuffer(object):
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Wraps an open file, keeping what is written to it in a list until there is OUTPUT_BUFFER worth of it
+    def __init__(self, outFile):
+        self.outFile = outFile
+        self.pieces = []
+        self.size = 0
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Same as the write of a file
+    def write(self, text):
+        self.pieces.append(text)
+        self.size += len(text)
+        if self.size >= OUTPUT_BUFFER:
+            self.flush()
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Writes everything gathered so far to the file in one go
+    def flush(self):
+        if len(self.pieces) > 0:
+            self.outFile.write("".join(self.pieces))
+            self.pieces = []
+            self.size = 0
+
+    # ---------------------------------------------------------------------------------------------------------------- #
+    # FUNCTION: Writes what is left and closes the file
+    def close(self):
+        self.flush()
+        self.outFile.close()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# PATTERN GENERATORS
+# Built-in sources of input vectors, used instead of an input file. They give the same kind of lines as reading an input
+# file (right-most bit for the first input), one at a time, so they stream straight into the engines and stop being
+# asked for more as soon as the coverage target or the saturation window stops the run.
+
+# The sources that can be picked with -p/--patterns
+PATTERN_SOURCES = ["exhaustive", "random", "weighted", "lfsr"]
+
+# Number of vectors the random, weighted and lfsr sources give when no count is asked for
+DEFAULT_PATTERN_COUNT = 10000
+
+# Widest circuit the exhaustive source enumerates without being given a count (2^24 vectors)
+EXHAUSTIVE_WIDTH = 24
+
+# Feedback taps of a maximal-length LFSR of each length (every nonzero state comes up once per 2^n - 1 clocks)
+LFSR_TAPS = {2: (2, 1), 3: (3, 2), 4: (4, 3), 5: (5, 3), 6: (6, 5), 7: (7, 6), 8: (8, 6, 5, 4), 9: (9, 5), 10: (10, 7),
+             11: (11, 9), 12: (12, 11, 10, 4), 13: (13, 12, 11, 8), 14: (14, 13, 12, 2), 15: (15, 14),
+             16: (16, 15, 13, 4), 17: (17, 14), 18: (18, 11), 19: (19, 18, 17, 14), 20: (20, 17), 21: (21, 19),
+             22: (22, 21), 23: (23, 18), 24: (24, 23, 22, 17), 25: (25, 22), 26: (26, 6, 2, 1), 27: (27, 5, 2, 1),
+             28: (28, 25), 29: (29, 27), 30: (30, 6, 4, 1), 31: (31, 28), 32: (32, 22, 2, 1)}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Every combination of the inputs, counting up from all 0's (or only the first count of them)
+def exhaustivePatterns(width, count):
+    for k in range(count):
+        yield format(k, "0" + str(width) + "b") + "\n"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: count pseudo-random vectors, every input equally likely to be 0 or 1. The same seed gives the same vectors
+def randomPatterns(width, count, seed):
+    rng = random.Random(seed)
+    for k in range(count):
+        yield format(rng.getrandbits(width), "0" + str(width) + "b") + "\n"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: count pseudo-random vectors where input i is 1 with probability weights[i]
+def weightedPatterns(width, count, seed, weights):
+    rng = random.Random(seed)
+    for k in range(count):
+        line = ""
+        for i in range(width):
+            if rng.random() < weights[i]:
+                line = "1" + line
+            else:
+                line = "0" + line
+        yield line + "\n"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: count vectors from a maximal-length LFSR, the usual built-in self-test pattern generator. Up to 32 inputs,
+# every vector is the next state of an LFSR as long as the circuit is wide; otherwise a 32-bit LFSR is shifted once per
+# input, like filling a scan chain. The seed picks the starting state (never all 0's, which the LFSR can't leave)
+def lfsrPatterns(width, count, seed):
+    length = min(max(width, 2), 32)
+    full = (1 << length) - 1
+    taps = 0
+    for tap in LFSR_TAPS[length]:
+        taps |= 1 << (tap - 1)
+    state = seed % full
+    if state == 0:
+        state = 1
+
+    for k in range(count):
+        if width == length:
+            yield format(state, "0" + str(width) + "b") + "\n"
+            state = ((state << 1) | (bin(state & taps).count("1") & 1)) & full
+            continue
+        line = ""
+        for i in range(width):
+            line = str(state >> (length - 1)) + line
+            state = ((state << 1) | (bin(state & taps).count("1") & 1)) & full
+        yield line + "\n"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Picks the pattern source named in options["patterns"], sized to the circuit inputs.
+# Returns the generator of input lines, or the error message if the options don't fit the circuit
+def patternSource(circuit, options):
+    width = circuit["INPUT_WIDTH"][1]
+    source = options["patterns"]
+    count = options["count"]
+    if width == 0:
+        return "PATTERN ERROR: THE CIRCUIT HAS NO INPUTS"
+
+    if source == "exhaustive":
+        if count == None:
+            if width > EXHAUSTIVE_WIDTH:
+                return "PATTERN ERROR: " + str(width) + " INPUTS ARE TOO MANY FOR EXHAUSTIVE PATTERNS WITHOUT A COUNT"
+            count = 1 << width
+        return exhaustivePatterns(width, min(count, 1 << width))
+
+    if count == None:
+        count = DEFAULT_PATTERN_COUNT
+    if source == "random":
+        return randomPatterns(width, count, options["seed"])
+    if source == "lfsr":
+        return lfsrPatterns(width, count, options["seed"])
+
+    # One weight for every input, or a single weight for all of them
+    weights = options["weights"]
+    if weights == None:
+        weights = [0.5]
+    if len(weights) == 1:
+        weights = weights * width
+    if len(weights) != width:
+        return "PATTERN ERROR: " + str(len(weights)) + " WEIGHTS GIVEN FOR " + str(width) + " INPUTS"
+    return weightedPatterns(width, count, options["seed"], weights)
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# PODEM TEST GENERATION
+# Finds an input vector for a fault that the input vectors missed. Only the primary inputs are ever assigned, one at a
+# time, and after each assignment the good and faulty circuits are simulated with the same 0/1/U values as everywhere
+# else (event_good_sim and event_fault_sim), with every unassigned input left at U. Each step then either:
+#   - finds the fault effect (good and faulty values both known and different) at an output: the vector is a test
+#   - finds the fault can't be activated or propagated any more whatever the U inputs become: undo the last decision
+#   - picks an objective (activate the fault, or get it through a gate of the D-frontier) and backtraces it to a U input
+# A fault whose every decision has been undone is proven redundant. One that needs more than the backtrack limit of
+# undone decisions is aborted.
+
+# Number of times the decisions for one fault may be undone before it is aborted
+BACKTRACK_LIMIT = 100
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Turns the input assignment (input line -> '0', '1' or 'U') into an input line, first input on the right
+def podemLine(circuit, assignment):
+    line = ""
+    for x in circuit["INPUTS"][1]:
+        line = assignment[x] + line
+    return line
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Looks at the good values and the faulty changes for the current assignment.
+# Returns ("detected", None), ("conflict", None) or ("objective", (line, value))
+def podemStatus(circuit, fault, good, changed):
+    faultWire = fault[ "wire" ]
+    faultTerminal = fault[ "terminal" ]
+
+    for y in circuit["OUTPUTS"][1]:
+        if y in changed and changed[y] != "U" and good[y] != "U":
+            return "detected", None
+
+    # Activation: the good value where the fault sits has to be the opposite of the stuck-at value. Until it is, the
+    # fault site itself still needs a way out to an output
+    site = faultWire
+    if ( faultTerminal != None ):
+        site = faultTerminal
+    if good[site] == fault[ "value" ]:
+        return "conflict", None
+    if good[site] == "U":
+        if faultTerminal != None and good[faultWire] != "U" and changed.get(faultWire, good[faultWire]) != "U":
+            return "conflict", None
+        if not podemXPath(circuit, good, changed, [faultWire]):
+            return "conflict", None
+        return "objective", (site, '1' if fault[ "value" ] == '0' else '0')
+
+    # D-frontier: gates with an output not known yet in both circuits, and the fault effect on one of their terminals
+    # (for a stuck-at terminal, its own gate counts, since the effect sits right on that terminal)
+    frontier = []
+    for gate in circuit["ORDER"][1]:
+        if good[gate] != "U" and changed.get(gate, good[gate]) != "U":
+            continue
+        if gate == faultWire and faultTerminal != None:
+            frontier.append(gate)
+            continue
+        for term in circuit[gate][1]:
+            if term in changed and changed[term] != "U" and good[term] != "U":
+                frontier.append(gate)
+                break
+    if len(frontier) == 0:
+        return "conflict", None
+    if not podemXPath(circuit, good, changed, frontier):
+        return "conflict", None
+
+    # Get the effect through the frontier gate closest to the fault: its other terminals go to the non-controlling value
+    gate = frontier[0]
+    terms = circuit[gate][1]
+    for term in terms:
+        if good[term] == "U" or changed.get(term, good[term]) == "U":
+            goodValues = [good[t] for t in terms]
+            faultyValues = [changed.get(t, good[t]) for t in terms]
+            if gate == faultWire and faultTerminal != None:
+                faultyValues = [fault[ "value" ] if terms[k] == faultTerminal else faultyValues[k] for k in range(len(terms))]
+            return "objective", (term, podemSideValue(circuit[gate][0], terms, goodValues, faultyValues, term))
+    return "conflict", None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The value to give the U terminal term of a D-frontier gate so the fault effect can still get through it.
+# That's the non-controlling value, except for a cell, where it's the first value that doesn't make the good and the
+# faulty output the same known value
+def podemSideValue(logic, terms, goodValues, faultyValues, term):
+    gate = gates.GATE_TYPES[logic]
+    if gate.kind != gates.TABLE:
+        return gate.nonControlling()
+    for value in "01":
+        goodOut = gate.table["".join([value if terms[k] == term else goodValues[k] for k in range(len(terms))])]
+        faultyOut = gate.table["".join([value if terms[k] == term else faultyValues[k] for k in range(len(terms))])]
+        if goodOut == "U" or faultyOut == "U" or goodOut != faultyOut:
+            return value
+    return "0"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: X-path check: is there a path from one of the starts to an output through lines still U in either circuit?
+# A line already known in both circuits stays that way whatever the U inputs become, so without such a path the fault
+# effect can never get out
+def podemXPath(circuit, good, changed, starts):
+    outputs = {}
+    for y in circuit["OUTPUTS"][1]:
+        outputs[y] = True
+    seen = {}
+    stack = list(starts)
+    while len(stack) > 0:
+        curr = stack.pop()
+        if curr in outputs:
+            return True
+        for nextGate in circuit["FANOUT"][1][curr]:
+            if nextGate not in seen and (good[nextGate] == "U" or changed.get(nextGate, good[nextGate]) == "U"):
+                seen[nextGate] = True
+                stack.append(nextGate)
+    return False
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Follows an objective (line, value) back to an input that is still U, through lines still U in either circuit.
+# When one terminal is enough to set the gate output, the easiest (lowest level) terminal is taken, and when all of them
+# are needed the hardest one is, so a bad choice shows up early. Through a cell, the easiest terminal and value that
+# set its output (or at least leave it U) are taken. Returns the input and the value to give it
+def podemBacktrace(circuit, good, changed, line, value):
+    levels = circuit["LEVELS"][1]
+    while circuit[line][0] != "INPUT":
+        gate = gates.GATE_TYPES[circuit[line][0]]
+        candidates = [term for term in circuit[line][1] if good[term] == "U" or changed.get(term, good[term]) == "U"]
+        if gate.kind == gates.TABLE:
+            line, value = podemCellChoice(gate, circuit[line][1], good, candidates, value, levels)
+            continue
+        if gate.invert:
+            value = '1' if value == '0' else '0'
+        if gate.kind == gates.CONTROL and value == gate.control:
+            line = min(candidates, key=lambda term: levels[term])
+        else:
+            line = max(candidates, key=lambda term: levels[term])
+    return line, value
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The terminal of a cell to backtrace through, and the value it needs, for the cell output to get value.
+# The candidates are tried from the easiest one up: the first (terminal, value) that sets the output is taken, else
+# the first one that leaves it U
+def podemCellChoice(gate, terms, good, candidates, value, levels):
+    values = [good[term] for term in terms]
+    fallback = None
+    for term in sorted(candidates, key=lambda term: levels[term]):
+        for termValue in "01":
+            out = gate.table["".join([termValue if terms[k] == term else values[k] for k in range(len(terms))])]
+            if out == value:
+                return term, termValue
+            if out == "U" and fallback == None:
+                fallback = (term, termValue)
+    if fallback != None:
+        return fallback
+    return max(candidates, key=lambda term: levels[term]), value
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: PODEM for one fault. Returns ("detected", input line with U for the inputs that don't matter),
+# ("redundant", None) or ("aborted", None)
+def podem(circuit, fault, backtrackLimit):
+    assignment = {}
+    for x in circuit["INPUTS"][1]:
+        assignment[x] = "U"
+    decisions = []  # [input, value, both values tried]
+    backtracks = 0
+
+    while True:
+        line = podemLine(circuit, assignment)
+        good = event_good_sim(circuit, line)
+        if isinstance(good, str):
+            return good, None
+        changed = event_fault_sim(circuit, good, fault)
+        status, objective = podemStatus(circuit, fault, good, changed)
+
+        if status == "detected":
+            return "detected", line
+        if status == "objective":
+            x, value = podemBacktrace(circuit, good, changed, objective[0], objective[1])
+            assignment[x] = value
+            decisions.append([x, value, False])
+            continue
+
+        # Conflict: undo the decisions that already had both values tried, then try the other value of the last one
+        while len(decisions) > 0 and decisions[-1][2]:
+            assignment[decisions.pop()[0]] = "U"
+        if len(decisions) == 0:
+            return "redundant", None
+        backtracks += 1
+        if backtracks > backtrackLimit:
+            return "aborted", None
+        decision = decisions[-1]
+        decision[1] = '1' if decision[1] == '0' else '0'
+        decision[2] = True
+        assignment[decision[0]] = decision[1]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: True if the two output strings have a 0 against a 1 somewhere
+def knownDifference(output, faultyOutput):
+    for k in range(len(output)):
+        if output[k] != faultyOutput[k] and output[k] != "U" and faultyOutput[k] != "U":
+            return True
+    return False
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs PODEM on every fault not in detectedFaults. Every new test is fault simulated right away against the
+# faults still left, so a fault some earlier test happens to detect never goes through PODEM.
+# The tests are written to vectorsFile, one per line like an input file, and every fault that was left gets written to
+# displayFile with what happened to it. Returns a dictionary of fault name -> "detected", "redundant" or "aborted",
+# or the error message if a gate logic does not exist
+def atpg_run(circuit, faults, detectedFaults, backtrackLimit, vectorsFile, displayFile):
+    remaining = [fault for fault in faults if getFaultName( fault ) not in detectedFaults]
+    results = {}
+
+    while len(remaining) > 0:
+        fault = remaining[0]
+        faultName = getFaultName( fault )
+        status, line = podem(circuit, fault, backtrackLimit)
+        if status != "detected" and status != "redundant" and status != "aborted":
+            return status
+
+        if status != "detected":
+            results[ faultName ] = status
+            if verbosity >= NORMAL:
+                displayFile.write( "ATPG: " + faultName + " " + status + "\n" )
+            remaining = remaining[1:]
+            continue
+
+        vectorsFile.write( line + "\n" )
+        graded = event_grade(circuit, [line], remaining)
+        if isinstance(graded, str):
+            return graded
+        output, faultyOutputs = graded[0]
+        stillRemaining = []
+        for i in range(len(remaining)):
+            # Only a known good value against the opposite known faulty value counts: with U inputs in the test, a
+            # U against a 0 or 1 would depend on what those inputs end up being
+            if (faultyOutputs[i] != output and knownDifference(output, faultyOutputs[i])) or remaining[i] is fault:
+                results[ getFaultName( remaining[i] ) ] = "detected"
+                if verbosity >= NORMAL:
+                    displayFile.write( "ATPG: " + getFaultName( remaining[i] ) + " detected by " + line + "\n" )
+            else:
+                stillRemaining.append(remaining[i])
+        remaining = stillRemaining
+
+    return results
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# TEST-SET COMPACTION
+# Makes a smaller input file that detects the same faults. Every input vector is graded against every fault once, and
+# what it detects is kept as a bitset (bit i for fault i). Then, using only those bitsets:
+#   1. reverse order: going from the last vector to the first, a vector is only kept if it detects something the later
+#      ones didn't (the later vectors of a file are usually the ones made for the hard faults)
+#   2. set cover: out of those, the vector detecting the most faults not covered yet is taken, until all are covered
+# and last, vectors with U's are merged when they never have a 0 against a 1, if the merged vector still detects every
+# fault no other vector detects (checked by grading it again). The result is graded once more to make sure nothing was
+# lost; if something was, that is a bug, and nothing is written.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Merges two vectors of the same width if every bit is the same or a U in one of them.
+# Returns the merged vector, or None if they have a 0 against a 1
+def mergeVectors(first, second):
+    merged = ""
+    for k in range(len(first)):
+        if first[k] == second[k] or second[k] == "U":
+            merged += first[k]
+        elif first[k] == "U":
+            merged += second[k]
+        else:
+            return None
+    return merged
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grades vectors against faults with a grade function, blockSize vectors at a time.
+# Returns one bitset of detected faults per vector (bit i for faults[i]), or the error message
+def detectionSets(circuit, vectors, faults, grade, blockSize):
+    sets = []
+    for start in range(0, len(vectors), blockSize):
+        results = grade(circuit, vectors[start:start + blockSize], faults)
+        if isinstance(results, str):
+            return results
+        for output, faultyOutputs in results:
+            detected = 0
+            for i in range(len(faults)):
+                if faultyOutputs[i] != output:
+                    detected |= 1 << i
+            sets.append(detected)
+    return sets
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Compacts the vectors of inputFile for the faults, writing the result to compactFile.
+# The engine's grade function is used (event for basic/levelized). Lines with input errors are left out.
+# Returns a dictionary of counts (original, reverse, cover, merged vectors, and detected faults before and after),
+# or the error message
+def compaction_run(circuit, faults, engine, inputFile, compactFile):
+    grade, blockSize = GRADERS.get(engine, GRADERS["event"])
+    width = circuit["INPUT_WIDTH"][1]
+
+    vectors = []
+    for rawLines, lines, checks in vectorBlocks(circuit, inputFile, blockSize):
+        for line, check in zip(lines, checks):
+            if check == 0:
+                vectors.append(line[(len(line) - width):(len(line))].upper())
+
+    sets = detectionSets(circuit, vectors, faults, grade, blockSize)
+    if isinstance(sets, str):
+        return sets
+    allDetected = 0
+    for detected in sets:
+        allDetected |= detected
+
+    # 1. Reverse order fault simulation (with fault dropping)
+    covered = 0
+    kept = []
+    for v in range(len(vectors) - 1, -1, -1):
+        if sets[v] & ~covered:
+            kept.append(v)
+            covered |= sets[v]
+    reverseCount = len(kept)
+
+    # 2. Greedy set cover, ties going to the vector that comes first in the file
+    uncovered = allDetected
+    chosen = []
+    kept.sort()
+    while uncovered:
+        best = max(kept, key=lambda v: (bin(sets[v] & uncovered).count("1"), -v))
+        chosen.append(best)
+        uncovered &= ~sets[best]
+    chosen.sort()
+    coverCount = len(chosen)
+
+    # 3. Merge vectors with U's that fit together, as long as the merged vector still detects every fault that only
+    # those two detected (giving a U a value can lose a U against 0/1 difference, so it is graded again)
+    compacted = [vectors[v] for v in chosen]
+    current = [sets[v] for v in chosen]
+    i = 0
+    while i < len(compacted):
+        j = i + 1
+        while j < len(compacted):
+            merged = None
+            if "U" in compacted[i] or "U" in compacted[j]:
+                merged = mergeVectors(compacted[i], compacted[j])
+            if merged != None:
+                others = 0
+                for k in range(len(compacted)):
+                    if k != i and k != j:
+                        others |= current[k]
+                required = (current[i] | current[j]) & ~others
+                mergedSets = detectionSets(circuit, [merged], faults, grade, 1)
+                if isinstance(mergedSets, str):
+                    return mergedSets
+                if required & ~mergedSets[0] == 0:
+                    compacted[i] = merged
+                    current[i] = mergedSets[0]
+                    del compacted[j]
+                    del current[j]
+                    continue
+            j += 1
+        i += 1
+
+    # Check the compacted vectors still detect every fault the original ones did
+    finalSets = detectionSets(circuit, compacted, faults, grade, blockSize)
+    if isinstance(finalSets, str):
+        return finalSets
+    finalDetected = 0
+    for detected in finalSets:
+        finalDetected |= detected
+    lost = bin(allDetected & ~finalDetected).count("1")
+    if lost > 0:
+        msg = "COMPACTION ERROR: " + str(lost) + " OF THE " + str(bin(allDetected).count("1")) + " FAULTS DETECTED BEFORE ARE NOT DETECTED BY THE COMPACTED VECTORS"
+        print(msg)
+        return msg
+
+    for vector in compacted:
+        compactFile.write(vector + "\n")
+
+    return {"original": len(vectors), "reverse": reverseCount, "cover": coverCount, "merged": len(compacted),
+            "detected": bin(allDetected).count("1"), "compactedDetected": bin(finalDetected).count("1")}
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FAULT DICTIONARY
+# For diagnosis: given the responses a failing circuit actually gave to the input vectors, which faults explain them?
+# The dictionary is built once by grading every vector against every fault. Each response bit (vector k, output
+# character j) has position k * (number of outputs) + j, and every fault gets a signature: a bitset (a Python integer)
+# of the positions where its response differs from the good one. Faults with the same signature can't be told apart by
+# these vectors, so the index groups them: signature -> list of faults.
+# A lookup turns the observed responses into a signature the same way, and ranks the groups of faults by how many
+# response bits they get wrong (an exact match gets none wrong), only looking at the bits that were observed.
+# The dictionary is stored as JSON, with the bitsets written as hex strings (JSON keys have to be strings anyway), e.g.
+#   {"format": "fault dictionary 1", "netlist": "c17.bench", "netHash": "3f7a...", "width": 2, "vectors": ["00101", ...],
+#    "goodOnes": "1d", "goodZeros": "22", "faults": ["wire_1-SA-0", ...], "index": {"4": [0, 5], ...}}
+# so a dictionary file from somewhere else can only ever give wrong candidates, never run code the way pickle could.
+# netHash is the plain SHA-1 of the netlist file (netcache.contentHash), so it stays the same across cache versions.
+
+# Number of groups of faults a lookup lists by default
+LOOKUP_TOP = 10
+
+# First item of a dictionary file, so anything else is turned down before it is used
+DICTIONARY_FORMAT = "fault dictionary 1"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Bitset of the characters of a response that are equal to value (bit j for character j)
+def responseBits(response, value):
+    bits = 0
+    for j in range(len(response)):
+        if response[j] == value:
+            bits |= 1 << j
+    return bits
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grades every vector of inputFile against every fault (with the selected engine, or event for
+# basic/levelized) and builds the dictionary. Lines with input errors are left out.
+# Returns the dictionary, or the error message if a gate logic does not exist
+def dictionary_build(circuit, faults, engine, inputFile, netlist):
+    grade, blockSize = GRADERS.get(engine, GRADERS["event"])
+    width = len(circuit["OUTPUTS"][1])
+    inputWidth = circuit["INPUT_WIDTH"][1]
+
+    vectors = []
+    goodOnes = 0
+    goodZeros = 0
+    signatures = [0] * len(faults)
+    for rawLines, lines, checks in vectorBlocks(circuit, inputFile, blockSize):
+        validLines = [line for line, check in zip(lines, checks) if check == 0]
+        if len(validLines) == 0:
+            continue
+        results = grade(circuit, validLines, faults)
+        if isinstance(results, str):
+            return results
+
+        for line, result in zip(validLines, results):
+            output, faultyOutputs = result
+            position = len(vectors) * width
+            vectors.append(line[(len(line) - inputWidth):(len(line))].upper())
+            goodOnes |= responseBits(output, '1') << position
+            goodZeros |= responseBits(output, '0') << position
+            for i in range(len(faults)):
+                if faultyOutputs[i] != output:
+                    difference = 0
+                    for j in range(width):
+                        if faultyOutputs[i][j] != output[j]:
+                            difference |= 1 << j
+                    signatures[i] |= difference << position
+
+    index = {}
+    for i in range(len(faults)):
+        if signatures[i] not in index:
+            index[signatures[i]] = []
+        index[signatures[i]].append(i)
+
+    return {"netlist": netlist, "netHash": netcache.contentHash(netlist), "width": width, "vectors": vectors,
+            "goodOnes": goodOnes, "goodZeros": goodZeros, "faults": [getFaultName( fault ) for fault in faults],
+            "index": index}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads observed responses in the same format as the output file ("vector -> response" per line) and turns
+# them into a signature against the dictionary, the same way faulty responses are compared to the good ones.
+# Lines with input errors are skipped, and the responses may stop before the last vector of the dictionary.
+# Returns the signature and the bitset of the observed positions, or the error message
+def observedSignature(dictionary, observedFile):
+    width = dictionary["width"]
+    vectors = dictionary["vectors"]
+    signature = 0
+    observed = 0
+    k = 0
+    for line in observedFile:
+        line = line.replace("\n", "").replace(" ", "")
+        if line == "" or line[0] == "#" or "->" not in line:
+            continue
+        vector, response = line.split("->", 1)
+        response = response.upper()
+        if "ERROR" in response:
+            continue
+
+        if k >= len(vectors) or vector[(len(vector) - len(vectors[k])):(len(vector))].upper() != vectors[k] or len(response) != width:
+            msg = "LOOKUP ERROR: OBSERVED RESPONSE \"" + line + "\" DOES NOT MATCH VECTOR " + str(k + 1) + " OF THE DICTIONARY"
+            print(msg)
+            return msg
+
+        position = k * width
+        mask = (1 << width) - 1
+        goodOnes = (dictionary["goodOnes"] >> position) & mask
+        goodZeros = (dictionary["goodZeros"] >> position) & mask
+        goodUnknowns = mask & ~(goodOnes | goodZeros)
+        same = (responseBits(response, '1') & goodOnes) | (responseBits(response, '0') & goodZeros) | (responseBits(response, 'U') & goodUnknowns)
+        signature |= (mask & ~same) << position
+        observed |= mask << position
+        k += 1
+
+    if k == 0:
+        msg = "LOOKUP ERROR: NO OBSERVED RESPONSES (\"vector -> response\" LINES) FOUND"
+        print(msg)
+        return msg
+    return signature, observed
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Ranks the groups of faults of the dictionary against an observed signature, only counting the observed bits.
+# Returns a list of (number of bits wrong, list of fault names) for the best top groups, best first
+def dictionary_lookup(dictionary, signature, observed, top):
+    ranked = []
+    for faultSignature in dictionary["index"]:
+        wrong = bin((faultSignature ^ signature) & observed).count("1")
+        ranked.append((wrong, faultSignature))
+    ranked.sort(key=lambda pair: (pair[0], min(dictionary["index"][pair[1]])))
+
+    faultNames = dictionary["faults"]
+    return [(wrong, [faultNames[i] for i in dictionary["index"][faultSignature]]) for wrong, faultSignature in ranked[:top]]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes the dictionary from dictionary_build to a JSON file, the bitsets as hex strings
+def writeDictionary(dictionary, fileName):
+    stored = {"format": DICTIONARY_FORMAT}
+    for key in ["netlist", "netHash", "width", "vectors", "faults"]:
+        stored[key] = dictionary[key]
+    stored["goodOnes"] = "%x" % dictionary["goodOnes"]
+    stored["goodZeros"] = "%x" % dictionary["goodZeros"]
+    stored["index"] = dict([("%x" % signature, dictionary["index"][signature]) for signature in dictionary["index"]])
+
+    dictionaryFile = open( fileName, "w" )
+    json.dump( stored, dictionaryFile )
+    dictionaryFile.close()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads a dictionary written by writeDictionary back into the form dictionary_build returns.
+# Returns the dictionary, or the error message if the file is not a fault dictionary
+def readDictionary(fileName):
+    msg = "LOOKUP ERROR: \"" + fileName + "\" IS NOT A FAULT DICTIONARY FILE"
+    dictionaryFile = open( fileName, "rb" )
+    try:
+        stored = json.loads( dictionaryFile.read().decode("utf-8") )
+    except ValueError:
+        stored = None
+    dictionaryFile.close()
+    if not isinstance(stored, dict) or stored.get("format") != DICTIONARY_FORMAT:
+        print(msg)
+        return msg
+
+    try:
+        dictionary = {"netlist": str(stored["netlist"]), "netHash": str(stored["netHash"]), "width": int(stored["width"]),
+                      "vectors": [str(vector) for vector in stored["vectors"]],
+                      "faults": [str(faultName) for faultName in stored["faults"]],
+                      "goodOnes": int(stored["goodOnes"], 16), "goodZeros": int(stored["goodZeros"], 16), "index": {}}
+        for signature in stored["index"]:
+            faultIndexes = [int(i) for i in stored["index"][signature]]
+            for i in faultIndexes:
+                if i < 0 or i >= len(dictionary["faults"]):
+                    raise ValueError(i)
+            dictionary["index"][int(signature, 16)] = faultIndexes
+    except (KeyError, TypeError, ValueError):
+        print(msg)
+        return msg
+    return dictionary
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The lookup command: loads the dictionary named in options, reads the observed responses and prints the
+# best groups of candidate faults. Returns the list from dictionary_lookup, or the error message
+def lookupFiles(options):
+    global verbosity
+    verbosity = options["verbosity"]
+
+    for name in [options["lookup"], options["observed"]]:
+        if not os.path.isfile( name ):
+            msg = "LOOKUP ERROR: FILE " + name + " DOES NOT EXIST"
+            print( msg )
+            return msg
+
+    dictionary = readDictionary( options["lookup"] )
+    if isinstance(dictionary, str):
+        return dictionary
+
+    observedFile = open( options["observed"], "r" )
+    observed = observedSignature( dictionary, observedFile )
+    observedFile.close()
+    if isinstance(observed, str):
+        return observed
+
+    start = time.time()
+    candidates = dictionary_lookup( dictionary, observed[0], observed[1], options["top"] )
+    elapsed = time.time() - start
+
+    # With every response observed, the exact match is a single hash lookup
+    allFull = observed[1] == (1 << (len(dictionary["vectors"]) * dictionary["width"])) - 1
+    exact = observed[0] in dictionary["index"] and allFull
+    if verbosity >= NORMAL:
+        print( "Fault dictionary of " + dictionary["netlist"] + ": " + str( len( dictionary["faults"] ) ) + " faults in "
+               + str( len( dictionary["index"] ) ) + " groups, " + str( len( dictionary["vectors"] ) ) + " vectors" )
+        print( "Lookup took %.3f ms" % ( elapsed * 1000 ) )
+    if not allFull and verbosity >= NORMAL:
+        print( "Only part of the responses were observed, so there is no exact match, only the best ones" )
+    if exact:
+        print( "Exact match: " + ", ".join( [dictionary["faults"][i] for i in dictionary["index"][observed[0]]] ) )
+    elif allFull:
+        print( "No exact match" )
+    for wrong, faultNames in candidates:
+        print( str( wrong ) + " response bits wrong (" + str( len( faultNames ) ) + " faults): " + ", ".join( faultNames ) )
+    return candidates
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# GRADING DRIVER
+# Every engine other than basic/levelized is a grade function: it takes the circuit, a block of (already checked)
+# input lines and the faults still being graded, and gives back (good output, list of faulty outputs) for each line.
+# graded_run does everything else: reading the input file, the input error checks, writing the files, fault dropping
+# and stopping early.
+
+# engine name -> (grade function, number of input lines handed to it at once)
+GRADERS = {
+    "parallel": (parallel_pattern_grade, PATTERN_BLOCK),
+    "pfault": (parallel_fault_grade, 1),
+    "deductive": (deductive_grade, 1),
+    "event": (event_grade, 1),
+    "numpy": (numpy_grade, NUMPY_BLOCK),
+    "compiled": (compiled_grade, PATTERN_BLOCK),
+    "compact": (compact_grade, PATTERN_BLOCK),
+}
+
+# Every engine that can be picked: the two that use scalar_run, then the grade functions
+ENGINES = ["levelized", "basic"] + list(GRADERS)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs every line of the input file through a grade function and writes the output, faulty output and display
+# files the same way scalar_run does. Returns the dictionary of detected faults.
+# If dropFaults is True, a fault is no longer simulated (or written to the faulty output file) once it's detected.
+# The run stops early once the fault coverage reaches coverageTarget (None to always run every line), or once
+# saturationWindow input lines in a row did not detect any new fault (None to never stop for that).
+# runStats gets the number of input lines simulated, faulty circuit simulations avoided, and whether it stopped early
+# (and if so, "saturated" says whether it was because of saturationWindow)
+# If runStats holds a detmatrix.MatrixWriter under "matrix", every graded input line is added to it with the faults
+# it detected
+# With jobs above 1, the faults are shared out between that many worker processes (see shardedGrade)
+def graded_run( circuit, faults, engine, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats, jobs=1 ):
+    grade, blockSize = GRADERS[engine]
+    if jobs > 1:
+        pool = multiprocessing.Pool(jobs, poolInit, (circuit, faults, engine, verbosity, gates.GATE_TYPES))
+        try:
+            # Bigger blocks so each trip to the workers is worth it
+            return graded_run_lines( circuit, faults, shardedGrade(pool, jobs, faults), max(blockSize, POOL_BLOCK), inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats )
+        finally:
+            pool.close()
+            pool.join()
+    return graded_run_lines( circuit, faults, grade, blockSize, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats )
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The reading loop of graded_run, with the grade function and block size already picked
+def graded_run_lines( circuit, faults, grade, blockSize, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats ):
+    detectedFaults = {}
+    faultNames = [getFaultName( fault ) for fault in faults]
+    active = list(range(len(faults)))   # indices of the faults still being graded
+    runStats["vectors"] = 0
+    runStats["skipped"] = 0
+    runStats["stoppedEarly"] = False
+    runStats["saturated"] = False
+    runStats["lastDetection"] = 0   # the input line that last detected a new fault
+
+    for rawLines, lines, checks in vectorBlocks(circuit, inputFile, blockSize):
+        msg = graded_block( circuit, faults, faultNames, active, grade, rawLines, lines, checks, outputFile, faultyOutputFile, displayFile, detectedFaults, dropFaults, coverageTarget, saturationWindow, runStats )
+        if msg != None:
+            return msg
+        if runStats["stoppedEarly"]:
+            break
+
+    return detectedFaults
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grades and writes one block of input lines for graded_run. active is updated in place when dropping faults.
+# Returns the error message if a gate logic does not exist
+def graded_block( circuit, faults, faultNames, active, grade, rawLines, lines, checks, outputFile, faultyOutputFile, displayFile, detectedFaults, dropFaults, coverageTarget, saturationWindow, runStats ):
+    validLines = [line for line, check in zip(lines, checks) if check == 0]
+
+    # Everything dropped before this block is skipped for every line in it. The grade function has already simulated
+    # the whole block by the time a fault is detected, so a fault detected inside the block is only left out of the
+    # files, not counted as skipped
+    blockActive = list(active)
+    results = []
+    if len(validLines) > 0:
+        results = grade(circuit, validLines, [faults[i] for i in blockActive])
+        if isinstance(results, str):
+            return results
+        runStats["skipped"] += (len(faults) - len(blockActive)) * len(validLines)
+
+    k = 0
+    for rawLine, line, check in zip(rawLines, lines, checks):
+        if check != 0:
+            writeVectorResult( rawLine, line, check, None, None, [], outputFile, faultyOutputFile, displayFile, detectedFaults )
+            continue
+
+        output, faultyOutputs = results[k]
+        k += 1
+        runStats["vectors"] += 1
+
+        # A block grader already worked out the whole block, but faults detected earlier in the block aren't written.
+        # Same rule as scalar_run, fault by fault: a name that shows up twice in the fault list (a gate using the same
+        # line twice) is dropped once its first copy is detected, even on the same input line
+        if dropFaults:
+            keep = []
+            detectedNow = {}
+            for j in range(len(blockActive)):
+                faultName = faultNames[blockActive[j]]
+                if faultName in detectedFaults or faultName in detectedNow:
+                    continue
+                keep.append(j)
+                if faultyOutputs[j] != output:
+                    detectedNow[faultName] = True
+        else:
+            keep = range(len(blockActive))
+        detectedBefore = len(detectedFaults)
+        writeVectorResult( rawLine, line, check, output, [faultyOutputs[j] for j in keep], [faultNames[blockActive[j]] for j in keep], outputFile, faultyOutputFile, displayFile, detectedFaults )
+        if len(detectedFaults) > detectedBefore:
+            runStats["lastDetection"] = runStats["vectors"]
+        if "matrix" in runStats:
+            runStats["matrix"].addVector( line, [blockActive[j] for j in keep if faultyOutputs[j] != output] )
+
+        if dropFaults:
+            active[:] = [i for i in active if faultNames[i] not in detectedFaults]
+        if stopReached(detectedFaults, faults, coverageTarget, saturationWindow, runStats):
+            return None
+
+    return None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# MULTI-CORE FAULT GRADING
+# The faults are independent of each other, so the list from read_faults is cut into one contiguous shard per worker
+# process. Every worker gets its own copy of the circuit and fault list once, when the pool starts, and after that only
+# the input lines and the indices of its shard are sent over. The results are put back together in shard order, so the
+# files come out exactly the same as with a single process.
+
+# Number of input lines sent to the workers at once
+POOL_BLOCK = 256
+
+# What each worker process holds, set up by poolInit
+poolCircuit = None
+poolFaults = None
+poolGrade = None
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs once in every worker process when the pool starts. gateTypes brings the cells read with --cells along,
+# for workers that start from scratch instead of being forked
+def poolInit(circuit, faults, engine, level, gateTypes):
+    global poolCircuit, poolFaults, poolGrade, verbosity
+    gates.GATE_TYPES.update(gateTypes)
+    poolCircuit = circuit
+    poolFaults = faults
+    poolGrade = GRADERS[engine][0]
+    verbosity = level
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs in a worker process: grades a block of input lines against one shard of the fault list
+def poolGradeShard(work):
+    lines, shard = work
+    return poolGrade(poolCircuit, lines, [poolFaults[i] for i in shard])
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Gives back a grade function that does the same thing as the engine's own, using the worker pool.
+# Faults are matched back to their index in the full list, so only indices have to be sent to the workers
+def shardedGrade(pool, jobs, allFaults):
+    index = {}
+    for i in range(len(allFaults)):
+        index[id(allFaults[i])] = i
+
+    def grade(circuit, lines, faults):
+        indices = [index[id(fault)] for fault in faults]
+        count = max(1, min(jobs, len(indices)))
+        size = max(1, (len(indices) + count - 1) // count)
+        shards = [indices[start:start + size] for start in range(0, len(indices), size)]
+        if len(shards) == 0:
+            shards = [[]]
+
+        shardResults = pool.map(poolGradeShard, [(lines, shard) for shard in shards])
+        for shardResult in shardResults:
+            if isinstance(shardResult, str):
+                return shardResult
+
+        results = []
+        for k in range(len(lines)):
+            faultyOutputs = []
+            for shardResult in shardResults:
+                faultyOutputs.extend(shardResult[k][1])
+            results.append((shardResults[0][k][0], faultyOutputs))
+        return results
+
+    return grade
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Checks if the fault coverage has reached the target (a fraction between 0 and 1, or None for no target)
+def coverageReached(detectedFaults, faults, coverageTarget):
+    if coverageTarget == None or len(faults) == 0:
+        return False
+    return float(len(detectedFaults)) / len(faults) >= coverageTarget
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Checked after every input line: has the coverage target been reached, or have the last saturationWindow
+# lines not detected anything new? Sets runStats["stoppedEarly"] (and runStats["saturated"]) if the run should stop
+def stopReached(detectedFaults, faults, coverageTarget, saturationWindow, runStats):
+    if coverageReached(detectedFaults, faults, coverageTarget):
+        runStats["stoppedEarly"] = True
+        return True
+    if saturationWindow != None and runStats["vectors"] - runStats["lastDetection"] >= saturationWindow:
+        runStats["stoppedEarly"] = True
+        runStats["saturated"] = True
+        return True
+    return False
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# PROFILING
+# Turned on with --profile FILE. profileStart swaps the functions worth watching (netRead, levelize, inputRead, the
+# simulate functions, the gate calculations and the grade functions) for wrappers that count and time them, and the
+# report is written as JSON at the end of the run. The functions are only swapped the first time, and the wrappers
+# call straight through while profile is None, which simulateFiles sets it back to when the run is over. Until a run
+# is profiled nothing is swapped, so the only cost left is the requeue counter in basic_sim and a few phase timers.
+# The report holds:
+#   phases: wall time of parse, faults, simulation, compaction, dictionary, atpg and the whole run (total)
+#   functions: calls and time of each watched function
+#   gateEvals: gate evaluations per gate type (gateCalc for levelized/basic, gateCalcValues for event)
+#   requeues: gates basic_sim put back in its queue because a terminal wasn't ready
+#   faults: time, simulations and gate evaluations of every fault (levelized, basic and event, the engines that
+#           simulate one fault at a time), slowest first
+#   peakMemoryKB: peak resident memory of the process (not available on Windows)
+# With -j above 1 the grading happens in worker processes, which are not profiled.
+profile = None
+
+# True once profileStart has swapped the functions for their wrappers
+profileWrapped = False
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Wraps func so every call is counted and timed under name
+def profiledFunction(name, func):
+    def wrapper(*args):
+        if profile is None:
+            return func(*args)
+        stats = profile["functions"].setdefault(name, {"calls": 0, "seconds": 0.0})
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            stats["calls"] += 1
+            stats["seconds"] += time.time() - start
+    return wrapper
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Wraps a gate calculation so every call is counted by gate type. logicOf gets the gate type from the args
+def profiledGate(func, logicOf):
+    def wrapper(*args):
+        if profile is None:
+            return func(*args)
+        gateEvals = profile["gateEvals"]
+        logic = logicOf(args)
+        gateEvals[logic] = gateEvals.get(logic, 0) + 1
+        profile["gateEvalTotal"] += 1
+        return func(*args)
+    return wrapper
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Wraps a simulate function so the time and gate evaluations of every call with a fault go to that fault.
+# faultArg is the position of the fault in the args (None there means the good circuit)
+def profiledFaults(func, faultArg):
+    def wrapper(*args):
+        fault = args[faultArg]
+        if profile is None or fault == None:
+            return func(*args)
+        faultStats = profile["faults"]
+        events = profile["gateEvalTotal"]
+        start = time.time()
+        try:
+            return func(*args)
+        finally:
+            faultName = getFaultName( fault )
+            if faultName not in faultStats:
+                faultStats[faultName] = [0.0, 0, 0]
+            faultStats[faultName][0] += time.time() - start
+            faultStats[faultName][1] += 1
+            faultStats[faultName][2] += profile["gateEvalTotal"] - events
+    return wrapper
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Turns profiling on with an empty profile, swapping in the wrappers if no earlier run did
+def profileStart():
+    global profile, profileWrapped, netRead, levelize, inputRead, basic_sim, levelized_sim, gateCalc, gateCalcValues, event_fault_sim
+    profile = {"phases": {}, "functions": {}, "gateEvals": {}, "gateEvalTotal": 0, "requeues": 0, "faults": {}}
+    if profileWrapped:
+        return
+    profileWrapped = True
+
+    netRead = profiledFunction("netRead", netRead)
+    levelize = profiledFunction("levelize", levelize)
+    inputRead = profiledFunction("inputRead", inputRead)
+    basic_sim = profiledFaults(profiledFunction("basic_sim", basic_sim), 1)
+    levelized_sim = profiledFaults(profiledFunction("levelized_sim", levelized_sim), 1)
+    event_fault_sim = profiledFaults(profiledFunction("event_fault_sim", event_fault_sim), 2)
+    gateCalc = profiledGate(gateCalc, lambda args: args[0][args[1]][0])
+    gateCalcValues = profiledGate(gateCalcValues, lambda args: args[0])
+    for engine in GRADERS:
+        GRADERS[engine] = (profiledFunction(GRADERS[engine][0].__name__, GRADERS[engine][0]), GRADERS[engine][1])
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Adds the time since start to a phase of the profile (does nothing when profiling is off)
+def profilePhase(name, start):
+    if profile != None:
+        profile["phases"][name] = profile["phases"].get(name, 0.0) + time.time() - start
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes the profile as JSON to reportName
+def profileReport(reportName):
+    faults = [{"fault": faultName, "seconds": stats[0], "simulations": stats[1], "gateEvals": stats[2]}
+              for faultName, stats in profile["faults"].items()]
+    faults.sort(key=lambda stats: -stats["seconds"])
+    functions = dict([(name, stats) for name, stats in profile["functions"].items() if stats["calls"] > 0])
+    report = {"phases": profile["phases"], "functions": functions, "gateEvals": profile["gateEvals"],
+              "gateEvalTotal": profile["gateEvalTotal"], "requeues": profile["requeues"], "faults": faults,
+              "peakMemoryKB": None}
+    if resource != None:
+        # ru_maxrss is in kilobytes on Linux, but bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peakMemoryKB"] = peak // 1024 if sys.platform == "darwin" else peak
+
+    reportFile = open(reportName, "w")
+    json.dump(report, reportFile, indent=2)
+    reportFile.close()
+
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The interactive way of picking the files and options, used when sim.py is run without any arguments.
+# Returns the same options dictionary main builds from the command line
+def promptOptions():
+    # **************************************************************************************************************** #
+    # NOTE: UI code; Does not contain anything about the actual simulation
+
+    # Used for file access
+    script_dir = os.path.dirname(__file__)  # <-- absolute dir the script is in
+
+    print("Circuit Simulator:")
+
+    # Select circuit benchmark file, default is circuit.bench
+    while True:
+        cktFile = "circuit.bench"   
+        print("\n Read circuit benchmark file: use " + cktFile + "?" + " Enter to accept or type filename: ")
+        userInput = input()
+        if userInput == "":
+            break
+        else:
+            cktFile = os.path.join(script_dir, userInput)
+            if not os.path.isfile(cktFile):
+                print("File does not exist. \n")
+            else:
+                break
+
+    # Select input file, default is input.txt
+    while True:
+        inputName = "input.txt"
+        print("\n Read input vector file: use " + inputName + "?" + " Enter to accept or type filename: ")
+        userInput = input()
+        if userInput == "":
+
+            break
+        else:
+            inputName = os.path.join(script_dir, userInput)
+            if not os.path.isfile(inputName):
+                print("File does not exist. \n")
+            else:
+                break
+
+    # Select the faults file
+    while True:
+        faultsName = "faults.txt"
+        print("\n Read fault file: use " + faultsName + "?" + " Enter to accept or type filename: ")
+        userInput = input()
+        if userInput == "":
+
+            break
+        else:
+            faultsName = os.path.join(script_dir, userInput)
+            if not os.path.isfile( faultsName ):
+                print("File does not exist. \n")
+            else:
+                break
+    
+    # Select the simulation engine, default is levelized
+    while True:
+        engine = "levelized"
+        print("\n Simulation engine: use " + engine + "?" + " Enter to accept or type one of " + ", ".join(ENGINES) + ": ")
+        userInput = input()
+        if userInput == "":
+            break
+        elif userInput in ENGINES:
+            engine = userInput
+            break
+        else:
+            print("Unknown engine. \n")
+
+    # Fault dropping, default is off
+    dropFaults = False
+    print("\n Drop faults once they are detected? Enter for no or type y: ")
+    userInput = input()
+    if userInput in ["y", "Y", "yes"]:
+        dropFaults = True
+
+    # Fault coverage to stop at, default is 100% when dropping faults and none otherwise
+    while True:
+        if dropFaults:
+            coverageTarget = 1.0
+        else:
+            coverageTarget = None
+        print("\n Stop once fault coverage reaches: use " + str(coverageTarget) + "?" + " Enter to accept or type a number between 0 and 1: ")
+        userInput = input()
+        if userInput == "":
+            break
+        try:
+            coverageTarget = float(userInput)
+        except ValueError:
+            print("Not a number. \n")
+            continue
+        if coverageTarget < 0 or coverageTarget > 1:
+            print("Not between 0 and 1. \n")
+        else:
+            break
+
+    # Select the mapping file of a collapsed fault list, default is none
+    while True:
+        mapName = None
+        print("\n Read fault map file for a collapsed fault list? Enter to skip or type filename: ")
+        userInput = input()
+        if userInput == "":
+            break
+        else:
+            mapName = os.path.join(script_dir, userInput)
+            if not os.path.isfile( mapName ):
+                print("File does not exist. \n")
+            else:
+                break
+
+    # Select output file, default is output.txt
+    while True:
+        outputName = "output.txt"
+        print("\n Write output file: use " + outputName + "?" + " Enter to accept or type filename: ")
+        userInput = input()
+        if userInput == "":
+            break
+        else:
+            outputName = os.path.join(script_dir, userInput)
+            break
+
+    # Note: UI code;
+    # **************************************************************************************************************** #
+
+    # The interactive mode has always shown everything
+    return {"netlist": cktFile, "inputs": inputName, "faults": faultsName, "output": outputName, "engine": engine,
+            "drop": dropFaults, "target": coverageTarget, "faultMap": mapName, "verbosity": TRACE, "jobs": 1,
+            "cache": True, "cacheDir": None, "patterns": None, "count": None, "seed": 1, "weights": None, "window": None,
+            "atpg": None, "backtracks": BACKTRACK_LIMIT, "compact": None, "dictionary": None, "profile": None,
+            "matrix": None, "compress": False, "matrixOnly": False, "cells": None}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: netRead followed by levelize, which is what gets stored in the compiled-netlist cache
+def readLevelized(netName):
+    return levelize(netRead(netName))
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads the netlist, vectors and faults named in options, runs the selected engine and writes the output,
+# faulty output and display files, and the --profile report of the run. Returns the dictionary of detected faults, or
+# an error message
+def simulateFiles(options):
+    global verbosity, profile
+    verbosity = options["verbosity"]
+    if options["profile"] == None:
+        return simulateRun(options)
+
+    profileStart()
+    runStart = time.time()
+    try:
+        detectedFaults = simulateRun(options)
+        if not isinstance(detectedFaults, str):
+            profilePhase("total", runStart)
+            profileReport(options["profile"])
+            if verbosity >= NORMAL:
+                print("Profile written to " + options["profile"])
+    finally:
+        # Later runs in the same process are not profiled unless they ask for it again
+        profile = None
+    return detectedFaults
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The part of simulateFiles that reads the files and runs the engine.
+# Returns the dictionary of detected faults, or an error message
+def simulateRun(options):
+    # The cells of a cell library have to be known before the netlist using them is levelized
+    if options["cells"] != None:
+        cells = gates.readCells(options["cells"])
+        if isinstance(cells, str):
+            print(cells)
+            return cells
+        if verbosity >= NORMAL:
+            print("\n Cells read from " + options["cells"] + ": " + ", ".join(cells) + "\n")
+
+    if verbosity >= NORMAL:
+        print("\n Reading " + options["netlist"] + " ... \n")
+    start = time.time()
+    if options["cache"]:
+        circuit, fromCache = netcache.cachedRead(options["netlist"], readLevelized, "levelized", options["cacheDir"])
+        if fromCache and verbosity >= NORMAL:
+            print(" Compiled netlist loaded from the cache \n")
+    else:
+        circuit = readLevelized(options["netlist"])
+    profilePhase("parse", start)
+    if isinstance(circuit, str):
+        return circuit
+    if verbosity >= TRACE:
+        print("\n Finished processing benchmark file and built netlist dictionary: \n")
+        # Uncomment the following line, for the neater display of the function and then comment out print(circuit)
+        # printCkt(circuit)
+        print(circuit)
+
+    if options["engine"] == "numpy" and numpy == None:
+        msg = "ENGINE ERROR: THE numpy ENGINE NEEDS NUMPY TO BE INSTALLED"
+        print(msg)
+        return msg
+
+    if verbosity >= NORMAL:
+        print( "\nReading the faults file..." )
+    start = time.time()
+    faultsFile = open( options["faults"], "r" )
+    faults = read_faults( faultsFile )
+    faultsFile.close()
+    # Every engine assumes the faults are on lines of the circuit, so a bad one is caught here instead of each engine
+    # failing (or skipping it) in its own way
+    msg = checkFaults( circuit, faults )
+    if msg != None:
+        print(msg)
+        return msg
+    faultMap = None
+    if options["faultMap"] != None:
+        faultMap = read_fault_map( open( options["faultMap"], "r" ) )
+    profilePhase("faults", start)
+
+    # The faulty output and display files go next to the output file, with faulty_ and display_ prepended to the name
+    inputName = options["inputs"]
+    outputName = options["output"]
+    outputDir, outputBase = os.path.split(outputName)
+    if verbosity >= NORMAL and options["patterns"] != None:
+        print("\n *** Simulating " + options["patterns"] + " patterns and will output in" + outputName + "*** \n")
+    elif verbosity >= NORMAL:
+        print("\n *** Simulating the" + inputName + " file and will output in" + outputName + "*** \n")
+        print( "The faulty output will be put into the a file with the same name as the output file with faulty_ prepended to it." )
+        print( "Information regarding the circuit simulation will be put into a file with the same name as the output file with display_ prepended to it."  )
+    if options["patterns"] != None:
+        inputFile = patternSource(circuit, options)
+        if isinstance(inputFile, str):
+            print(inputFile)
+            return inputFile
+    else:
+        inputFile = open(inputName, "r", OUTPUT_BUFFER)
+    outputFile = OutputBuffer( open(outputName, "w") )
+    # With --matrix-only the detections only go into the detection matrix, and no faulty_ file is written
+    if options["matrixOnly"]:
+        faultyOutputFile = OutputBuffer( open( os.devnull, "w" ) )
+    else:
+        faultyOutputFile = OutputBuffer( open( os.path.join(outputDir, "faulty_" + outputBase), "w" ) )
+    displayFile = OutputBuffer( open( os.path.join(outputDir, "display_" + outputBase), "w" ) )
+    try:
+        detectedFaults = runEngine( circuit, faults, faultMap, options, inputFile, outputFile, faultyOutputFile, displayFile )
+    finally:
+        inputFile.close()
+        outputFile.close()
+        faultyOutputFile.close()
+        displayFile.close()
+    return detectedFaults
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The part of simulateFiles that runs once every file is open: the selected engine, then the summary
+def runEngine( circuit, faults, faultMap, options, inputFile, outputFile, faultyOutputFile, displayFile ):
+    engine = options["engine"]
+    dropFaults = options["drop"]
+    coverageTarget = options["target"]
+    saturationWindow = options["window"]
+    runStats = {}
+    # The binary detection matrix is filled in by the run itself, one row per graded input line
+    if options["matrix"] != None:
+        header = {"netlist": options["netlist"], "netHash": netcache.contentHash(options["netlist"]), "engine": engine, "dropFaults": dropFaults}
+        runStats["matrix"] = detmatrix.MatrixWriter( options["matrix"], [getFaultName( fault ) for fault in faults], header, options["compress"] )
+    start = time.time()
+    try:
+        if engine in GRADERS:
+            detectedFaults = graded_run( circuit, faults, engine, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats, options["jobs"] )
+        elif engine == "basic":
+            # basic_sim requeues gates that aren't ready, levelized_sim walks the order from levelize once
+            detectedFaults = scalar_run( circuit, faults, basic_sim, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats )
+        else:
+            detectedFaults = scalar_run( circuit, faults, levelized_sim, inputFile, outputFile, faultyOutputFile, displayFile, dropFaults, coverageTarget, saturationWindow, runStats )
+    finally:
+        if "matrix" in runStats:
+            runStats["matrix"].close()
+    profilePhase("simulation", start)
+    if isinstance(detectedFaults, str):
+        return detectedFaults
+    if "matrix" in runStats:
+        summary = ( "Detection matrix: " + str( runStats["vectors"] ) + " input vectors x " + str( len( faults ) ) + " faults written to " + options["matrix"] )
+        print( summary )
+        displayFile.write( summary + "\n" )
+
+    if dropFaults:
+        print( "Fault dropping: " + str( runStats["skipped"] ) + " faulty circuit simulations avoided" )
+        displayFile.write( "Fault dropping: " + str( runStats["skipped"] ) + " faulty circuit simulations avoided\n" )
+    if runStats["saturated"]:
+        print( "Stopped early after " + str( runStats["vectors"] ) + " input vectors: no new faults detected in the last " + str( saturationWindow ) )
+        displayFile.write( "Stopped early after " + str( runStats["vectors"] ) + " input vectors: no new faults detected in the last " + str( saturationWindow ) + "\n" )
+    elif runStats["stoppedEarly"]:
+        print( "Stopped early after " + str( runStats["vectors"] ) + " input vectors: fault coverage target reached" )
+        displayFile.write( "Stopped early after " + str( runStats["vectors"] ) + " input vectors: fault coverage target reached\n" )
+
+    print( "Number of detected faults: " + str( len( detectedFaults ) ) )
+    print( "Number of faults in the fault list file: " + str( len( faults ) ) )
+    displayFile.write( "Number of detected faults: " + str( len( detectedFaults ) ) )
+    displayFile.write( "Number of faults in the fault list file: " + str( len( faults ) ) )
+    # An empty fault list has no coverage to speak of
+    if len( faults ) > 0:
+        faultCoverage = len( detectedFaults) / len( faults )
+        print( "Fault coverage: %.2f" % faultCoverage ) 
+        displayFile.write( "Fault coverage: %.2f" % faultCoverage ) 
+
+    # Coverage of the full fault list: a collapsed fault being detected means everything it stands for is detected
+    if faultMap != None:
+        fullTotal = 0
+        fullDetected = 0
+        for faultName in faultMap:
+            fullTotal += faultMap[ faultName ]
+            if faultName in detectedFaults:
+                fullDetected += faultMap[ faultName ]
+        print( "Number of detected faults in the full fault list: " + str( fullDetected ) + " of " + str( fullTotal ) )
+        displayFile.write( "Number of detected faults in the full fault list: " + str( fullDetected ) + " of " + str( fullTotal ) )
+        if fullTotal > 0:
+            fullCoverage = float( fullDetected ) / fullTotal
+            print( "Fault coverage of the full fault list: %.2f" % fullCoverage )
+            displayFile.write( "Fault coverage of the full fault list: %.2f" % fullCoverage )
+
+    # A smaller input file with the same fault coverage, read from the start of the input file again
+    if options["compact"] != None:
+        inputFile.seek(0)
+        start = time.time()
+        compactFile = open( options["compact"], "w" )
+        counts = compaction_run( circuit, faults, engine, inputFile, compactFile )
+        compactFile.close()
+        profilePhase("compaction", start)
+        if isinstance(counts, str):
+            # Nothing was written, so no empty file is left behind either
+            os.remove( options["compact"] )
+            return counts
+        summary = ( "Compaction: " + str( counts["original"] ) + " input vectors -> " + str( counts["reverse"] ) + " after reverse order fault simulation -> "
+                    + str( counts["cover"] ) + " after set cover -> " + str( counts["merged"] ) + " after merging; written to " + options["compact"] )
+        check = "Compaction check: the compacted vectors detect " + str( counts["compactedDetected"] ) + " faults, none of the " + str( counts["detected"] ) + " detected before were lost"
+        print( summary )
+        print( check )
+        displayFile.write( summary + "\n" )
+        displayFile.write( check + "\n" )
+
+    # Fault dictionary for diagnosis, graded from the start of the input file again
+    if options["dictionary"] != None:
+        inputFile.seek(0)
+        start = time.time()
+        dictionary = dictionary_build( circuit, faults, engine, inputFile, options["netlist"] )
+        profilePhase("dictionary", start)
+        if isinstance(dictionary, str):
+            return dictionary
+        writeDictionary( dictionary, options["dictionary"] )
+        summary = ( "Fault dictionary: " + str( len( faults ) ) + " faults in " + str( len( dictionary["index"] ) ) + " groups with different responses, over "
+                    + str( len( dictionary["vectors"] ) ) + " vectors; written to " + options["dictionary"] )
+        print( summary )
+        displayFile.write( summary + "\n" )
+
+    # Test generation for whatever the vectors missed
+    if options["atpg"] != None:
+        start = time.time()
+        vectorsFile = open( options["atpg"], "w" )
+        atpgResults = atpg_run( circuit, faults, detectedFaults, options["backtracks"], vectorsFile, displayFile )
+        vectorsFile.close()
+        profilePhase("atpg", start)
+        if isinstance(atpgResults, str):
+            return atpgResults
+        counts = {"detected": 0, "redundant": 0, "aborted": 0}
+        for faultName in atpgResults:
+            counts[ atpgResults[ faultName ] ] += 1
+        print( "ATPG: " + str( counts["detected"] ) + " more faults detected, " + str( counts["redundant"] ) + " redundant, " + str( counts["aborted"] ) + " aborted; tests written to " + options["atpg"] )
+        displayFile.write( "ATPG: " + str( counts["detected"] ) + " more faults detected, " + str( counts["redundant"] ) + " redundant, " + str( counts["aborted"] ) + " aborted; tests written to " + options["atpg"] + "\n" )
+        if len( faults ) > 0:
+            atpgCoverage = float( len( detectedFaults ) + counts["detected"] ) / len( faults )
+            print( "Fault coverage with the ATPG tests: %.2f" % atpgCoverage )
+            displayFile.write( "Fault coverage with the ATPG tests: %.2f" % atpgCoverage )
+    return detectedFaults
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Main Function
+# With no arguments, asks for everything interactively like it always has. Otherwise runs in batch mode, e.g.
+#   python sim.py circuit.bench -i input.txt -f faults.txt -o output.txt -e deductive --drop -v 0
+def main():
+    parser = argparse.ArgumentParser(description="Circuit simulator and stuck-at fault grader. "
+                                                 "Run without arguments to be asked for everything interactively.")
+    parser.add_argument("netlist", nargs="?", help="circuit benchmark file")
+    parser.add_argument("-i", "--inputs", default="input.txt", help="input vector file (default: input.txt)")
+    parser.add_argument("-f", "--faults", default="faults.txt", help="fault list file (default: faults.txt)")
+    parser.add_argument("-o", "--output", default="output.txt",
+                        help="output file, faulty_ and display_ files go next to it (default: output.txt)")
+    parser.add_argument("-e", "--engine", default="levelized", choices=ENGINES, help="simulation engine (default: levelized)")
+    parser.add_argument("--drop", action="store_true",
+                        help="stop simulating faults once they are detected (parallel, compiled and compact grade "
+                             + str(PATTERN_BLOCK) + " vectors at a time and numpy " + str(NUMPY_BLOCK)
+                             + ", so they only drop faults between blocks; with -j blocks are at least " + str(POOL_BLOCK) + ")")
+    parser.add_argument("--target", type=float, default=None,
+                        help="stop once the fault coverage reaches this fraction (default: 1.0 with --drop, otherwise none)")
+    parser.add_argument("-p", "--patterns", default=None, choices=PATTERN_SOURCES,
+                        help="generate the input vectors instead of reading the input file")
+    parser.add_argument("--count", type=int, default=None,
+                        help="number of generated vectors (default: every combination for exhaustive, otherwise " + str(DEFAULT_PATTERN_COUNT) + ")")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random, weighted and lfsr patterns (default: 1)")
+    parser.add_argument("--weights", default=None,
+                        help="probability of a 1 for the weighted patterns, one for all inputs or comma separated per input (default: 0.5)")
+    parser.add_argument("--window", type=int, default=None,
+                        help="stop once this many input vectors in a row detect no new fault")
+    parser.add_argument("--profile", default=None,
+                        help="write a JSON report of where the run spent its time (phases, gate evaluations, faults) to this file")
+    parser.add_argument("--dictionary", default=None,
+                        help="write a fault dictionary of the input file vectors to this file, for --lookup")
+    parser.add_argument("--matrix", default=None,
+                        help="write which faults each input vector detected to this binary file, read with detmatrix.py")
+    parser.add_argument("--compress", action="store_true", help="zlib-compress the --matrix file")
+    parser.add_argument("--matrix-only", dest="matrixOnly", action="store_true",
+                        help="with --matrix, don't write the faulty_ file")
+    parser.add_argument("--lookup", default=None,
+                        help="instead of simulating, look up the faults that explain --observed in this fault dictionary")
+    parser.add_argument("--observed", default="output.txt",
+                        help="observed responses for --lookup, in the output file format (default: output.txt)")
+    parser.add_argument("--top", type=int, default=LOOKUP_TOP,
+                        help="number of groups of candidate faults --lookup lists (default: " + str(LOOKUP_TOP) + ")")
+    parser.add_argument("--compact", default=None,
+                        help="write a compacted input file with the same fault coverage to this file")
+    parser.add_argument("--atpg", default=None,
+                        help="generate tests (PODEM) for the faults the vectors missed, and write them to this file")
+    parser.add_argument("--backtracks", type=int, default=BACKTRACK_LIMIT,
+                        help="backtrack limit per fault before ATPG gives up on it (default: " + str(BACKTRACK_LIMIT) + ")")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="worker processes to share the faults between, not for basic/levelized (default: 1)")
+    parser.add_argument("--fault-map", dest="faultMap", default=None,
+                        help="mapping file from First_part.py, to report coverage of the full fault list")
+    parser.add_argument("--cells", default=None,
+                        help="cell library file of extra gate types, one NAME(a, b, ...) = expression per line")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="always parse the netlist instead of using the compiled-netlist cache")
+    parser.add_argument("--cache-dir", dest="cacheDir", default=None,
+                        help="where to keep the compiled-netlist cache (default: " + netcache.CACHE_DIR + " next to the netlist)")
+    parser.add_argument("-v", "--verbosity", type=int, default=NORMAL, choices=[QUIET, NORMAL, TRACE],
+                        help="0: only the summary, 1: one line per input vector (default), "
+                             "2: also every gate and the circuit dictionary")
+    args = parser.parse_args()
+
+    # Diagnosis only needs the dictionary and the observed responses
+    if args.lookup != None:
+        if isinstance(lookupFiles(vars(args)), str):
+            sys.exit(1)
+        return
+
+    if args.netlist == None:
+        options = promptOptions()
+    else:
+        options = vars(args)
+        if options["target"] == None and options["drop"]:
+            options["target"] = 1.0
+        if options["target"] != None and (options["target"] < 0 or options["target"] > 1):
+            parser.error("--target has to be between 0 and 1")
+        if options["count"] != None and options["count"] < 1:
+            parser.error("--count has to be at least 1")
+        if options["window"] != None and options["window"] < 1:
+            parser.error("--window has to be at least 1")
+        if options["weights"] != None:
+            try:
+                options["weights"] = [float(weight) for weight in options["weights"].split(",")]
+            except ValueError:
+                parser.error("--weights has to be numbers between 0 and 1, separated by commas")
+            for weight in options["weights"]:
+                if weight < 0 or weight > 1:
+                    parser.error("--weights has to be numbers between 0 and 1, separated by commas")
+        if options["compact"] != None and options["patterns"] != None:
+            parser.error("--compact needs an input file, not -p/--patterns")
+        if options["dictionary"] != None and options["patterns"] != None:
+            parser.error("--dictionary needs an input file, not -p/--patterns")
+        if options["matrix"] == None and (options["compress"] or options["matrixOnly"]):
+            parser.error("--compress and --matrix-only need --matrix")
+        if options["cells"] != None and not os.path.isfile(options["cells"]):
+            parser.error("--cells file " + options["cells"] + " does not exist")
+        if options["jobs"] < 1:
+            parser.error("--jobs has to be at least 1")
+        if options["jobs"] > 1 and options["engine"] not in GRADERS:
+            parser.error("--jobs only works with the " + ", ".join(GRADERS) + " engines")
+
+    result = simulateFiles(options)
+    if isinstance(result, str):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from __future__ import print_function
+import os, sys, itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench, First_part
+
+# PODEM against exhaustive simulation on circuits small enough to try every input vector: a fault PODEM calls
+# detected has to be detected by the test it gives, and a fault it calls redundant must not be detected by any vector.
+# A fault only counts as detected by a known 0 against a known 1 on some output, the same check atpg_run does.
+
+# Backtrack limit high enough that PODEM never gives up on these circuits
+BACKTRACKS = 100000
+
+# Reconvergent fanout with a redundant fault: y = a + ab, so wire_t stuck-at 0 changes nothing
+REDUNDANT = """INPUT(a)
+INPUT(b)
+INPUT(c)
+OUTPUT(y)
+OUTPUT(z)
+t = AND(a, b)
+y = OR(a, t)
+u = XOR(b, c)
+z = MUX(u, a, c)
+"""
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The tiny circuits: the hand-written one above and a few random ones from bench.py.
+# Returns a list of netlist files
+def tinyCircuits(directory):
+    netName = os.path.join(str(directory), "redundant.bench")
+    netFile = open(netName, "w")
+    netFile.write(REDUNDANT)
+    netFile.close()
+    netNames = [netName]
+    for seed in [1, 2, 3]:
+        netName = os.path.join(str(directory), "tiny" + str(seed) + ".bench")
+        bench.generateCircuit(netName, os.path.join(str(directory), "tiny" + str(seed) + "_input.txt"),
+                              os.path.join(str(directory), "tiny" + str(seed) + "_faults.txt"), 12, 5, 4, 3,
+                              bench.parseMix(bench.DEFAULT_MIX + ",MUX=0.5,AOI21=0.5"), 0, seed)
+        netNames.append(netName)
+    return netNames
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs PODEM on every fault of every tiny circuit and checks it against all 2^n input vectors
+def test_podem_matches_exhaustive(tmp_path):
+    sim.verbosity = sim.QUIET
+    redundantCount = 0
+    for netName in tinyCircuits(tmp_path):
+        circuit = sim.levelize(sim.netRead(netName))
+        assert not isinstance(circuit, str), circuit
+        faults = sim.read_faults([fault + "\n" for fault in First_part.fullFaultList(circuit)])
+
+        vectors = ["".join(bits) for bits in itertools.product("01", repeat=circuit["INPUT_WIDTH"][1])]
+        graded = sim.event_grade(circuit, vectors, faults)
+        for i in range(len(faults)):
+            faultName = sim.getFaultName(faults[i])
+            detectable = False
+            for output, faultyOutputs in graded:
+                if sim.knownDifference(output, faultyOutputs[i]):
+                    detectable = True
+                    break
+
+            status, line = sim.podem(circuit, faults[i], BACKTRACKS)
+            assert status != "aborted", faultName
+            if status == "detected":
+                output, faultyOutputs = sim.event_grade(circuit, [line], [faults[i]])[0]
+                assert sim.knownDifference(output, faultyOutputs[0]), faultName + " not detected by " + line
+            else:
+                assert status == "redundant", status
+                assert not detectable, faultName + " is called redundant but some vector detects it"
+                redundantCount += 1
+
+    # The hand-written circuit has at least its one redundant fault
+    assert redundantCount > 0
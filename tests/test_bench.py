@@ -0,0 +1,25 @@
+from __future__ import print_function
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench
+
+# Benchmark suite: the random circuit has the size asked for, and timeEngine reports the same circuit and detections
+# whichever engine it times.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Times a few engines on one small random circuit and checks what they report against each other
+def test_time_engines(tmp_path):
+    sim.verbosity = sim.QUIET
+    base = os.path.join(str(tmp_path), "timed")
+    info = bench.generateCircuit(base + ".bench", base + "_input.txt", base + "_faults.txt", 50, 8, 5, 3,
+                                 bench.parseMix(bench.DEFAULT_MIX), 40, 1)
+    assert info["gates"] == 50 and info["depth"] == 5
+
+    results = [bench.timeEngine(base + ".bench", base + "_input.txt", base + "_faults.txt", engine, 1, 1)
+               for engine in ["levelized", "event", "parallel"]]
+    for result in results:
+        assert "error" not in result, result
+        assert result["gates"] == 50 and result["vectors"] == 40
+        assert result["detected"] == results[0]["detected"] and result["faults"] == results[0]["faults"]
+        assert result["gateEvalsPerSecond"] > 0 and result["faultVectorsPerSecond"] > 0
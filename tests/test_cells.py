@@ -0,0 +1,63 @@
+from __future__ import print_function
+import os, sys, io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, gates, netcache
+
+# Cells from a --cells library are only known while the library is loaded: a netlist using one has to give the same
+# NETLIST ERROR without the library whether or not an earlier run with the library left it in the cache.
+
+CELLS = "MYC(a, b, c) = (a & b) | ~c\n"
+
+NETLIST = """INPUT(a)
+INPUT(b)
+INPUT(c)
+OUTPUT(y)
+y = MYC(a, b, c)
+"""
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes the cell library and the netlist using it into directory. Returns (cells file, netlist file)
+def cellFiles(directory):
+    cellsName = os.path.join(str(directory), "cells.lib")
+    netName = os.path.join(str(directory), "cells.bench")
+    for name, text in [(cellsName, CELLS), (netName, NETLIST)]:
+        textFile = open(name, "w")
+        textFile.write(text)
+        textFile.close()
+    return cellsName, netName
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: A cached circuit using a cell that isn't loaded any more is parsed again, which reports the cell
+def test_cache_without_cells(tmp_path):
+    sim.verbosity = sim.QUIET
+    cellsName, netName = cellFiles(tmp_path)
+    cacheDir = os.path.join(str(tmp_path), "cache")
+    assert gates.readCells(cellsName) == ["MYC"]
+    try:
+        circuit, fromCache = netcache.cachedRead(netName, sim.readLevelized, "levelized", cacheDir)
+        assert not isinstance(circuit, str) and not fromCache
+        circuit, fromCache = netcache.cachedRead(netName, sim.readLevelized, "levelized", cacheDir)
+        assert not isinstance(circuit, str) and fromCache
+    finally:
+        del gates.GATE_TYPES["MYC"]
+
+    circuit, fromCache = netcache.cachedRead(netName, sim.readLevelized, "levelized", cacheDir)
+    assert circuit == "NETLIST ERROR: LOGIC \"MYC\" DOES NOT EXIST (GATE \"wire_y\")"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: scalar_run hands back the error of a gate type that doesn't exist instead of reading outputs from it
+def test_scalar_run_unknown_logic(tmp_path):
+    sim.verbosity = sim.QUIET
+    cellsName, netName = cellFiles(tmp_path)
+    gates.readCells(cellsName)
+    try:
+        circuit = sim.readLevelized(netName)
+    finally:
+        del gates.GATE_TYPES["MYC"]
+
+    faults = sim.read_faults(["y-SA-0\n"])
+    for simulate in [sim.levelized_sim, sim.basic_sim]:
+        result = sim.scalar_run(circuit, faults, simulate, io.StringIO("101\n"), io.StringIO(), io.StringIO(),
+                                io.StringIO(), False, None, None, {})
+        assert result == "MYC"
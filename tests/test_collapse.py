@@ -0,0 +1,80 @@
+from __future__ import print_function
+import os, sys, itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench, First_part
+
+# Fault collapsing: the classes of a hand-checked circuit, and on random circuits every class checked against
+# exhaustive simulation. An equivalent fault is detected by exactly the same vectors as the fault standing for its
+# class, and with dominance every vector detecting the fault that stands for a class also detects the rest of it.
+
+# AND feeding an OR, every line fanout-free
+SMALL = """INPUT(a)
+INPUT(b)
+INPUT(c)
+OUTPUT(y)
+n = AND(a, b)
+y = OR(n, c)
+"""
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes text as a netlist in directory and reads it. Returns the circuit
+def readText(directory, text):
+    netName = os.path.join(str(directory), "small.bench")
+    netFile = open(netName, "w")
+    netFile.write(text)
+    netFile.close()
+    return sim.netRead(netName)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The 18 faults of the small circuit collapse to 6 classes by equivalence and 4 with dominance as well
+def test_collapse_small(tmp_path):
+    sim.verbosity = sim.QUIET
+    circuit = readText(tmp_path, SMALL)
+    assert len(First_part.fullFaultList(circuit)) == 18
+
+    collapsed = First_part.collapseFaults(circuit, False)
+    assert [rep for rep, members in collapsed] == ["a-SA-0", "a-SA-1", "b-SA-1", "c-SA-0", "c-SA-1", "y-SA-0"]
+    assert sorted(dict(collapsed)["a-SA-0"]) == sorted(["a-SA-0", "b-SA-0", "n-SA-0", "n-IN-a-SA-0", "n-IN-b-SA-0",
+                                                        "y-IN-n-SA-0"])
+    assert sorted(dict(collapsed)["c-SA-1"]) == sorted(["c-SA-1", "n-SA-1", "y-SA-1", "y-IN-n-SA-1", "y-IN-c-SA-1"])
+
+    # AND: output SA-1 dominates input SA-1, OR: output SA-0 dominates input SA-0
+    collapsed = First_part.collapseFaults(circuit, True)
+    assert [rep for rep, members in collapsed] == ["a-SA-0", "a-SA-1", "b-SA-1", "c-SA-0"]
+    assert "y-SA-0" in dict(collapsed)["a-SA-0"]
+    assert "n-SA-1" in dict(collapsed)["a-SA-1"]
+    assert sum([len(members) for rep, members in collapsed]) == 18
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Every fault of the full list is in exactly one class, and each class holds up under every 0/1 vector
+def test_collapse_exhaustive(tmp_path):
+    sim.verbosity = sim.QUIET
+    for seed in [1, 2, 3]:
+        netName = os.path.join(str(tmp_path), "collapse" + str(seed) + ".bench")
+        bench.generateCircuit(netName, os.path.join(str(tmp_path), "collapse_input.txt"),
+                              os.path.join(str(tmp_path), "collapse_faults.txt"), 15, 5, 4, 3,
+                              bench.parseMix(bench.DEFAULT_MIX + ",MUX=0.5,AOI21=0.5"), 0, seed)
+        circuit = sim.levelize(sim.netRead(netName))
+        faultNames = sorted(set(First_part.fullFaultList(circuit)))
+        faults = sim.read_faults([faultName + "\n" for faultName in faultNames])
+        vectors = ["".join(bits) for bits in itertools.product("01", repeat=circuit["INPUT_WIDTH"][1])]
+
+        # Vectors detecting each fault
+        detectedBy = dict([(faultName, set()) for faultName in faultNames])
+        for k, result in enumerate(sim.event_grade(circuit, vectors, faults)):
+            output, faultyOutputs = result
+            for i in range(len(faults)):
+                if sim.knownDifference(output, faultyOutputs[i]):
+                    detectedBy[faultNames[i]].add(k)
+
+        for dominance in [False, True]:
+            collapsed = First_part.collapseFaults(circuit, dominance)
+            members = [fault for rep, faultList in collapsed for fault in faultList]
+            assert sorted(members) == faultNames
+            for rep, faultList in collapsed:
+                for fault in faultList:
+                    if dominance:
+                        assert detectedBy[rep] <= detectedBy[fault], rep + " / " + fault
+                    else:
+                        assert detectedBy[rep] == detectedBy[fault], rep + " / " + fault
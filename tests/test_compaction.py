@@ -0,0 +1,74 @@
+from __future__ import print_function
+import os, sys, io, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench
+
+# Static compaction: the compacted input file has to detect exactly the faults the original one did, with no more
+# vectors than it started with.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Grades the vectors with the event engine. Returns the detected fault names
+def detectedBy(circuit, faults, vectors):
+    detectedFaults = sim.graded_run(circuit, faults, "event", io.StringIO("".join([vector + "\n" for vector in vectors])),
+                                    io.StringIO(), io.StringIO(), io.StringIO(), False, None, None, {})
+    assert not isinstance(detectedFaults, str), detectedFaults
+    return sorted(detectedFaults)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Compacts random 0/1/U vectors of a random netlist with a few engines and checks the result
+def test_compaction_keeps_detected_faults(tmp_path):
+    sim.verbosity = sim.QUIET
+    netName = os.path.join(str(tmp_path), "compact.bench")
+    faultsName = os.path.join(str(tmp_path), "compact_faults.txt")
+    bench.generateCircuit(netName, os.path.join(str(tmp_path), "compact_input.txt"), faultsName, 30, 6, 5, 3,
+                          bench.parseMix(bench.DEFAULT_MIX), 0, 3)
+    circuit = sim.levelize(sim.netRead(netName))
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+
+    rng = random.Random(3)
+    vectors = ["".join([rng.choice("01UU") for i in range(6)]) for k in range(80)]
+    expected = detectedBy(circuit, faults, vectors)
+    assert len(expected) > 0
+
+    for engine in ["levelized", "parallel", "event", "compact"]:
+        compactFile = io.StringIO()
+        counts = sim.compaction_run(circuit, faults, engine, io.StringIO("".join([vector + "\n" for vector in vectors])), compactFile)
+        assert not isinstance(counts, str), counts
+        compacted = compactFile.getvalue().split()
+        assert counts["original"] == len(vectors)
+        assert counts["merged"] == len(compacted) <= counts["cover"] <= counts["reverse"] <= len(vectors)
+        assert counts["detected"] == counts["compactedDetected"] == len(expected)
+        assert detectedBy(circuit, faults, compacted) == expected
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: If the final check finds lost faults (a bug), nothing is written and the error comes back
+def test_compaction_lost_faults(tmp_path, monkeypatch):
+    sim.verbosity = sim.QUIET
+    netName = os.path.join(str(tmp_path), "lost.bench")
+    faultsName = os.path.join(str(tmp_path), "lost_faults.txt")
+    bench.generateCircuit(netName, os.path.join(str(tmp_path), "lost_input.txt"), faultsName, 20, 5, 4, 3,
+                          bench.parseMix(bench.DEFAULT_MIX), 0, 5)
+    circuit = sim.levelize(sim.netRead(netName))
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+
+    # Only the first grading (of the whole input file) is real, the final check detects nothing
+    detectionSets = sim.detectionSets
+    calls = []
+    def brokenSets(circuit, vectors, faults, grade, blockSize):
+        calls.append(len(vectors))
+        sets = detectionSets(circuit, vectors, faults, grade, blockSize)
+        if len(calls) == 1:
+            return sets
+        return [0] * len(sets)
+    monkeypatch.setattr(sim, "detectionSets", brokenSets)
+
+    compactFile = io.StringIO()
+    vectors = "".join([vector + "\n" for vector in ["01011", "11100", "00111", "10101"]])
+    msg = sim.compaction_run(circuit, faults, "parallel", io.StringIO(vectors), compactFile)
+    assert msg.startswith("COMPACTION ERROR: ")
+    assert compactFile.getvalue() == ""
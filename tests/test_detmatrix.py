@@ -0,0 +1,95 @@
+from __future__ import print_function
+import os, sys, io, random
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench, detmatrix
+
+# Detection matrix files: what MatrixWriter writes, readMatrix gives back bit for bit, compressed or not, and a run
+# with a matrix writer records exactly the faults the run detected.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Random rows written and read back, with the summaries checked against the rows themselves
+@pytest.mark.parametrize("compress", [False, True])
+def test_matrix_round_trip(tmp_path, compress):
+    rng = random.Random(9)
+    faultNames = ["f" + str(j) + "-SA-" + str(j % 2) for j in range(13)]
+    vectors = ["".join([rng.choice("01") for i in range(5)]) for k in range(30)]
+    rows = [sorted(rng.sample(range(13), rng.randint(0, 3))) for k in range(30)]
+
+    matrixName = os.path.join(str(tmp_path), "round.dmx")
+    matrix = detmatrix.MatrixWriter(matrixName, faultNames, {"netlist": "round.bench", "engine": "event"}, compress)
+    for vector, detected in zip(vectors, rows):
+        matrix.addVector(vector, detected)
+    matrix.close()
+
+    matrix = detmatrix.readMatrix(matrixName)
+    assert not isinstance(matrix, str), matrix
+    assert matrix["faults"] == faultNames and matrix["vectors"] == vectors
+    assert matrix["netlist"] == "round.bench" and matrix["engine"] == "event"
+    assert matrix["rowBytes"] == 2
+    for k in range(len(vectors)):
+        assert detmatrix.vectorRow(matrix, k) == sum([1 << j for j in rows[k]])
+    assert detmatrix.vectorCounts(matrix) == [len(detected) for detected in rows]
+
+    first = [None] * len(faultNames)
+    for k in range(len(rows) - 1, -1, -1):
+        for j in rows[k]:
+            first[j] = k
+    assert detmatrix.firstDetections(matrix) == first
+    assert detmatrix.detectedFaults(matrix) == sum([1 << j for j in range(len(faultNames)) if first[j] != None])
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: An empty matrix reads back, and files that aren't whole matrices give a MATRIX ERROR
+@pytest.mark.parametrize("compress", [False, True])
+def test_matrix_empty_and_broken(tmp_path, compress):
+    matrixName = os.path.join(str(tmp_path), "empty.dmx")
+    detmatrix.MatrixWriter(matrixName, ["a-SA-0"], {}, compress).close()
+    matrix = detmatrix.readMatrix(matrixName)
+    assert matrix["vectors"] == [] and detmatrix.detectedFaults(matrix) == 0
+
+    otherName = os.path.join(str(tmp_path), "other.txt")
+    otherFile = open(otherName, "w")
+    otherFile.write("0101 -> 11\n")
+    otherFile.close()
+    assert detmatrix.readMatrix(otherName) == "MATRIX ERROR: \"" + otherName + "\" IS NOT A DETECTION MATRIX FILE"
+
+    # A file that stops in the middle of the header, and one where the header lists a vector with no row
+    shortName = os.path.join(str(tmp_path), "short.dmx")
+    matrix = detmatrix.MatrixWriter(shortName, ["a-SA-0"], {}, compress)
+    matrix.addVector("01", [0])
+    matrix.vectors.append("10")
+    matrix.close()
+    assert detmatrix.readMatrix(shortName) == "MATRIX ERROR: \"" + shortName + "\" IS CUT SHORT"
+    shortFile = open(shortName, "r+b")
+    shortFile.truncate(os.path.getsize(shortName) - 5)
+    shortFile.close()
+    assert detmatrix.readMatrix(shortName) == "MATRIX ERROR: \"" + shortName + "\" IS CUT SHORT"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The matrix of a grading run holds the faults the run detected, one row per graded input vector
+@pytest.mark.parametrize("compress", [False, True])
+def test_matrix_of_a_run(tmp_path, compress):
+    sim.verbosity = sim.QUIET
+    netName = os.path.join(str(tmp_path), "matrix.bench")
+    faultsName = os.path.join(str(tmp_path), "matrix_faults.txt")
+    inputName = os.path.join(str(tmp_path), "matrix_input.txt")
+    bench.generateCircuit(netName, inputName, faultsName, 30, 6, 5, 3, bench.parseMix(bench.DEFAULT_MIX), 25, 8)
+    circuit = sim.levelize(sim.netRead(netName))
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+    faultNames = [sim.getFaultName(fault) for fault in faults]
+
+    matrixName = os.path.join(str(tmp_path), "run.dmx")
+    runStats = {"matrix": detmatrix.MatrixWriter(matrixName, faultNames, {}, compress)}
+    inputFile = open(inputName, "r")
+    detectedFaults = sim.graded_run(circuit, faults, "parallel", inputFile, io.StringIO(), io.StringIO(),
+                                    io.StringIO(), False, None, None, runStats)
+    inputFile.close()
+    runStats["matrix"].close()
+
+    matrix = detmatrix.readMatrix(matrixName)
+    assert len(matrix["vectors"]) == runStats["vectors"]
+    detected = detmatrix.detectedFaults(matrix)
+    assert sorted([faultNames[j] for j in range(len(faultNames)) if detected >> j & 1]) == sorted(detectedFaults)
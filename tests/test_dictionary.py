@@ -0,0 +1,76 @@
+from __future__ import print_function
+import os, sys, io, random, pickle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench
+
+# Fault dictionary: built from a small random circuit, written to a file and read back, the responses of a circuit with
+# one injected fault have to rank that fault first. A file that isn't a dictionary (a pickle, say) is turned down.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes a small random netlist and builds the dictionary of its full fault list into directory.
+# Returns (circuit, faults, vectors, dictionary file)
+def buildDictionary(directory):
+    netName = os.path.join(str(directory), "dict.bench")
+    faultsName = os.path.join(str(directory), "dict_faults.txt")
+    bench.generateCircuit(netName, os.path.join(str(directory), "dict_input.txt"), faultsName, 30, 6, 5, 3,
+                          bench.parseMix(bench.DEFAULT_MIX), 0, 4)
+    circuit = sim.levelize(sim.netRead(netName))
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+
+    rng = random.Random(4)
+    vectors = ["".join([rng.choice("01") for i in range(6)]) for k in range(40)]
+    dictionary = sim.dictionary_build(circuit, faults, "event", io.StringIO("".join([vector + "\n" for vector in vectors])), netName)
+    assert not isinstance(dictionary, str), dictionary
+    dictionaryName = os.path.join(str(directory), "dict.json")
+    sim.writeDictionary(dictionary, dictionaryName)
+    assert sim.readDictionary(dictionaryName) == dictionary
+    return circuit, faults, vectors, dictionaryName
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The responses of every detected fault, written as an observed file, rank that fault's group first
+def test_injected_fault_ranks_first(tmp_path):
+    sim.verbosity = sim.QUIET
+    circuit, faults, vectors, dictionaryName = buildDictionary(tmp_path)
+    graded = sim.event_grade(circuit, vectors, faults)
+    observedName = os.path.join(str(tmp_path), "observed.txt")
+
+    checked = 0
+    for i in range(len(faults)):
+        responses = [faultyOutputs[i] for output, faultyOutputs in graded]
+        if responses == [output for output, faultyOutputs in graded]:
+            continue
+        observedFile = open(observedName, "w")
+        observedFile.write("".join([vectors[k] + " -> " + responses[k] + "\n" for k in range(len(vectors))]))
+        observedFile.close()
+
+        candidates = sim.lookupFiles({"verbosity": sim.QUIET, "lookup": dictionaryName, "observed": observedName, "top": 3})
+        assert not isinstance(candidates, str), candidates
+        assert candidates[0][0] == 0
+        assert sim.getFaultName(faults[i]) in candidates[0][1]
+        checked += 1
+    assert checked > 0
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Files that aren't fault dictionaries give a LOOKUP ERROR without being run
+def test_not_a_dictionary(tmp_path):
+    sim.verbosity = sim.QUIET
+    observedName = os.path.join(str(tmp_path), "observed.txt")
+    observedFile = open(observedName, "w")
+    observedFile.write("000000 -> 00000\n")
+    observedFile.close()
+
+    pickleName = os.path.join(str(tmp_path), "old.dict")
+    pickleFile = open(pickleName, "wb")
+    pickle.dump({"netlist": "x.bench"}, pickleFile)
+    pickleFile.close()
+    jsonName = os.path.join(str(tmp_path), "other.json")
+    jsonFile = open(jsonName, "w")
+    jsonFile.write('{"format": "fault dictionary 1", "width": 5}')
+    jsonFile.close()
+
+    for name in [pickleName, jsonName]:
+        msg = sim.lookupFiles({"verbosity": sim.QUIET, "lookup": name, "observed": observedName, "top": 3})
+        assert msg == "LOOKUP ERROR: \"" + name + "\" IS NOT A FAULT DICTIONARY FILE"
@@ -0,0 +1,125 @@
+from __future__ import print_function
+import os, sys, io, random, itertools
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench, First_part
+
+# Engine parity: every engine has to write exactly what levelized writes (output, faulty output and display files,
+# and the detected faults) for the same netlist, vectors and fault list. The netlist is a small random one from
+# bench.py with every kind of gate (controlling, parity and cells), and the vectors have U's and a few bad lines.
+
+# Gate types of the random netlist, so the CONTROL, PARITY and TABLE kinds of gates.py all show up
+MIX = "AND=1,NAND=1,OR=1,NOR=1,XOR=1,XNOR=1,NOT=1,BUFF=0.5,MUX=0.5,AOI21=0.5,OAI22=0.5"
+
+# Gates using the same line twice, so the full fault list has the same terminal fault names twice
+REPEATED = """INPUT(a)
+INPUT(b)
+INPUT(c)
+OUTPUT(y)
+OUTPUT(z)
+n = AND(a, a, b)
+y = XOR(n, c)
+z = MUX(b, b, c)
+"""
+
+# Every engine checked against levelized
+ENGINES = [engine for engine in sim.ENGINES if engine != "levelized"]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes the random netlist and its full fault list into directory.
+# Returns (netlist file, fault list file, input vectors)
+def randomCircuit(directory, seed):
+    netName = os.path.join(str(directory), "parity.bench")
+    faultsName = os.path.join(str(directory), "parity_faults.txt")
+    bench.generateCircuit(netName, os.path.join(str(directory), "parity_input.txt"), faultsName, 40, 8, 6, 3,
+                          bench.parseMix(MIX), 0, seed)
+
+    rng = random.Random(seed)
+    vectors = ["".join([rng.choice("01U") for i in range(8)]) for k in range(60)]
+    # Too few bits, an invalid value, a comment and spaces inside a vector
+    vectors[10] = "01"
+    vectors[20] = "01X10110"
+    vectors[30] = "# comment"
+    vectors[40] = "0101 1U10"
+    return netName, faultsName, vectors
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Runs the vectors through one engine the way simulateFiles does, with every file kept in memory.
+# Returns (detected faults, output file, faulty output file, display file)
+def runEngine(netName, faultsName, vectors, engine, dropFaults, jobs=1):
+    sim.verbosity = sim.NORMAL
+    circuit = sim.levelize(sim.netRead(netName))
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+    assert sim.checkFaults(circuit, faults) == None
+
+    inputFile = io.StringIO("".join([vector + "\n" for vector in vectors]))
+    outputFile = io.StringIO()
+    faultyOutputFile = io.StringIO()
+    displayFile = io.StringIO()
+    runStats = {}
+    if engine in sim.GRADERS:
+        detectedFaults = sim.graded_run(circuit, faults, engine, inputFile, outputFile, faultyOutputFile, displayFile,
+                                        dropFaults, None, None, runStats, jobs)
+    elif engine == "basic":
+        detectedFaults = sim.scalar_run(circuit, faults, sim.basic_sim, inputFile, outputFile, faultyOutputFile,
+                                        displayFile, dropFaults, None, None, runStats)
+    else:
+        detectedFaults = sim.scalar_run(circuit, faults, sim.levelized_sim, inputFile, outputFile, faultyOutputFile,
+                                        displayFile, dropFaults, None, None, runStats)
+    assert not isinstance(detectedFaults, str), detectedFaults
+    return sorted(detectedFaults), outputFile.getvalue(), faultyOutputFile.getvalue(), displayFile.getvalue()
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Every engine against levelized, with and without fault dropping
+@pytest.mark.parametrize("dropFaults", [False, True])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_matches_levelized(tmp_path, engine, dropFaults):
+    if engine == "numpy" and sim.numpy == None:
+        pytest.skip("NumPy is not installed")
+    netName, faultsName, vectors = randomCircuit(tmp_path, 7)
+    expected = runEngine(netName, faultsName, vectors, "levelized", dropFaults)
+    assert len(expected[0]) > 0
+    result = runEngine(netName, faultsName, vectors, engine, dropFaults)
+    assert result[0] == expected[0]
+    assert result[1] == expected[1]
+    assert result[2] == expected[2]
+    assert result[3] == expected[3]
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: With fault dropping, the second copy of a repeated fault name is dropped as soon as the first one is
+# detected, on the same input line too, by every engine
+@pytest.mark.parametrize("engine", ENGINES)
+def test_repeated_fault_names_drop(tmp_path, engine):
+    if engine == "numpy" and sim.numpy == None:
+        pytest.skip("NumPy is not installed")
+    netName = os.path.join(str(tmp_path), "repeated.bench")
+    netFile = open(netName, "w")
+    netFile.write(REPEATED)
+    netFile.close()
+    faultList = First_part.fullFaultList(sim.netRead(netName))
+    assert len(faultList) > len(set(faultList))
+    faultsName = os.path.join(str(tmp_path), "repeated_faults.txt")
+    faultsFile = open(faultsName, "w")
+    faultsFile.write("".join([fault + "\n" for fault in faultList]))
+    faultsFile.close()
+
+    vectors = ["".join(bits) for bits in itertools.product("01U", repeat=3)]
+    assert runEngine(netName, faultsName, vectors, engine, True) == runEngine(netName, faultsName, vectors, "levelized", True)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The faults shared out between worker processes come back in the same order as with one process
+@pytest.mark.parametrize("engine", ["pfault", "compact"])
+def test_jobs_match_levelized(tmp_path, engine):
+    netName, faultsName, vectors = randomCircuit(tmp_path, 11)
+    assert runEngine(netName, faultsName, vectors, engine, False, 2) == runEngine(netName, faultsName, vectors, "levelized", False)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: A fault on a line the netlist doesn't have is caught before any engine runs
+def test_unknown_fault_line(tmp_path):
+    netName, faultsName, vectors = randomCircuit(tmp_path, 7)
+    circuit = sim.levelize(sim.netRead(netName))
+    msg = sim.checkFaults(circuit, sim.read_faults(["nope-SA-0\n"]))
+    assert msg == "FAULT ERROR: LINE \"wire_nope\" OF FAULT \"wire_nope-SA-0\" IS NOT IN THE CIRCUIT"
@@ -0,0 +1,55 @@
+from __future__ import print_function
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench, netcache, First_part
+
+# Compiled-netlist cache: a circuit loaded from the cache has to be exactly the one parsing gives, in both forms that
+# are stored (levelized for sim.py, straight from netRead for First_part.py), and an edited netlist is parsed again.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes a random netlist with every kind of gate into directory. Returns the netlist file
+def randomNetlist(directory):
+    netName = os.path.join(str(directory), "cache.bench")
+    bench.generateCircuit(netName, os.path.join(str(directory), "cache_input.txt"),
+                          os.path.join(str(directory), "cache_faults.txt"), 60, 8, 6, 3,
+                          bench.parseMix(bench.DEFAULT_MIX + ",MUX=0.5,AOI21=0.5,OAI22=0.5"), 0, 5)
+    return netName
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The first read parses and stores, the second comes from the cache and equals a fresh parse
+def test_cache_matches_parse(tmp_path):
+    sim.verbosity = sim.QUIET
+    netName = randomNetlist(tmp_path)
+    cacheDir = os.path.join(str(tmp_path), "cache")
+    for read, tag in [(sim.readLevelized, "levelized"), (First_part.netRead, "netlist")]:
+        circuit, fromCache = netcache.cachedRead(netName, read, tag, cacheDir)
+        assert not fromCache
+        assert circuit == read(netName)
+        circuit, fromCache = netcache.cachedRead(netName, read, tag, cacheDir)
+        assert fromCache
+        assert circuit == read(netName)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: An edited netlist misses the cache and replaces the old entry, and a broken entry is parsed again
+def test_cache_edited_and_broken(tmp_path):
+    sim.verbosity = sim.QUIET
+    netName = randomNetlist(tmp_path)
+    cacheDir = os.path.join(str(tmp_path), "cache")
+    netcache.cachedRead(netName, sim.readLevelized, "levelized", cacheDir)
+    assert len(os.listdir(cacheDir)) == 1
+
+    netFile = open(netName, "a")
+    netFile.write("OUTPUT(in0)\n")
+    netFile.close()
+    circuit, fromCache = netcache.cachedRead(netName, sim.readLevelized, "levelized", cacheDir)
+    assert not fromCache and not isinstance(circuit, str)
+    assert circuit == sim.readLevelized(netName)
+    assert os.listdir(cacheDir) == [os.path.basename(netName) + "." + netcache.netHash(netName) + ".levelized.pickle"]
+
+    cacheFile = open(os.path.join(cacheDir, os.listdir(cacheDir)[0]), "wb")
+    cacheFile.write(b"not a cache entry")
+    cacheFile.close()
+    circuit, fromCache = netcache.cachedRead(netName, sim.readLevelized, "levelized", cacheDir)
+    assert not fromCache
+    assert circuit == sim.readLevelized(netName)
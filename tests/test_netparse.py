@@ -0,0 +1,63 @@
+from __future__ import print_function
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, netparse
+
+# .bench parser: mixed case, spaces, comments and Windows line endings are read, BUF/BUFF and DFF are handled the
+# ISCAS way, and every error names the line it is on.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Any case for the keywords and gate types, tabs, comments and \r\n line endings give the plain circuit
+def test_case_and_spacing():
+    text = "# c17-like\r\ninput(a)\r\n\tInPuT( b )  # second\r\noutput(y)\r\n\r\ny\t=  nand( a ,\tb ) # gate\r\n"
+    circuit = netparse.parseText(text)
+    assert circuit == netparse.parseText("INPUT(a)\nINPUT(b)\nOUTPUT(y)\ny = NAND(a, b)\n")
+    assert circuit["wire_y"] == ["NAND", ["wire_a", "wire_b"], False, 'U']
+    assert circuit["INPUT_WIDTH"][1] == 2
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: BUF is read as BUFF, which takes exactly one terminal once levelize checks it
+def test_buff():
+    sim.verbosity = sim.QUIET
+    circuit = netparse.parseText("INPUT(a)\nOUTPUT(y)\ny = buf(a)\n")
+    assert circuit["wire_y"][0] == "BUFF"
+    assert not isinstance(sim.levelize(circuit), str)
+
+    circuit = netparse.parseText("INPUT(a)\nINPUT(b)\nOUTPUT(y)\ny = BUFF(a, b)\n")
+    assert sim.levelize(circuit) == "NETLIST ERROR: GATE \"wire_y\" (BUFF) NEEDS 1 TERMINAL/S"
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: A DFF is cut into a scan input (its output) after the real inputs and a scan output (its terminal) after
+# the real outputs, so a sequential loop levelizes
+def test_dff_full_scan():
+    sim.verbosity = sim.QUIET
+    circuit = netparse.parseText("INPUT(a)\nOUTPUT(y)\nq = DFF(n)\nn = NAND(a, q)\ny = NOT(q)\n")
+    assert circuit["INPUTS"][1] == ["wire_a", "wire_q"]
+    assert circuit["OUTPUTS"][1] == ["wire_y", "wire_n"]
+    assert circuit["GATES"][1] == ["wire_n", "wire_y"]
+    assert circuit["wire_q"] == ["INPUT", "wire_q", False, 'U']
+    assert not isinstance(sim.levelize(circuit), str)
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Every parse error has the number of the line it is on, counting blank lines and comments
+def test_error_line_numbers():
+    header = "# header\nINPUT(a)\n\nINPUT(b)\nOUTPUT(y)\n"
+    cases = [("y = AND(a b\n", "NETLIST ERROR: CAN NOT READ LINE 6: \"y = AND(a b\""),
+             ("INPUT(a)\n", "NETLIST ERROR: INPUT LINE \"wire_a\" ALREADY EXISTS PREVIOUSLY IN NETLIST (LINE 6)"),
+             ("y = AND(a, b)\n# again\ny = OR(a, b)\n",
+              "NETLIST ERROR: GATE OUTPUT LINE \"wire_y\" ALREADY EXISTS PREVIOUSLY IN NETLIST (LINE 8)"),
+             ("y = AND(a, , b)\n", "NETLIST ERROR: GATE \"wire_y\" HAS AN EMPTY TERMINAL (LINE 6)"),
+             ("\r\nq = DFF(a, b)\r\n", "NETLIST ERROR: DFF \"wire_q\" NEEDS EXACTLY ONE TERMINAL (LINE 7)")]
+    for text, msg in cases:
+        assert netparse.parseText(header + text) == msg
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: sim.py reads the file with the same parser and hands the error back
+def test_netread_error(tmp_path):
+    sim.verbosity = sim.QUIET
+    netName = os.path.join(str(tmp_path), "bad.bench")
+    netFile = open(netName, "w")
+    netFile.write("INPUT(a)\nOUTPUT(y)\ny == NOT(a)\n")
+    netFile.close()
+    assert sim.netRead(netName) == "NETLIST ERROR: CAN NOT READ LINE 3: \"y == NOT(a)\""
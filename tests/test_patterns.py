@@ -0,0 +1,70 @@
+from __future__ import print_function
+import os, sys, io
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench
+
+# Pattern generators and the saturation window: the LFSR taps give maximal-length sequences, the sources give the same
+# vectors for the same seed, and --window stops a run once that many vectors in a row found nothing new, without
+# reading the rest of the source.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Every LFSR length up to 14 goes through all 2^n - 1 nonzero states before coming back to the first one
+def test_lfsr_maximal_length():
+    assert [line.strip() for line in sim.lfsrPatterns(4, 6, 1)] == ["0001", "0010", "0100", "1001", "0011", "0110"]
+    for width in range(2, 15):
+        period = (1 << width) - 1
+        lines = list(sim.lfsrPatterns(width, period + 1, 3))
+        assert len(set(lines[:period])) == period
+        assert lines[period] == lines[0]
+        assert "0" * width + "\n" not in lines
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Circuits wider than 32 inputs shift a 32-bit LFSR once per input; every source repeats with its seed
+def test_pattern_sources():
+    lines = list(sim.lfsrPatterns(40, 50, 7))
+    assert lines == list(sim.lfsrPatterns(40, 50, 7))
+    assert lines != list(sim.lfsrPatterns(40, 50, 8))
+    assert len(set(lines)) == 50
+    for line in lines:
+        assert len(line) == 41 and set(line.strip()) <= set("01")
+
+    assert list(sim.randomPatterns(12, 20, 5)) == list(sim.randomPatterns(12, 20, 5))
+    assert [line.strip() for line in sim.exhaustivePatterns(2, 4)] == ["00", "01", "10", "11"]
+    # Input i is the i-th character from the right, so weight 1 for inputs 0 and 2 gives ...0101
+    assert [line.strip() for line in sim.weightedPatterns(4, 3, 1, [1.0, 0.0, 1.0, 0.0])] == ["0101"] * 3
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: The window stops the run window vectors after the last new detection, the same way in every engine, and
+# the rest of the pattern source is never read
+@pytest.mark.parametrize("engine", ["levelized", "event", "parallel"])
+def test_saturation_window(tmp_path, engine):
+    sim.verbosity = sim.QUIET
+    netName = os.path.join(str(tmp_path), "window.bench")
+    faultsName = os.path.join(str(tmp_path), "window_faults.txt")
+    bench.generateCircuit(netName, os.path.join(str(tmp_path), "window_input.txt"), faultsName, 40, 10, 6, 3,
+                          bench.parseMix(bench.DEFAULT_MIX), 0, 3)
+    circuit = sim.levelize(sim.netRead(netName))
+    faultsFile = open(faultsName, "r")
+    faults = sim.read_faults(faultsFile)
+    faultsFile.close()
+
+    window = 20
+    source = sim.lfsrPatterns(10, 5000, 1)
+    runStats = {}
+    if engine == "levelized":
+        detectedFaults = sim.scalar_run(circuit, faults, sim.levelized_sim, source, io.StringIO(), io.StringIO(),
+                                        io.StringIO(), False, None, window, runStats)
+    else:
+        detectedFaults = sim.graded_run(circuit, faults, engine, source, io.StringIO(), io.StringIO(), io.StringIO(),
+                                        False, None, window, runStats)
+    assert not isinstance(detectedFaults, str), detectedFaults
+    assert runStats["stoppedEarly"] and runStats["saturated"]
+    assert runStats["vectors"] == runStats["lastDetection"] + window
+    assert len(list(source)) > 0
+
+    # The same vectors without a window detect nothing more than the run that stopped
+    allDetected = sim.scalar_run(circuit, faults, sim.levelized_sim, sim.lfsrPatterns(10, runStats["vectors"], 1),
+                                 io.StringIO(), io.StringIO(), io.StringIO(), False, None, None, {})
+    assert sorted(allDetected) == sorted(detectedFaults)
@@ -0,0 +1,55 @@
+from __future__ import print_function
+import os, sys, json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench
+
+# --profile: several simulateFiles calls in one process (the way server.py or a test runs them) each get a report of
+# their own run only, and a run without --profile after them isn't profiled.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Writes a small random netlist with its vectors and faults into directory. Returns the simulateFiles
+# options for it, without a profile report
+def profileOptions(directory):
+    netName = os.path.join(str(directory), "prof.bench")
+    inputName = os.path.join(str(directory), "prof_input.txt")
+    faultsName = os.path.join(str(directory), "prof_faults.txt")
+    bench.generateCircuit(netName, inputName, faultsName, 20, 5, 4, 3, bench.parseMix(bench.DEFAULT_MIX), 16, 2)
+    return {"netlist": netName, "inputs": inputName, "faults": faultsName,
+            "output": os.path.join(str(directory), "prof_output.txt"), "engine": "levelized", "drop": False,
+            "target": None, "faultMap": None, "verbosity": sim.QUIET, "jobs": 1, "cache": False, "cacheDir": None,
+            "patterns": None, "count": None, "seed": 1, "weights": None, "window": None, "atpg": None,
+            "backtracks": sim.BACKTRACK_LIMIT, "compact": None, "dictionary": None, "profile": None, "matrix": None,
+            "compress": False, "matrixOnly": False, "cells": None}
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Reads a profile report
+def readReport(reportName):
+    reportFile = open(reportName, "r")
+    report = json.load(reportFile)
+    reportFile.close()
+    return report
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Two profiled runs give the same counts (nothing wrapped twice), and profiling is off after each run
+def test_profile_runs_twice(tmp_path):
+    options = profileOptions(tmp_path)
+    reports = []
+    for k in range(2):
+        options["profile"] = os.path.join(str(tmp_path), "profile" + str(k) + ".json")
+        assert not isinstance(sim.simulateFiles(options), str)
+        assert sim.profile == None
+        reports.append(readReport(options["profile"]))
+
+    for report in reports:
+        assert report["functions"]["netRead"]["calls"] == 1
+        assert report["functions"]["levelize"]["calls"] == 1
+        assert report["gateEvalTotal"] > 0
+    assert reports[0]["gateEvalTotal"] == reports[1]["gateEvalTotal"]
+    assert reports[0]["functions"]["levelized_sim"]["calls"] == reports[1]["functions"]["levelized_sim"]["calls"]
+
+    # A run without --profile leaves no profile behind and doesn't touch the earlier report
+    options["profile"] = None
+    assert not isinstance(sim.simulateFiles(options), str)
+    assert sim.profile == None
+    assert readReport(os.path.join(str(tmp_path), "profile1.json")) == reports[1]
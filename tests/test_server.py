@@ -0,0 +1,72 @@
+from __future__ import print_function
+import os, sys, io, time, socket, subprocess
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sim, bench, server
+
+# Simulation server: a real server process on a Unix socket has to answer a grade request with exactly what sim.py
+# writes for the same netlist, vectors and faults, keep the circuit for the next request, and shut down on stop.
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: Starts "server.py serve" with one worker on socketPath and waits for the socket. Returns the process
+def startServer(socketPath):
+    serverName = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "server.py")
+    process = subprocess.Popen([sys.executable, serverName, "--socket", socketPath, "serve", "-j", "1", "-v", "0"])
+    deadline = time.time() + 30
+    while not os.path.exists(socketPath):
+        assert process.poll() == None, "the server stopped before listening"
+        assert time.time() < deadline, "the server did not start listening"
+        time.sleep(0.05)
+    return process
+
+# -------------------------------------------------------------------------------------------------------------------- #
+# FUNCTION: grade, simulate, stats and stop through the socket, the grade answer checked against graded_run
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="Unix sockets are needed")
+def test_server_round_trip(tmp_path):
+    sim.verbosity = sim.QUIET
+    netName = os.path.join(str(tmp_path), "served.bench")
+    faultsName = os.path.join(str(tmp_path), "served_faults.txt")
+    inputName = os.path.join(str(tmp_path), "served_input.txt")
+    bench.generateCircuit(netName, inputName, faultsName, 30, 6, 5, 3, bench.parseMix(bench.DEFAULT_MIX), 20, 6)
+    vectors = server.readLines(inputName)
+    faultLines = server.readLines(faultsName)
+
+    # What sim.py writes for the same request
+    circuit = sim.levelize(sim.netRead(netName))
+    outputFile = io.StringIO()
+    faultyOutputFile = io.StringIO()
+    detectedFaults = sim.graded_run(circuit, sim.read_faults([line + "\n" for line in faultLines]), "event",
+                                    io.StringIO("".join([vector + "\n" for vector in vectors])), outputFile,
+                                    faultyOutputFile, io.StringIO(), False, None, None, {})
+
+    socketPath = os.path.join(str(tmp_path), "sim.sock")
+    process = startServer(socketPath)
+    try:
+        message = {"op": "grade", "netlist": netName, "vectors": vectors, "faults": faultLines, "engine": "event",
+                   "faulty": True}
+        answer = server.request(socketPath, message)
+        assert "error" not in answer, answer
+        assert answer["output"] == outputFile.getvalue()
+        assert answer["faultyOutput"] == faultyOutputFile.getvalue()
+        assert sorted(answer["detected"]) == sorted(detectedFaults)
+        assert answer["faults"] == len(faultLines) and answer["vectors"] == len(vectors)
+        assert not answer["cached"]
+
+        answer = server.request(socketPath, {"op": "simulate", "netlist": netName, "vectors": vectors})
+        assert answer["output"] == outputFile.getvalue()
+        assert answer["cached"] and answer["faults"] == 0
+
+        answer = server.request(socketPath, {"op": "grade", "netlist": os.path.join(str(tmp_path), "nope.bench"), "vectors": vectors})
+        assert answer["error"].startswith("SERVER ERROR: NETLIST ")
+
+        answer = server.request(socketPath, {"op": "stats"})
+        assert answer["grade"] == 2 and answer["simulate"] == 1 and answer["cached"] == 1 and answer["errors"] == 1
+
+        assert server.request(socketPath, {"op": "stop"}) == {"stopping": True}
+        assert process.wait(30) == 0
+        assert not os.path.exists(socketPath)
+    finally:
+        if process.poll() == None:
+            process.kill()
+            process.wait()